@@ -3,11 +3,104 @@
 import os
 import pytz
 
+
+def activado(nombre: str, por_defecto: bool) -> bool:
+    """Bandera de entorno: 1/true/yes/si/on la activan, 0/false/no/off la apagan."""
+    valor = os.getenv(nombre)
+    if valor is None or not valor.strip():
+        return por_defecto
+    return valor.strip().lower() in ("1", "true", "yes", "si", "sí", "on")
+
 # ⚙️ Configuración general para la aplicación en Render
 
 # URL de conexión a la base de datos (Render la inyecta como variable de entorno)
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# 🔌 Pool de conexiones (ajustar a los límites de conexiones del plan de Render)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 5))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))  # segundos esperando una conexión libre
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # segundos antes de reciclar una conexión
+DB_POOL_PRE_PING = activado("DB_POOL_PRE_PING", True)
+
+# 📖 Lecturas tolerantes a retraso (/tablero, /api/ciclos, informes y analítica):
+# réplica de solo lectura si hay DATABASE_URL_LECTURA; si no, con LECTURA_POOL_SEPARADO
+# van a un pool aparte y más chico sobre el primario, para no quitarle conexiones al escaneo
+DATABASE_URL_LECTURA = os.getenv("DATABASE_URL_LECTURA")
+LECTURA_POOL_SEPARADO = activado("LECTURA_POOL_SEPARADO", False)
+LECTURA_POOL_SIZE = int(os.getenv("LECTURA_POOL_SIZE", 2))
+LECTURA_MAX_OVERFLOW = int(os.getenv("LECTURA_MAX_OVERFLOW", 2))
+LECTURA_STATEMENT_TIMEOUT_MS = int(os.getenv("LECTURA_STATEMENT_TIMEOUT_MS", 0))  # 0 = sin límite
+LECTURA_CONSISTENCIA_S = int(os.getenv("LECTURA_CONSISTENCIA_S", 10))  # lecturas al primario tras escribir
+
+# Parámetros que se envían al abrir la conexión (sin sentencias extra por conexión)
+DB_ZONA_HORARIA = activado("DB_ZONA_HORARIA", True)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 0))  # 0 = sin límite
+
+# Carga estricta del ORM (ORM_CARGA_ESTRICTA=1; la suite de tests/ corre así): una relación que no se cargó con
+# un perfil de app/logic/perfiles_carga.py lanza error en vez de hacer un SELECT oculto
+ORM_CARGA_ESTRICTA = activado("ORM_CARGA_ESTRICTA", False)
+
+# ⏱️ Instrumentación por request: consultas SQL, tiempo en la base y del handler
+# (cabecera Server-Timing, log estructurado y /metrics para Prometheus)
+INSTRUMENTACION = activado("INSTRUMENTACION", True)
+DB_CONSULTA_LENTA_MS = int(os.getenv("DB_CONSULTA_LENTA_MS", 200))  # se guarda su EXPLAIN; 0 = desactivado
+
+# 📝 Logs: una línea JSON por evento, escrita desde un hilo aparte (cola en memoria)
+LOG_NIVEL = os.getenv("LOG_NIVEL", "INFO").upper()
+LOG_FORMATO = os.getenv("LOG_FORMATO", "json").lower()  # "json" o "texto"
+LOG_MUESTREO = os.getenv("LOG_MUESTREO", "")  # p. ej. "escaneo=0.1,request=0.05"
+LOG_COLA_MAX = int(os.getenv("LOG_COLA_MAX", 10000))  # eventos en espera antes de descartar
+
+# 🔐 Orígenes (https://dominio) que pueden usar las acciones sobre ciclos (POST /ciclos/accion
+# y /ws/ciclos) y CORS con credenciales, separados por coma; vacío = solo el mismo host
+ORIGENES_PERMITIDOS = [o.strip().rstrip("/") for o in os.getenv("ORIGENES_PERMITIDOS", "").split(",") if o.strip()]
+
+# 📡 Pub/sub de eventos en vivo: "memoria" (un worker) o "postgres" (LISTEN/NOTIFY, varios workers)
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "memoria").lower()
+
+# 🪪 Caché de identidad del escaneo (cookie → camión/sesión): "memoria" o "ninguno"
+CACHE_IDENTIDAD_BACKEND = os.getenv("CACHE_IDENTIDAD_BACKEND", "memoria").lower()
+CACHE_IDENTIDAD_TTL = int(os.getenv("CACHE_IDENTIDAD_TTL", 300))  # segundos
+CACHE_IDENTIDAD_MAX = int(os.getenv("CACHE_IDENTIDAD_MAX", 10000))  # entradas (LRU)
+
+# 📥 Ingesta diferida: los escaneos se confirman al encolarlos en un SQLite local
+# (WAL) y un worker los aplica por lotes. En Render la ruta debe estar en un disco persistente.
+INGESTA_DIFERIDA = activado("INGESTA_DIFERIDA", False)
+COLA_ESCANEOS_RUTA = os.getenv("COLA_ESCANEOS_RUTA", "cola_escaneos.db")
+COLA_ESCANEOS_LOTE = int(os.getenv("COLA_ESCANEOS_LOTE", 200))  # escaneos por transacción
+COLA_ESCANEOS_ESPERA_MS = int(os.getenv("COLA_ESCANEOS_ESPERA_MS", 200))  # espera para juntar una ráfaga
+COLA_ESCANEOS_RECLAMO_S = float(os.getenv("COLA_ESCANEOS_RECLAMO_S", 300))  # lo reclamado por un worker caído se libera
+
+# 🔁 Antirrebote de /scan/{punto}: el mismo punto pedido otra vez por el mismo teléfono dentro
+# de REBOTE_VENTANA_S segundos se responde desde memoria; además, un balde de REBOTE_RAFAGA
+# escaneos por teléfono que se repone a REBOTE_FICHAS_S por segundo (sin fichas: 429)
+REBOTE_ACTIVO = activado("REBOTE_ACTIVO", True)
+REBOTE_VENTANA_S = float(os.getenv("REBOTE_VENTANA_S", 15))
+REBOTE_RAFAGA = int(os.getenv("REBOTE_RAFAGA", 10))
+REBOTE_FICHAS_S = float(os.getenv("REBOTE_FICHAS_S", 0.5))
+REBOTE_MAX_DISPOSITIVOS = int(os.getenv("REBOTE_MAX_DISPOSITIVOS", 10000))  # teléfonos recordados (LRU)
+
+# 🧹 Barrido periódico (apagado por defecto; BARRIDO_ACTIVO=1 lo enciende): cierra las
+# sesiones vencidas y cierra (o elimina) los ciclos abiertos sin escaneos desde hace
+# BARRIDO_CICLO_ABANDONO_MIN minutos o con la sesión terminada, dejando el registro en ciclo_manual
+BARRIDO_ACTIVO = activado("BARRIDO_ACTIVO", False)
+BARRIDO_INTERVALO_S = int(os.getenv("BARRIDO_INTERVALO_S", 300))  # segundos entre pasadas
+BARRIDO_CICLO_ABANDONO_MIN = int(os.getenv("BARRIDO_CICLO_ABANDONO_MIN", 480))  # minutos sin escaneos
+BARRIDO_LOTE = int(os.getenv("BARRIDO_LOTE", 500))  # filas por transacción
+BARRIDO_ACCION = os.getenv("BARRIDO_ACCION", "cerrar").lower()  # "cerrar" o "eliminar"
+
+# 🗄️ Historial: escaneos particionada por mes (PostgreSQL) y archivo frío en Parquet.
+# Los ciclos cerrados hace más de ARCHIVO_DIAS días pasan a ARCHIVO_DIR con
+# `python -m app.mantenimiento archivar` (en Render, un cron job y un disco persistente)
+ARCHIVO_DIR = os.getenv("ARCHIVO_DIR", "archivo")
+ARCHIVO_DIAS = int(os.getenv("ARCHIVO_DIAS", 180))
+ARCHIVO_LOTE = int(os.getenv("ARCHIVO_LOTE", 1000))  # ciclos por transacción y por archivo
+PARTICIONES_MESES_ADELANTE = int(os.getenv("PARTICIONES_MESES_ADELANTE", 3))
+
+# Token de los endpoints internos de métricas (/interno/... y /metrics); sin él no se publican
+METRICAS_TOKEN = os.getenv("METRICAS_TOKEN")
+
 # Duración de las sesiones en minutos (por defecto 15 horas si no está configurada)
 SESSION_DURATION_MINUTES = int(os.getenv("SESSION_DURATION_MINUTES", 900))
 
@@ -23,12 +116,14 @@ PANAMA_TZ = pytz.timezone(TIMEZONE)
 
 # Se modifica en render.com según necesidad.
 # 🛡️ Configuración de seguridad de acceso para quienes no esten dentro de planta.
-VALIDAR_GEOZONA = os.getenv("VALIDAR_GEOZONA", "true").lower() == "true"
+VALIDAR_GEOZONA = activado("VALIDAR_GEOZONA", True)
 
 # 📍 Coordenadas de la planta
 ZONA_LAT = float(os.getenv("ZONA_LAT"))
 ZONA_LON = float(os.getenv("ZONA_LON"))
 ZONA_METROS = int(os.getenv("ZONA_METROS"))
+# GeoJSON opcional con los polígonos de cada planta (reemplaza el círculo de arriba)
+GEOZONAS_ARCHIVO = os.getenv("GEOZONAS_ARCHIVO", "")
 
 # 🛠️ Modo mantenimiento temporal
-MANTENIMIENTO = os.getenv("MANTENIMIENTO", "false").lower() == "true"
\ No newline at end of file
+MANTENIMIENTO = activado("MANTENIMIENTO", False)
\ No newline at end of file
@@ -1,32 +1,40 @@
 # app/crud.py
 from datetime import timedelta
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from app import models
-from app.utils.timezone import ahora_panama
+from app.logic.perfiles_carga import con_perfil
+from app.config import SESSION_DURATION_MINUTES
+from app.utils.timezone import ahora_panama, convertir_a_panama
+
+# Guarda el objeto: commit + refresh, o solo flush cuando el llamador maneja la transacción
+def _guardar(db: Session, objeto, confirmar: bool = True):
+    db.add(objeto)
+    if confirmar:
+        db.commit()
+        db.refresh(objeto)
+    else:
+        db.flush()
+    return objeto
 
 # Crear camion
-def create_camion(db: Session, device_cookie: str):
+def create_camion(db: Session, device_cookie: str, confirmar: bool = True):
     camion = models.Camion(device_cookie=device_cookie)
-    db.add(camion)
-    db.commit()
-    db.refresh(camion)
-    return camion
+    return _guardar(db, camion, confirmar)
 
 def get_camion_by_cookie(db: Session, cookie: str):
     return db.query(models.Camion).filter(models.Camion.device_cookie == cookie).first()
 
 # Sesiones
-def create_sesion(db: Session, camion_id: int, placa: str):
+def create_sesion(db: Session, camion_id: int, placa: str, ahora=None, confirmar: bool = True):
+    inicio = ahora or ahora_panama()
     sesion = models.Sesion(
         camion_id=camion_id,
         placa=placa,
-        inicio=ahora_panama(),
-        fin=models.Sesion.default_fin()
+        inicio=inicio,
+        fin=inicio + timedelta(minutes=SESSION_DURATION_MINUTES)
     )
-    db.add(sesion)
-    db.commit()
-    db.refresh(sesion)
-    return sesion
+    return _guardar(db, sesion, confirmar)
 
 def get_sesion_activa(db: Session, camion_id: int):
     return db.query(models.Sesion).filter(
@@ -36,15 +44,13 @@ def get_sesion_activa(db: Session, camion_id: int):
     ).order_by(models.Sesion.id.desc()).first()
 
 # Ciclos
-def create_ciclo(db: Session, sesion_id: int):
-    ciclo = models.Ciclo(sesion_id=sesion_id, inicio=ahora_panama())
-    db.add(ciclo)
-    db.commit()
-    db.refresh(ciclo)
+def create_ciclo(db: Session, sesion_id: int, ahora=None, confirmar: bool = True):
+    ciclo = _guardar(db, models.Ciclo(sesion_id=sesion_id, inicio=ahora or ahora_panama()), confirmar)
+    set_committed_value(ciclo, "escaneos", [])  # ciclo nuevo: sin escaneos, no hace falta consultarlos
     return ciclo
 
-def get_ciclo_activo(db: Session, sesion_id: int):
-    return db.query(models.Ciclo).filter(
+def get_ciclo_activo(db: Session, sesion_id: int, perfil: str = "ciclo"):
+    return con_perfil(db.query(models.Ciclo), perfil).filter(
         models.Ciclo.sesion_id == sesion_id,
         models.Ciclo.completado == False
     ).order_by(models.Ciclo.id.desc()).first()
@@ -54,7 +60,9 @@ def create_escaneo(
     db: Session,
     ciclo_id: int,
     punto: str,
-    device_cookie: str | None = None
+    device_cookie: str | None = None,
+    ahora=None,
+    confirmar: bool = True,
 ):
     """
     Crea un escaneo para un ciclo y punto.
@@ -64,8 +72,10 @@ def create_escaneo(
     - El parámetro device_cookie se acepta por compatibilidad,
       pero **NO** se guarda en la tabla escaneos, porque el modelo
       Escaneo no tiene esa columna.
+    - Con confirmar=False solo hace flush (el commit queda al llamador).
     """
-    hace_60_min = ahora_panama() - timedelta(minutes=60)
+    ahora = ahora or ahora_panama()
+    hace_60_min = ahora - timedelta(minutes=60)
 
     ultimo = (
         db.query(models.Escaneo)
@@ -77,24 +87,21 @@ def create_escaneo(
         .first()
     )
 
-    if ultimo and ultimo.fecha_hora >= hace_60_min:
+    if ultimo and convertir_a_panama(ultimo.fecha_hora) >= hace_60_min:
         # Ya hay un escaneo reciente de este mismo punto en este ciclo → no duplicamos
         return ultimo
 
     escaneo = models.Escaneo(
         ciclo_id=ciclo_id,
         punto=punto,
-        fecha_hora=ahora_panama()
+        fecha_hora=ahora
         # 👈 IMPORTANTE: aquí NO va device_cookie
     )
-    db.add(escaneo)
-    db.commit()
-    db.refresh(escaneo)
-    return escaneo
+    return _guardar(db, escaneo, confirmar)
 
-def get_sesion_activa_por_placa(db: Session, placa: str):
-    """Obtiene la sesión activa más reciente para una placa sin importar la cookie."""
-    return db.query(models.Sesion).filter(
+def get_sesion_activa_por_placa(db: Session, placa: str, perfil: str = "sesion_con_camion"):
+    """Obtiene la sesión activa más reciente para una placa sin importar la cookie (con su camión)."""
+    return con_perfil(db.query(models.Sesion), perfil).filter(
         models.Sesion.placa == placa,
         models.Sesion.cerrada == False,
         models.Sesion.fin >= ahora_panama()
@@ -1,41 +1,308 @@
 # aqui se configura la conecxion a la base de datos
 
-from sqlalchemy import create_engine, event
+import re
+import time
+import logging
+from collections import deque
+from contextvars import ContextVar
+from fastapi import Request
+from sqlalchemy import create_engine, exc, event
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app import config
 from app.config import DATABASE_URL, TIMEZONE
+from app.logic.bitacora import obtener_logger, evento
 
 # Base de datos
 if not DATABASE_URL:
     raise ValueError("❌ No se encontró la variable de entorno DATABASE_URL. Configúrala en Render.")
 
+ES_POSTGRES = DATABASE_URL.startswith(("postgres://", "postgresql"))
 # Render usa PostgreSQL con SSL obligatorio
+USA_SSL = "render.com" in DATABASE_URL
+
+# Lecturas tolerantes a retraso (tablero, /api/ciclos, informes): réplica si hay
+# DATABASE_URL_LECTURA, si no un pool aparte y más chico sobre el primario
+LECTURA_URL = config.DATABASE_URL_LECTURA or DATABASE_URL
+LECTURA_SEPARADA = bool(config.DATABASE_URL_LECTURA) or config.LECTURA_POOL_SEPARADO
+
+# =============================================
+# 📈 MÉTRICAS DEL POOL DE CONEXIONES
+# =============================================
+class MetricasPool:
+    """Acumula el tiempo de espera para obtener una conexión del pool."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+
+    def registrar(self, espera: float, timeout: bool = False):
+        if timeout:
+            self.timeouts += 1
+        else:
+            self.checkouts += 1
+        self.espera_total += espera
+        self.espera_max = max(self.espera_max, espera)
+
+    def resumen(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "espera_total_ms": round(self.espera_total * 1000, 3),
+            "espera_promedio_ms": round(self.espera_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+            "espera_max_ms": round(self.espera_max * 1000, 3),
+        }
+
+def _pool_medido(base, metricas: MetricasPool):
+    """Crea una subclase del pool que mide cuánto espera cada checkout."""
+    class PoolMedido(base):
+        def _do_get(self):
+            inicio = time.perf_counter()
+            try:
+                conexion = super()._do_get()
+            except exc.TimeoutError:
+                metricas.registrar(time.perf_counter() - inicio, timeout=True)
+                raise
+            metricas.registrar(time.perf_counter() - inicio)
+            return conexion
+    return PoolMedido
+
+def _kwargs_pool(base, metricas: MetricasPool, lectura: bool = False) -> dict:
+    return {
+        "poolclass": _pool_medido(base, metricas),
+        "pool_size": config.LECTURA_POOL_SIZE if lectura else config.DB_POOL_SIZE,
+        "max_overflow": config.LECTURA_MAX_OVERFLOW if lectura else config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+
+# =============================================
+# 🔌 PARÁMETROS DE CONEXIÓN
+# =============================================
+def opciones_sesion(lectura: bool = False) -> dict:
+    """Parámetros de sesión de PostgreSQL que viajan en el arranque de la conexión."""
+    opciones = {}
+    if config.DB_ZONA_HORARIA:
+        opciones["TimeZone"] = TIMEZONE
+    timeout = config.LECTURA_STATEMENT_TIMEOUT_MS if lectura else config.DB_STATEMENT_TIMEOUT_MS
+    if timeout > 0:
+        opciones["statement_timeout"] = str(timeout)
+    if lectura:
+        opciones["default_transaction_read_only"] = "on"  # el pool de lectura nunca escribe
+    return opciones
+
+def _usa_ssl(lectura: bool) -> bool:
+    return "render.com" in LECTURA_URL if lectura else USA_SSL
+
+def connect_args_sync(lectura: bool = False) -> dict:
+    """connect_args para psycopg2: las opciones van en el parámetro 'options' (-c clave=valor)."""
+    if not ES_POSTGRES:
+        return {}
+    args = {"sslmode": "require"} if _usa_ssl(lectura) else {}
+    opciones = opciones_sesion(lectura)
+    if opciones:
+        args["options"] = " ".join(f"-c {clave}={valor}" for clave, valor in opciones.items())
+    return args
+
+def connect_args_async(lectura: bool = False) -> dict:
+    """connect_args para asyncpg: las opciones van en server_settings."""
+    if not ES_POSTGRES:
+        return {}
+    args = {"ssl": "require"} if _usa_ssl(lectura) else {}
+    opciones = opciones_sesion(lectura)
+    if opciones:
+        args["server_settings"] = opciones
+    return args
+
+def url_async(url: str) -> str:
+    """Traduce la URL síncrona al driver asíncrono equivalente (asyncpg / aiosqlite)."""
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    for prefijo in ("postgresql+psycopg2://", "postgresql://"):
+        if url.startswith(prefijo):
+            return "postgresql+asyncpg://" + url[len(prefijo):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+# =============================================
+# ⚙️ MOTORES Y SESIONES
+# =============================================
+METRICAS_POOL = {
+    "sync": MetricasPool(),
+    "async": MetricasPool(),
+}
+if LECTURA_SEPARADA:
+    METRICAS_POOL["lectura_sync"] = MetricasPool()
+    METRICAS_POOL["lectura_async"] = MetricasPool()
+
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"sslmode": "require"} if "render.com" in DATABASE_URL else {}
+    connect_args=connect_args_sync(),
+    **_kwargs_pool(QueuePool, METRICAS_POOL["sync"])
 )
 
-@event.listens_for(engine, "connect", insert=True)
-def set_time_zone(dbapi_connection, connection_record):
-    """Forza la zona horaria de la sesión de base de datos a América/Panamá."""
-    cursor = None
+# Motor asíncrono para las rutas async (no bloquea el event loop de uvicorn)
+async_engine = create_async_engine(
+    url_async(DATABASE_URL),
+    connect_args=connect_args_async(),
+    **_kwargs_pool(AsyncAdaptedQueuePool, METRICAS_POOL["async"])
+)
+
+# Motores de lectura: réplica o pool aparte (LECTURA_SEPARADA); si no, los mismos del primario
+if LECTURA_SEPARADA:
+    engine_lectura = create_engine(
+        LECTURA_URL,
+        connect_args=connect_args_sync(lectura=True),
+        **_kwargs_pool(QueuePool, METRICAS_POOL["lectura_sync"], lectura=True)
+    )
+    async_engine_lectura = create_async_engine(
+        url_async(LECTURA_URL),
+        connect_args=connect_args_async(lectura=True),
+        **_kwargs_pool(AsyncAdaptedQueuePool, METRICAS_POOL["lectura_async"], lectura=True)
+    )
+else:
+    engine_lectura, async_engine_lectura = engine, async_engine
+
+async def cerrar_motores():
+    """Cierra las conexiones de los motores asíncronos (apagado de la app)."""
+    await async_engine.dispose()
+    if async_engine_lectura is not async_engine:
+        await async_engine_lectura.dispose()
+
+def estado_pool() -> dict:
+    """Ocupación actual y esperas acumuladas de cada pool."""
+    pools = {"sync": engine.pool, "async": async_engine.sync_engine.pool}
+    if LECTURA_SEPARADA:
+        pools["lectura_sync"] = engine_lectura.pool
+        pools["lectura_async"] = async_engine_lectura.sync_engine.pool
+    estado = {}
+    for nombre, pool in pools.items():
+        estado[nombre] = {
+            "tamano": pool.size(),
+            "en_uso": pool.checkedout(),
+            "disponibles": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": config.LECTURA_MAX_OVERFLOW if nombre.startswith("lectura") else config.DB_MAX_OVERFLOW,
+            **METRICAS_POOL[nombre].resumen(),
+        }
+    return estado
+
+# =============================================
+# ⏱️ INSTRUMENTACIÓN DE CONSULTAS POR REQUEST
+# =============================================
+class MedicionRequest:
+    """Consultas del request en curso: cantidad, tiempo total en la base y la más lenta."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.mas_lenta = 0.0
+        self.sentencia_mas_lenta = None
+
+    def registrar(self, duracion: float, sentencia: str):
+        self.consultas += 1
+        self.tiempo_db += duracion
+        if duracion > self.mas_lenta:
+            self.mas_lenta = duracion
+            self.sentencia_mas_lenta = sentencia
+
+# La fija el middleware de instrumentación; None fuera de un request
+medicion_actual: ContextVar = ContextVar("medicion_actual", default=None)
+
+# Últimas consultas lentas con su plan (GET /interno/consultas-lentas)
+CONSULTAS_LENTAS = deque(maxlen=50)
+log_sql = obtener_logger("sql")
+
+SENTENCIAS_EXPLICABLES = ("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")
+LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+def _sin_literales(linea: str) -> str:
+    """Quita los valores de los parámetros del plan (cookies, placas): 'abc'::text → '?'::text."""
+    return LITERAL.sub("'?'", linea)
+
+def _explicar(conn, sentencia: str, parametros) -> list:
+    """
+    Plan de la consulta lenta, en la misma conexión (EXPLAIN no la vuelve a
+    ejecutar). Va dentro de un SAVEPOINT: si el EXPLAIN falla, en PostgreSQL
+    solo se revierte el savepoint y la transacción del request sigue usable.
+    """
+    prefijo = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    conn.info["explicando"] = True
     try:
-        cursor = dbapi_connection.cursor()
-        cursor.execute(f"SET TIME ZONE '{TIMEZONE}'")
-    except Exception:
-        # Si la base no soporta la instrucción (ej. SQLite), continuamos sin romper la conexión
-        pass
+        with conn.begin_nested():
+            filas = conn.exec_driver_sql(prefijo + sentencia, parametros).fetchall()
     finally:
-        if cursor is not None:
-            cursor.close()
+        conn.info["explicando"] = False
+    return [_sin_literales(" ".join(str(c) for c in fila)) for fila in filas]
+
+def _antes_de_consulta(conn, cursor, sentencia, parametros, contexto, executemany):
+    conn.info.setdefault("inicio_consulta", []).append(time.perf_counter())
+
+def _despues_de_consulta(conn, cursor, sentencia, parametros, contexto, executemany):
+    duracion = time.perf_counter() - conn.info["inicio_consulta"].pop()
+    if conn.info.get("explicando"):
+        return
+    medicion = medicion_actual.get()
+    if medicion is not None:
+        medicion.registrar(duracion, sentencia)
+
+    umbral = config.DB_CONSULTA_LENTA_MS
+    if umbral > 0 and duracion * 1000 >= umbral and not executemany \
+            and sentencia.lstrip().upper().startswith(SENTENCIAS_EXPLICABLES):
+        try:
+            plan = _explicar(conn, sentencia, parametros)
+        except Exception as e:
+            plan = [f"(sin plan: {e})"]
+        lenta = {"ms": round(duracion * 1000, 1), "sentencia": sentencia.strip(), "plan": plan}
+        CONSULTAS_LENTAS.append(lenta)
+        evento(log_sql, "consulta_lenta", logging.WARNING, **lenta)
+
+for _motor in {engine, async_engine.sync_engine, engine_lectura, async_engine_lectura.sync_engine}:
+    event.listen(_motor, "before_cursor_execute", _antes_de_consulta)
+    event.listen(_motor, "after_cursor_execute", _despues_de_consulta)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncSessionLectura = async_sessionmaker(async_engine_lectura, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
-# Dependency injection para FastAPI
-def get_db():
-    db = SessionLocal()
+# Dependency injection para FastAPI (las rutas usan AsyncSession; SessionLocal
+# queda para benchmarks/ y tests/)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# =============================================
+# 📖 LECTURAS CON READ-YOUR-WRITES
+# =============================================
+# Tras una escritura (p. ej. /ciclos/accion) la respuesta deja la cookie
+# COOKIE_ESCRITURA; mientras dure (LECTURA_CONSISTENCIA_S segundos) las lecturas
+# de ese cliente van al primario, así no ve la réplica atrasada.
+COOKIE_ESCRITURA = "qrlogix_escritura"
+
+def marcar_escritura(response):
+    """Deja en la respuesta la marca de que este cliente acaba de escribir."""
+    if LECTURA_SEPARADA:
+        response.set_cookie(
+            COOKIE_ESCRITURA, f"{time.time():.3f}",
+            max_age=config.LECTURA_CONSISTENCIA_S, httponly=True, samesite="lax",
+        )
+
+def escribio_hace_poco(request: Request) -> bool:
+    valor = request.cookies.get(COOKIE_ESCRITURA)
     try:
+        return valor is not None and time.time() - float(valor) < config.LECTURA_CONSISTENCIA_S
+    except ValueError:
+        return False
+
+# Dependency para las lecturas tolerantes a retraso (réplica o pool de lectura)
+async def get_async_db_lectura(request: Request):
+    fabrica = AsyncSessionLocal if escribio_hace_poco(request) else AsyncSessionLectura
+    async with fabrica() as db:
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,208 @@
+# app/logic/analitica.py
+# Analítica de ciclos por rango de fechas con pandas/numpy.
+# Los escaneos se cargan por lotes en columnas compactas y todas las
+# estadísticas se calculan vectorizadas (sin recorrer filas en Python).
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from app import models
+from app.database import engine_lectura
+from app.logic import archivo
+from app.logic.maquina_ciclo import PUNTOS, NOMBRES_PUNTOS
+from app.utils.timezone import PANAMA_TZ
+
+CODIGO_PUNTO = {p: i + 1 for i, p in enumerate(PUNTOS)}  # punto1 → 1 ... punto5 → 5
+PERCENTILES = [50, 90, 95]
+TAMANO_LOTE = 100_000
+
+# Bit más alto encendido para cada máscara posible de 5 puntos
+_ULTIMO_PUNTO = np.array([m.bit_length() for m in range(1 << len(PUNTOS))], dtype=np.int8)
+
+
+# =============================================
+# 🔹 CARGA
+# =============================================
+
+def _fechas(serie) -> pd.Series:
+    """Columna de fechas a datetime64 en hora de Panamá (las naive se toman como UTC)."""
+    return pd.to_datetime(serie, utc=True).dt.tz_convert(PANAMA_TZ.zone)
+
+
+def _leer(conn, consulta, convertir, lote: int) -> pd.DataFrame:
+    """Lee por lotes y compacta cada lote antes de leer el siguiente."""
+    partes = [convertir(parte) for parte in pd.read_sql(consulta, conn, chunksize=lote)]
+    if not partes:
+        return convertir(pd.DataFrame(columns=[c.name for c in consulta.selected_columns]))
+    return pd.concat(partes, ignore_index=True)
+
+
+def cargar_datos(conn, desde, hasta, lote: int = TAMANO_LOTE):
+    """(ciclos, escaneos) de los ciclos iniciados en [desde, hasta), de la base y del archivo."""
+    en_rango = (models.Ciclo.inicio >= desde) & (models.Ciclo.inicio < hasta)
+
+    consulta_ciclos = (
+        select(models.Ciclo.id.label("ciclo_id"), models.Sesion.placa,
+               models.Ciclo.inicio, models.Ciclo.fin, models.Ciclo.completado)
+        .join(models.Sesion, models.Sesion.id == models.Ciclo.sesion_id)
+        .where(en_rango)
+    )
+    consulta_escaneos = (
+        select(models.Escaneo.ciclo_id, models.Escaneo.punto, models.Escaneo.fecha_hora)
+        .join(models.Ciclo, models.Ciclo.id == models.Escaneo.ciclo_id)
+        .where(en_rango)
+    )
+
+    def compactar_ciclos(df):
+        return df.assign(
+            ciclo_id=df["ciclo_id"].astype("int64"),
+            placa=df["placa"].astype("category"),
+            inicio=_fechas(df["inicio"]),
+            fin=_fechas(df["fin"]),
+            completado=df["completado"].fillna(False).astype(bool),
+        )
+
+    def compactar_escaneos(df):
+        return pd.DataFrame({
+            "ciclo_id": df["ciclo_id"].astype("int64"),
+            "punto": df["punto"].map(CODIGO_PUNTO).fillna(0).astype("int8"),
+            "fecha_hora": _fechas(df["fecha_hora"]),
+        })
+
+    ciclos = _leer(conn, consulta_ciclos, compactar_ciclos, lote)
+    escaneos = _leer(conn, consulta_escaneos, compactar_escaneos, lote)
+
+    # Ciclos ya archivados en Parquet (app/logic/archivo.py)
+    ciclos_archivo = archivo.leer_ciclos(desde, hasta)
+    if ciclos_archivo is not None:
+        ciclos = pd.concat([ciclos, compactar_ciclos(ciclos_archivo[ciclos.columns])], ignore_index=True)
+        escaneos_archivo = archivo.leer_escaneos(desde, hasta)
+        if escaneos_archivo is not None:
+            escaneos = pd.concat([escaneos, compactar_escaneos(escaneos_archivo)], ignore_index=True)
+    ciclos["placa"] = ciclos["placa"].astype("category")  # concat pierde la categoría si difiere
+    return ciclos, escaneos
+
+
+# =============================================
+# 🔹 CÁLCULOS
+# =============================================
+
+def _registros(df: pd.DataFrame, decimales: int = 1) -> list:
+    """DataFrame → lista de dicts para JSON (NaN → None)."""
+    df = df.round(decimales)
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def _percentiles(valores: np.ndarray) -> dict:
+    if len(valores) == 0:
+        return {"n": 0, "media": None, **{f"p{p}": None for p in PERCENTILES}, "max": None}
+    return {
+        "n": int(len(valores)),
+        "media": round(float(valores.mean()), 1),
+        **{f"p{p}": round(float(v), 1) for p, v in zip(PERCENTILES, np.percentile(valores, PERCENTILES))},
+        "max": round(float(valores.max()), 1),
+    }
+
+
+def mascaras_por_ciclo(ciclos: pd.DataFrame, escaneos: pd.DataFrame) -> np.ndarray:
+    """Máscara de puntos escaneados de cada ciclo, en el orden de `ciclos`."""
+    unicos = escaneos.loc[escaneos["punto"] > 0, ["ciclo_id", "punto"]].drop_duplicates()
+    bits = np.left_shift(1, unicos["punto"].to_numpy(np.int64) - 1)
+    mascara = pd.Series(bits, index=unicos["ciclo_id"].to_numpy()).groupby(level=0).sum()
+    return mascara.reindex(ciclos["ciclo_id"].to_numpy(), fill_value=0).to_numpy(np.int64)
+
+
+def matriz_omitidos(mascaras: np.ndarray) -> np.ndarray:
+    """(ciclos × puntos) True si el punto falta antes del último punto escaneado."""
+    numeros = np.arange(1, len(PUNTOS) + 1)
+    presentes = (mascaras[:, None] & (1 << (numeros - 1))) != 0
+    ultimo = _ULTIMO_PUNTO[mascaras]
+    return ~presentes & (ultimo[:, None] > numeros)
+
+
+def permanencia_entre_puntos(escaneos: pd.DataFrame) -> pd.DataFrame:
+    """Minutos entre escaneos consecutivos del mismo ciclo, por tramo (desde → hasta)."""
+    orden = escaneos[escaneos["punto"] > 0].sort_values(["ciclo_id", "fecha_hora"], kind="stable")
+    mismo_ciclo = orden["ciclo_id"].eq(orden["ciclo_id"].shift()).to_numpy()
+    tramos = pd.DataFrame({
+        "desde": orden["punto"].shift().to_numpy()[mismo_ciclo],
+        "hasta": orden["punto"].to_numpy()[mismo_ciclo],
+        "minutos": orden["fecha_hora"].diff().dt.total_seconds().to_numpy()[mismo_ciclo] / 60,
+    })
+    if tramos.empty:
+        return pd.DataFrame(columns=["desde", "hasta", "n", "media", "p50", "p90"])
+
+    grupos = tramos.groupby(["desde", "hasta"])["minutos"]
+    resumen = grupos.agg(n="count", media="mean")
+    cuantiles = grupos.quantile([0.5, 0.9]).unstack()
+    resumen["p50"] = cuantiles[0.5]
+    resumen["p90"] = cuantiles[0.9]
+    resumen = resumen.reset_index()
+    for col in ("desde", "hasta"):
+        resumen[col] = resumen[col].astype(int).map(lambda n: NOMBRES_PUNTOS[PUNTOS[n - 1]])
+    return resumen
+
+
+def calcular_analitica(ciclos: pd.DataFrame, escaneos: pd.DataFrame) -> dict:
+    mascaras = mascaras_por_ciclo(ciclos, escaneos)
+    omitidos = matriz_omitidos(mascaras)
+    con_salto = omitidos.any(axis=1)
+
+    duracion = (ciclos["fin"] - ciclos["inicio"]).dt.total_seconds().to_numpy() / 60
+    cerrados = ciclos["completado"].to_numpy() & ~np.isnan(duracion)
+
+    # 🔹 Por punto: escaneos y tasa de omisión
+    por_punto = pd.DataFrame({
+        "punto": [NOMBRES_PUNTOS[p] for p in PUNTOS],
+        "escaneos": np.bincount(escaneos["punto"].to_numpy(np.int64), minlength=len(PUNTOS) + 1)[1:],
+        "tasa_omision": omitidos.mean(axis=0) * 100 if len(ciclos) else np.zeros(len(PUNTOS)),
+    })
+
+    # 🔹 Por placa
+    por_ciclo = pd.DataFrame({
+        "placa": ciclos["placa"].to_numpy(),
+        "completado": cerrados,
+        "duracion": np.where(cerrados, duracion, np.nan),
+        "con_salto": con_salto,
+    })
+    por_placa = (
+        por_ciclo.groupby("placa", observed=True)
+        .agg(ciclos=("completado", "size"), completados=("completado", "sum"),
+             duracion_p50=("duracion", "median"), tasa_saltos=("con_salto", "mean"))
+        .reset_index()
+        .sort_values("ciclos", ascending=False)
+    )
+    por_placa["tasa_saltos"] *= 100
+
+    # 🔹 Por hora del día (escaneos y ciclos cerrados), total y promedio por día
+    dias = max(1, escaneos["fecha_hora"].dt.normalize().nunique())
+    escaneos_hora = np.bincount(escaneos["fecha_hora"].dt.hour.to_numpy(), minlength=24)
+    cierres_hora = np.bincount(ciclos.loc[cerrados, "fin"].dt.hour.to_numpy(), minlength=24)
+    por_hora = pd.DataFrame({
+        "hora": np.arange(24),
+        "escaneos": escaneos_hora,
+        "ciclos_cerrados": cierres_hora,
+        "escaneos_por_dia": escaneos_hora / dias,
+    })
+
+    return {
+        "resumen": {
+            "ciclos": int(len(ciclos)),
+            "escaneos": int(len(escaneos)),
+            "placas": int(ciclos["placa"].nunique()),
+            "completados": int(cerrados.sum()),
+            "con_saltos": int(con_salto.sum()),
+            "tasa_saltos": round(float(con_salto.mean() * 100), 1) if len(ciclos) else 0.0,
+        },
+        "duracion_ciclo_min": _percentiles(duracion[cerrados]),
+        "permanencia_min": _registros(permanencia_entre_puntos(escaneos)),
+        "por_punto": _registros(por_punto),
+        "por_placa": _registros(por_placa),
+        "por_hora": _registros(por_hora),
+    }
+
+
+def analitica_rango(desde, hasta) -> dict:
+    """Carga el rango con su propia conexión de lectura y devuelve la analítica lista para JSON."""
+    with engine_lectura.connect() as conn:
+        ciclos, escaneos = cargar_datos(conn, desde, hasta)
+    return calcular_analitica(ciclos, escaneos)
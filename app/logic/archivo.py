@@ -0,0 +1,253 @@
+# app/logic/archivo.py
+# Archivo frío del historial: los ciclos cerrados hace más de ARCHIVO_DIAS días
+# salen de ciclos/escaneos y pasan a archivos Parquet comprimidos (zstd), un
+# directorio por mes de inicio del ciclo:
+#
+#   ARCHIVO_DIR/ciclos/mes=2026-01/0000001234-0000002233.parquet
+#   ARCHIVO_DIR/escaneos/mes=2026-01/0000001234-0000002233.parquet
+#
+# Así las tablas que usa el escaneo solo guardan los meses recientes. El informe
+# y la analítica leen las dos capas (base + archivo) sin que la ruta lo note.
+#
+# Cada lote se escribe primero como .tmp, luego se borra de la base y al final
+# se renombra; si el proceso cae en medio, recuperar_pendientes() decide si el
+# .tmp se publica (la base ya no tiene esos ciclos) o se descarta.
+# Requiere pyarrow para leer y escribir Parquet.
+import os
+from datetime import timedelta
+from pathlib import Path
+import pandas as pd
+from sqlalchemy import select, delete, func
+from app import config, models
+from app.database import engine
+from app.logic.bitacora import obtener_logger, evento
+from app.logic.maquina_ciclo import BIT
+from app.utils.timezone import PANAMA_TZ, ahora_panama
+
+log = obtener_logger("archivo")
+
+TABLAS = ("ciclos", "escaneos")
+COMPRESION = "zstd"
+
+
+# =============================================
+# 🔹 RUTAS Y MESES
+# =============================================
+
+def _raiz() -> Path:
+    return Path(config.ARCHIVO_DIR)
+
+
+def _utc(serie) -> pd.Series:
+    """Fechas a datetime64 UTC (las naive se toman como UTC, como en la analítica)."""
+    return pd.to_datetime(serie, utc=True)
+
+
+def meses_del_rango(desde, hasta) -> list:
+    """Meses 'YYYY-MM' (hora de Panamá) que tocan el rango [desde, hasta)."""
+    actual = desde.astimezone(PANAMA_TZ).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    fin = hasta.astimezone(PANAMA_TZ)
+    meses = []
+    while actual < fin:
+        meses.append(actual.strftime("%Y-%m"))
+        actual = (actual + timedelta(days=32)).replace(day=1)
+    return meses
+
+
+def archivos(tabla: str, desde=None, hasta=None) -> list:
+    """Archivos publicados de la tabla, en orden de mes y de ciclo_id."""
+    base = _raiz() / tabla
+    if not base.is_dir():
+        return []
+    if desde is None:
+        directorios = sorted(base.glob("mes=*"))
+    else:
+        directorios = [base / f"mes={mes}" for mes in meses_del_rango(desde, hasta)]
+    return [a for d in directorios if d.is_dir() for a in sorted(d.glob("*.parquet"))]
+
+
+# =============================================
+# 🔹 LECTURA (informe y analítica)
+# =============================================
+
+def _leer(tabla: str, columna_fecha: str, desde, hasta, columnas=None):
+    """Filas archivadas de `tabla` con `columna_fecha` en [desde, hasta), mes por mes."""
+    filtro = [
+        (columna_fecha, ">=", pd.Timestamp(desde).tz_convert("UTC")),
+        (columna_fecha, "<", pd.Timestamp(hasta).tz_convert("UTC")),
+    ]
+    for archivo in archivos(tabla, desde, hasta):
+        df = pd.read_parquet(archivo, columns=columnas, filters=filtro)
+        if len(df):
+            yield df
+
+
+def leer_ciclos(desde, hasta) -> pd.DataFrame:
+    """Ciclos archivados iniciados en [desde, hasta): ciclo_id, sesion_id, placa, inicio, fin, completado, mascara."""
+    partes = list(_leer("ciclos", "inicio", desde, hasta))
+    return pd.concat(partes, ignore_index=True) if partes else None
+
+
+def leer_escaneos(desde, hasta) -> pd.DataFrame:
+    """Escaneos de los ciclos archivados iniciados en [desde, hasta): ciclo_id, punto, fecha_hora."""
+    partes = list(_leer("escaneos", "ciclo_inicio", desde, hasta, ["ciclo_id", "punto", "fecha_hora", "ciclo_inicio"]))
+    return pd.concat(partes, ignore_index=True)[["ciclo_id", "punto", "fecha_hora"]] if partes else None
+
+
+def registros_informe(desde, hasta):
+    """
+    (placa, inicio, fin, completado, mascara) de los ciclos archivados, por
+    inicio: el mismo registro que consulta_informe, para mezclarlo con la base.
+    """
+    columnas = ["ciclo_id", "placa", "inicio", "fin", "completado", "mascara"]
+    for df in _leer("ciclos", "inicio", desde, hasta, columnas):
+        df = df.sort_values(["inicio", "ciclo_id"])
+        fines = df["fin"].astype(object).where(df["fin"].notna(), None)
+        for placa, inicio, fin, completado, mascara in zip(
+            df["placa"], df["inicio"], fines, df["completado"], df["mascara"]
+        ):
+            yield (
+                placa,
+                inicio.to_pydatetime(),
+                fin.to_pydatetime() if fin is not None else None,
+                bool(completado),
+                int(mascara),
+            )
+
+
+# =============================================
+# 🔹 ESCRITURA
+# =============================================
+
+def _mascaras(escaneos: pd.DataFrame) -> pd.Series:
+    """Máscara de puntos por ciclo_id (punto1 = bit 0), como ciclo_estado.puntos_mascara."""
+    bits = escaneos["punto"].map(BIT).fillna(0).astype("int64")
+    unicos = pd.DataFrame({"ciclo_id": escaneos["ciclo_id"], "bit": bits}).drop_duplicates()
+    return unicos.groupby("ciclo_id")["bit"].sum()
+
+
+def escribir_lote(ciclos: pd.DataFrame, escaneos: pd.DataFrame) -> list:
+    """Escribe el lote como .tmp (un archivo por mes y tabla). Devuelve las rutas temporales."""
+    ciclos = ciclos.assign(inicio=_utc(ciclos["inicio"]), fin=_utc(ciclos["fin"]))
+    ciclos["completado"] = ciclos["completado"].fillna(False).astype(bool)
+    ciclos["mascara"] = ciclos["ciclo_id"].map(_mascaras(escaneos)).fillna(0).astype("int8")
+    ciclos["mes"] = ciclos["inicio"].dt.tz_convert(PANAMA_TZ.zone).dt.strftime("%Y-%m")
+
+    escaneos = escaneos.assign(fecha_hora=_utc(escaneos["fecha_hora"]))
+    escaneos = escaneos.merge(ciclos[["ciclo_id", "inicio", "mes"]], on="ciclo_id").rename(
+        columns={"inicio": "ciclo_inicio"}
+    )
+
+    # Los de ciclos van al final: al publicar son los últimos en renombrarse, así
+    # un .tmp de ciclos pendiente siempre tiene a mano sus escaneos
+    temporales = []
+    nombre = f"{ciclos['ciclo_id'].min():010d}-{ciclos['ciclo_id'].max():010d}.parquet"
+    for tabla, df in (("escaneos", escaneos), ("ciclos", ciclos)):
+        for mes, parte in df.groupby("mes"):
+            directorio = _raiz() / tabla / f"mes={mes}"
+            directorio.mkdir(parents=True, exist_ok=True)
+            temporal = directorio / (nombre + ".tmp")
+            parte.drop(columns="mes").to_parquet(temporal, compression=COMPRESION, index=False)
+            temporales.append(temporal)
+    return temporales
+
+
+def publicar(temporales):
+    for temporal in temporales:
+        os.replace(temporal, temporal.with_suffix(""))  # quita .tmp
+
+
+def descartar(temporales):
+    for temporal in temporales:
+        temporal.unlink(missing_ok=True)
+
+
+def recuperar_pendientes(conn) -> dict:
+    """
+    Resuelve los .tmp de un archivado interrumpido: si sus ciclos ya no están en
+    la base, el borrado se confirmó y se publican; si siguen, se descartan.
+    """
+    resultado = {"publicados": 0, "descartados": 0}
+    for temporal in sorted(_raiz().glob("ciclos/mes=*/*.parquet.tmp")):
+        ids = pd.read_parquet(temporal, columns=["ciclo_id"])["ciclo_id"].tolist()
+        quedan = conn.execute(
+            select(func.count()).select_from(models.Ciclo).where(models.Ciclo.id.in_(ids))
+        ).scalar()
+        pareja = _raiz() / "escaneos" / temporal.parent.name / temporal.name
+        lote = ([pareja] if pareja.exists() else []) + [temporal]
+        if quedan:
+            descartar(lote)
+            resultado["descartados"] += 1
+        else:
+            publicar(lote)
+            resultado["publicados"] += 1
+    # escaneos.tmp sin su ciclos.tmp (caída mientras se escribía): el lote no llegó a borrarse
+    for temporal in _raiz().glob("escaneos/mes=*/*.parquet.tmp"):
+        temporal.unlink()
+    return resultado
+
+
+def archivar_ciclos(dias: int = None, lote: int = None, ahora=None) -> dict:
+    """
+    Mueve al archivo los ciclos cerrados con fin anterior a hace `dias` días,
+    por lotes de `lote` ciclos (una transacción por lote).
+    """
+    dias = config.ARCHIVO_DIAS if dias is None else dias
+    lote = lote or config.ARCHIVO_LOTE
+    corte = (ahora or ahora_panama()) - timedelta(days=dias)
+    c, s, e = models.Ciclo, models.Sesion, models.Escaneo
+    resultado = {"corte": corte.isoformat(), "ciclos": 0, "escaneos": 0, "lotes": 0, "archivos": 0}
+
+    with engine.connect() as conn:
+        resultado.update(recuperar_pendientes(conn))
+        conn.commit()
+        ultimo_id = 0
+        while True:
+            ciclos = pd.read_sql(
+                select(c.id.label("ciclo_id"), c.sesion_id, s.placa, c.inicio, c.fin, c.completado)
+                .join(s, s.id == c.sesion_id)
+                .where(c.completado == True, c.fin < corte, c.id > ultimo_id)
+                .order_by(c.id)
+                .limit(lote),
+                conn,
+            )
+            if ciclos.empty:
+                break
+            ids = ciclos["ciclo_id"].astype("int64").tolist()
+            escaneos = pd.read_sql(
+                select(e.id.label("escaneo_id"), e.ciclo_id, e.punto, e.fecha_hora).where(e.ciclo_id.in_(ids)),
+                conn,
+            )
+            conn.commit()  # cierra la transacción de lectura antes de escribir los archivos
+
+            temporales = escribir_lote(ciclos, escaneos)
+            try:
+                with conn.begin():
+                    conn.execute(delete(e).where(e.ciclo_id.in_(ids)))
+                    conn.execute(delete(c).where(c.id.in_(ids)))
+            except Exception:
+                descartar(temporales)
+                raise
+            publicar(temporales)
+
+            resultado["ciclos"] += len(ids)
+            resultado["escaneos"] += len(escaneos)
+            resultado["lotes"] += 1
+            resultado["archivos"] += len(temporales)
+            ultimo_id = ids[-1]
+            evento(log, "archivo_lote", ciclos=len(ids), escaneos=len(escaneos), hasta_ciclo_id=ultimo_id)
+
+    evento(log, "archivo", **resultado)
+    return resultado
+
+
+def estado_archivo() -> dict:
+    """Meses archivados con su número de archivos y tamaño en disco."""
+    meses = {}
+    for tabla in TABLAS:
+        for archivo in archivos(tabla):
+            mes = archivo.parent.name.removeprefix("mes=")
+            datos = meses.setdefault(mes, {"archivos": 0, "bytes": 0})
+            datos["archivos"] += 1
+            datos["bytes"] += archivo.stat().st_size
+    return {"directorio": str(_raiz()), "meses": meses}
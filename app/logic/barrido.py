@@ -0,0 +1,257 @@
+# app/logic/barrido.py
+# Barrido periódico de sesiones vencidas y ciclos abandonados. Apagado por
+# defecto: se activa con BARRIDO_ACTIVO=1 (o true).
+# Las sesiones vencidas solo se filtraban al leer (fin >= ahora) y los ciclos que
+# nadie terminó quedaban abiertos para siempre, inflando ciclo_estado, la vista
+# ciclos_abiertos y el tablero. Cada BARRIDO_INTERVALO_S segundos una tarea
+# asyncio, por lotes de BARRIDO_LOTE filas y con un commit por lote:
+#
+#   1. cierra (o elimina, BARRIDO_ACCION=eliminar) los ciclos abiertos sin
+#      escaneos desde hace BARRIDO_CICLO_ABANDONO_MIN minutos o cuya sesión ya
+#      terminó, y deja el registro en ciclo_manual con registrado_por='Sistema';
+#   2. marca cerrada = TRUE en las sesiones con fin < ahora.
+#
+# Las sentencias que cierran o eliminan repiten la condición de abandono
+# (_retirar_abandonados) y solo los ciclos que realmente tocaron (RETURNING) van
+# a ciclo_manual y a la vista en vivo: un escaneo que llega entre la consulta y
+# la escritura mantiene su ciclo abierto.
+#
+# En PostgreSQL toma un advisory lock, así con varios workers solo uno barre.
+import asyncio
+import json
+import logging
+import time
+from datetime import timedelta
+from sqlalchemy import select, update, delete, func, text, bindparam, DateTime
+from app import config, models
+from app.database import async_engine, ES_POSTGRES
+from app.logic.bitacora import obtener_logger, evento
+from app.logic.ciclos_vivo import publicar_ciclo
+from app.utils.timezone import ahora_panama, convertir_a_panama
+
+log = obtener_logger("barrido")
+
+CLAVE_BLOQUEO = 0x51524C01  # pg_try_advisory_lock: un solo barrido a la vez entre workers
+
+MOTIVO_ABANDONO = "Ciclo abandonado"
+MOTIVO_SESION = "Sesión vencida"
+
+SQL_REGISTRO_MANUAL = text("""
+    INSERT INTO ciclo_manual (placa, fecha_eliminacion, sesion_id, ciclo_id, motivo, detalles, registrado_por)
+    VALUES (:placa, :fecha, :sesion_id, :ciclo_id, :motivo, :detalles, 'Sistema')
+""").bindparams(bindparam("fecha", type_=DateTime(timezone=True)))
+
+
+def _sesion_terminada(sesion_id, ahora):
+    """La sesión del ciclo está cerrada o vencida (subconsulta correlacionada)."""
+    s = models.Sesion
+    return (
+        select(s.id)
+        .where(s.id == sesion_id, (s.cerrada == True) | (s.fin < ahora))
+        .exists()
+    )
+
+
+def _consulta_abandonados(ahora, limite_actividad, lote: int):
+    """Ciclos abiertos sin actividad desde `limite_actividad` o con la sesión terminada."""
+    c, s, e = models.Ciclo, models.Sesion, models.CicloEstado
+    ultimo = func.coalesce(e.ultimo_escaneo, c.inicio)
+    sesion_terminada = (s.cerrada == True) | (s.fin < ahora)
+    return (
+        select(
+            c.id, c.sesion_id, s.placa, ultimo.label("ultimo"), sesion_terminada.label("sesion_terminada"),
+            e.ciclo_id.is_(None).label("sin_estado"),
+        )
+        .join(s, s.id == c.sesion_id)
+        .outerjoin(e, e.ciclo_id == c.id)
+        .where(c.completado == False, (ultimo < limite_actividad) | sesion_terminada)
+        .order_by(c.id)
+        .limit(lote)
+    )
+
+
+def _retirar_abandonados(ids_con_estado, ids_sin_estado, ahora, limite_actividad):
+    """
+    Sentencias que sacan de ciclo_estado y de los abiertos solo los ciclos que
+    siguen abandonados al momento de escribir: un escaneo que llegó después de
+    la consulta de candidatos los deja fuera.
+
+    El DELETE de ciclo_estado repite la condición y, en PostgreSQL, espera al
+    escaneo que esté actualizando esa fila y la vuelve a evaluar con el valor
+    nuevo. Los ciclos que todavía no tenían fila en ciclo_estado se comprueban
+    por su inicio y exigiendo que siga sin fila.
+    """
+    c, e = models.Ciclo, models.CicloEstado
+    quitar_estado = (
+        delete(e)
+        .where(
+            e.ciclo_id.in_(ids_con_estado),
+            (e.ultimo_escaneo < limite_actividad) | _sesion_terminada(e.sesion_id, ahora),
+        )
+        .returning(e.ciclo_id)
+    )
+    sin_estado_vigente = (
+        c.id.in_(ids_sin_estado)
+        & ~select(e.ciclo_id).where(e.ciclo_id == c.id).exists()
+        & ((c.inicio < limite_actividad) | _sesion_terminada(c.sesion_id, ahora))
+    )
+    return quitar_estado, sin_estado_vigente
+
+
+class BarridoVencidos:
+    """Tarea de fondo que barre cada `intervalo_s`; `ejecutar()` hace una pasada completa."""
+
+    def __init__(self, intervalo_s: float = 300, abandono_min: int = 480, lote: int = 500, accion: str = "cerrar"):
+        if accion not in ("cerrar", "eliminar"):
+            raise ValueError(f"BARRIDO_ACCION inválida: {accion!r} (use 'cerrar' o 'eliminar')")
+        self.intervalo_s = intervalo_s
+        self.abandono_min = abandono_min
+        self.lote = lote
+        self.accion = accion
+        self._tarea = None
+        self._parar = asyncio.Event()
+        self._metricas = {
+            "pasadas": 0, "omitidas": 0, "errores": 0,
+            "sesiones_cerradas": 0, "ciclos_cerrados": 0, "ciclos_eliminados": 0,
+            "ultima_pasada": None,
+        }
+
+    async def iniciar(self):
+        self._parar.clear()
+        self._tarea = asyncio.create_task(self._trabajar())
+
+    async def detener(self):
+        self._parar.set()
+        if self._tarea is not None:
+            await self._tarea  # termina el lote en curso
+            self._tarea = None
+
+    async def _trabajar(self):
+        while not self._parar.is_set():
+            try:
+                await self.ejecutar()
+            except Exception as e:
+                self._metricas["errores"] += 1
+                evento(log, "barrido_error", logging.ERROR, error=str(e))
+            try:
+                await asyncio.wait_for(self._parar.wait(), timeout=self.intervalo_s)
+            except asyncio.TimeoutError:
+                pass
+
+    async def ejecutar(self) -> dict:
+        """Una pasada: ciclos abandonados y sesiones vencidas, por lotes. Devuelve sus métricas."""
+        inicio = time.perf_counter()
+        ahora = ahora_panama()
+        pasada = {"inicio": ahora.isoformat(), "lotes": 0, "sesiones_cerradas": 0, "ciclos": 0, "accion": self.accion}
+
+        async with async_engine.connect() as conn:
+            if ES_POSTGRES:
+                bloqueado = (await conn.execute(
+                    text("SELECT pg_try_advisory_lock(:clave)"), {"clave": CLAVE_BLOQUEO}
+                )).scalar()
+                await conn.commit()
+                if not bloqueado:
+                    self._metricas["omitidas"] += 1
+                    evento(log, "barrido_omitido", motivo="otro worker está barriendo")
+                    return {**pasada, "omitida": True}
+            try:
+                pasada["ciclos"] = await self._barrer_ciclos(conn, ahora, pasada)
+                pasada["sesiones_cerradas"] = await self._cerrar_sesiones(conn, ahora, pasada)
+            finally:
+                if ES_POSTGRES:
+                    await conn.rollback()
+                    await conn.execute(text("SELECT pg_advisory_unlock(:clave)"), {"clave": CLAVE_BLOQUEO})
+                    await conn.commit()
+
+        pasada["duracion_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+        self._metricas["pasadas"] += 1
+        self._metricas["sesiones_cerradas"] += pasada["sesiones_cerradas"]
+        self._metricas["ciclos_eliminados" if self.accion == "eliminar" else "ciclos_cerrados"] += pasada["ciclos"]
+        self._metricas["ultima_pasada"] = pasada
+        evento(log, "barrido", **pasada)
+        return pasada
+
+    async def _barrer_ciclos(self, conn, ahora, pasada: dict) -> int:
+        limite_actividad = ahora - timedelta(minutes=self.abandono_min)
+        hecho = "eliminado" if self.accion == "eliminar" else "cerrado"
+        total = 0
+        while not self._parar.is_set():
+            filas = (await conn.execute(_consulta_abandonados(ahora, limite_actividad, self.lote))).fetchall()
+            if not filas:
+                break
+            candidatos = {f.id: f for f in filas}
+            quitar_estado, sin_estado_vigente = _retirar_abandonados(
+                [f.id for f in filas if not f.sin_estado], [f.id for f in filas if f.sin_estado],
+                ahora, limite_actividad,
+            )
+            retirados = (await conn.execute(quitar_estado)).scalars().all()
+            c = models.Ciclo
+            vigentes = (c.completado == False) & (c.id.in_(retirados) | sin_estado_vigente)
+            ids = (await conn.execute(
+                update(c).where(vigentes).values(completado=True, fin=ahora).returning(c.id)
+            )).scalars().all()
+            if self.accion == "eliminar" and ids:
+                await conn.execute(delete(models.Escaneo).where(models.Escaneo.ciclo_id.in_(ids)))
+                await conn.execute(delete(c).where(c.id.in_(ids)))
+            barridos = [candidatos[i] for i in sorted(ids)]
+            if barridos:
+                await conn.execute(SQL_REGISTRO_MANUAL, [
+                    {
+                        "placa": f.placa,
+                        "fecha": ahora,
+                        "sesion_id": f.sesion_id,
+                        "ciclo_id": f.id,
+                        "motivo": MOTIVO_SESION if f.sesion_terminada else MOTIVO_ABANDONO,
+                        "detalles": json.dumps({
+                            "ultimo_escaneo": convertir_a_panama(f.ultimo).isoformat(),
+                            "umbral_min": self.abandono_min,
+                            "accion": self.accion,
+                        }),
+                    }
+                    for f in barridos
+                ])
+            await conn.commit()
+
+            for f in barridos:
+                await publicar_ciclo(hecho, f.placa, f.id)
+            total += len(barridos)
+            pasada["lotes"] += 1
+            if len(filas) < self.lote:
+                break
+        return total
+
+    async def _cerrar_sesiones(self, conn, ahora, pasada: dict) -> int:
+        # La caché de identidad ya descarta sola las sesiones con fin < ahora
+        s = models.Sesion
+        total = 0
+        while not self._parar.is_set():
+            ids = (await conn.execute(
+                select(s.id).where(s.cerrada == False, s.fin < ahora).order_by(s.fin).limit(self.lote)
+            )).scalars().all()
+            if not ids:
+                break
+            await conn.execute(update(s).where(s.id.in_(ids)).values(cerrada=True))
+            await conn.commit()
+            total += len(ids)
+            pasada["lotes"] += 1
+            if len(ids) < self.lote:
+                break
+        return total
+
+    def metricas(self) -> dict:
+        return {
+            "activo": self._tarea is not None,
+            "intervalo_s": self.intervalo_s,
+            "abandono_min": self.abandono_min,
+            "lote": self.lote,
+            "accion": self.accion,
+            **self._metricas,
+        }
+
+
+barrido = BarridoVencidos(
+    intervalo_s=config.BARRIDO_INTERVALO_S,
+    abandono_min=config.BARRIDO_CICLO_ABANDONO_MIN,
+    lote=config.BARRIDO_LOTE,
+    accion=config.BARRIDO_ACCION,
+)
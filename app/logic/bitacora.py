@@ -0,0 +1,139 @@
+# app/logic/bitacora.py
+# Logs estructurados sin bloquear el event loop. Cada evento se encola en memoria
+# (QueueHandler) y un hilo aparte lo formatea como una línea JSON y lo escribe en
+# stdout (QueueListener), así un print lento en Render no frena los requests.
+#
+# Uso:  log = obtener_logger("ciclos")
+#       evento(log, "ciclo_cerrado", placa=placa, ciclo_id=ciclo.id)
+#
+# Los eventos de alto volumen (p. ej. "escaneo", "request") se pueden muestrear
+# con LOG_MUESTREO="escaneo=0.1,request=0.05". Las advertencias y errores nunca
+# se descartan.
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from app import config
+
+RAIZ = "qrlogix"
+
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por evento: hora UTC, nivel, logger, evento y sus campos."""
+
+    def format(self, record) -> str:
+        linea = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname.lower(),
+            "logger": record.name,
+            "evento": record.getMessage(),
+            **getattr(record, "datos", {}),
+        }
+        if record.exc_info:
+            linea["excepcion"] = self.formatException(record.exc_info)
+        return json.dumps(linea, ensure_ascii=False, default=str)
+
+
+class FormatoTexto(logging.Formatter):
+    """Para desarrollo local: evento y campos en una línea legible."""
+
+    def format(self, record) -> str:
+        campos = " ".join(f"{k}={v}" for k, v in getattr(record, "datos", {}).items())
+        texto = f"{record.levelname:<7} {record.name} {record.getMessage()} {campos}".rstrip()
+        if record.exc_info:
+            texto += "\n" + self.formatException(record.exc_info)
+        return texto
+
+
+class FiltroMuestreo(logging.Filter):
+    """Deja pasar solo una fracción de los eventos INFO/DEBUG configurados en LOG_MUESTREO."""
+
+    def __init__(self, tasas: dict):
+        super().__init__()
+        self.tasas = tasas
+
+    def filter(self, record) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        tasa = self.tasas.get(record.msg)
+        return tasa is None or random.random() < tasa
+
+
+class ManejadorCola(logging.handlers.QueueHandler):
+    """QueueHandler con cola acotada: si el escritor se atrasa, descarta en vez de bloquear."""
+
+    def __init__(self, cola):
+        super().__init__(cola)
+        self.descartados = 0
+
+    def prepare(self, record):
+        # El formato lo hace el hilo escritor; aquí solo se congela el mensaje
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+def _tasas_muestreo(texto: str) -> dict:
+    """'escaneo=0.1,request=0.05' → {"escaneo": 0.1, "request": 0.05}"""
+    tasas = {}
+    for parte in filter(None, (p.strip() for p in texto.split(","))):
+        nombre, _, tasa = parte.partition("=")
+        tasas[nombre.strip()] = float(tasa)
+    return tasas
+
+
+_manejador = None
+_escritor = None
+
+
+def configurar_logs():
+    """Conecta el logger 'qrlogix' a la cola y arranca el hilo escritor (idempotente)."""
+    global _manejador, _escritor
+    if _escritor is not None:
+        return
+
+    salida = logging.StreamHandler(sys.stdout)
+    salida.setFormatter(FormatoJSON() if config.LOG_FORMATO == "json" else FormatoTexto())
+
+    _manejador = ManejadorCola(queue.Queue(maxsize=config.LOG_COLA_MAX))
+    _manejador.addFilter(FiltroMuestreo(_tasas_muestreo(config.LOG_MUESTREO)))
+
+    raiz = logging.getLogger(RAIZ)
+    raiz.setLevel(config.LOG_NIVEL)
+    raiz.handlers = [_manejador]
+    raiz.propagate = False
+
+    _escritor = logging.handlers.QueueListener(_manejador.queue, salida, respect_handler_level=True)
+    _escritor.start()
+
+
+def detener_logs():
+    """Vacía lo pendiente y detiene el hilo escritor."""
+    global _escritor
+    if _escritor is not None:
+        _escritor.stop()
+        _escritor = None
+
+
+def descartados() -> int:
+    """Eventos perdidos porque la cola estaba llena."""
+    return _manejador.descartados if _manejador is not None else 0
+
+
+def obtener_logger(nombre: str) -> logging.Logger:
+    return logging.getLogger(f"{RAIZ}.{nombre}")
+
+
+def evento(logger: logging.Logger, nombre: str, nivel: int = logging.INFO, exc_info=None, **campos):
+    """Registra el evento `nombre` con sus campos (placa, punto, ciclo_id, latencia_ms...)."""
+    if logger.isEnabledFor(nivel):
+        logger.log(nivel, nombre, exc_info=exc_info, extra={"datos": campos})
@@ -0,0 +1,135 @@
+# app/logic/cache_identidad.py
+# Caché de identidad del escaneo: device_cookie → (camion_id, sesion_id, placa, fin).
+# Evita resolver cookie → camión → sesión activa en cada escaneo; la respuesta
+# casi nunca cambia durante las 15 horas de una sesión.
+#
+# Cualquier backend compartido (para varios workers) debe ofrecer los mismos
+# métodos: obtener, guardar, invalidar, invalidar_sesion y estadisticas.
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import NamedTuple, Optional
+from app import config
+from app.utils.timezone import ahora_panama, convertir_a_panama
+
+
+class Identidad(NamedTuple):
+    camion_id: int
+    sesion_id: int
+    placa: str
+    fin: datetime  # fin de la sesión, en hora de Panamá
+
+
+class CacheIdentidadMemoria:
+    """LRU acotado con TTL dentro del proceso. Una entrada vence por TTL o cuando termina la sesión."""
+
+    def __init__(self, max_entradas: int = 10_000, ttl_segundos: float = 300):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._datos = OrderedDict()  # cookie → (identidad, vence)
+        self._por_sesion = {}        # sesion_id → set de cookies
+        self._lock = threading.Lock()
+        self._contadores = dict.fromkeys(
+            ["aciertos", "fallos", "expiraciones", "invalidaciones", "desalojos"], 0
+        )
+
+    def obtener(self, cookie: str) -> Optional[Identidad]:
+        with self._lock:
+            entrada = self._datos.get(cookie)
+            if entrada is None:
+                self._contadores["fallos"] += 1
+                return None
+            identidad, vence = entrada
+            if time.monotonic() >= vence or ahora_panama() >= identidad.fin:
+                self._quitar(cookie)
+                self._contadores["expiraciones"] += 1
+                self._contadores["fallos"] += 1
+                return None
+            self._datos.move_to_end(cookie)
+            self._contadores["aciertos"] += 1
+            return identidad
+
+    def guardar(self, cookie: str, identidad: Identidad):
+        identidad = identidad._replace(fin=convertir_a_panama(identidad.fin))
+        with self._lock:
+            if cookie in self._datos:
+                self._quitar(cookie)
+            self._datos[cookie] = (identidad, time.monotonic() + self.ttl_segundos)
+            self._por_sesion.setdefault(identidad.sesion_id, set()).add(cookie)
+            while len(self._datos) > self.max_entradas:
+                self._quitar(next(iter(self._datos)))
+                self._contadores["desalojos"] += 1
+
+    def invalidar(self, *cookies):
+        with self._lock:
+            for cookie in cookies:
+                if cookie in self._datos:
+                    self._quitar(cookie)
+                    self._contadores["invalidaciones"] += 1
+
+    def invalidar_sesion(self, sesion_id: int):
+        """Quita todas las cookies que apuntan a la sesión (reasignada o terminada)."""
+        with self._lock:
+            for cookie in list(self._por_sesion.get(sesion_id, ())):
+                self._quitar(cookie)
+                self._contadores["invalidaciones"] += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self._por_sesion.clear()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            consultas = self._contadores["aciertos"] + self._contadores["fallos"]
+            return {
+                "backend": "memoria",
+                "entradas": len(self._datos),
+                "max_entradas": self.max_entradas,
+                "ttl_segundos": self.ttl_segundos,
+                **self._contadores,
+                "tasa_aciertos": round(self._contadores["aciertos"] / consultas, 3) if consultas else 0.0,
+            }
+
+    def _quitar(self, cookie: str):
+        identidad, _ = self._datos.pop(cookie)
+        cookies = self._por_sesion.get(identidad.sesion_id)
+        if cookies is not None:
+            cookies.discard(cookie)
+            if not cookies:
+                del self._por_sesion[identidad.sesion_id]
+
+
+class CacheIdentidadNula:
+    """Sin caché: cada escaneo resuelve la identidad en la base (CACHE_IDENTIDAD_BACKEND=ninguno)."""
+
+    def obtener(self, cookie):
+        return None
+
+    def guardar(self, cookie, identidad):
+        pass
+
+    def invalidar(self, *cookies):
+        pass
+
+    def invalidar_sesion(self, sesion_id):
+        pass
+
+    def limpiar(self):
+        pass
+
+    def estadisticas(self) -> dict:
+        return {"backend": "ninguno"}
+
+
+def crear_cache_identidad():
+    if config.CACHE_IDENTIDAD_BACKEND == "ninguno":
+        return CacheIdentidadNula()
+    return CacheIdentidadMemoria(
+        max_entradas=config.CACHE_IDENTIDAD_MAX,
+        ttl_segundos=config.CACHE_IDENTIDAD_TTL,
+    )
+
+
+cache_identidad = crear_cache_identidad()
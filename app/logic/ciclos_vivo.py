@@ -0,0 +1,72 @@
+# app/logic/ciclos_vivo.py
+# Ciclos abiertos en vivo: filas de la vista /ciclos y eventos que se publican
+# cuando un ciclo se agrega, cambia, se cierra o se elimina.
+import logging
+from sqlalchemy import select
+from app import models
+from app.logic.pubsub import pubsub
+from app.logic.bitacora import obtener_logger, evento as registrar_evento
+from app.logic.maquina_ciclo import numeros_de_mascara
+from app.utils.timezone import ahora_panama, convertir_a_panama, formatear_hora_panama
+
+CANAL_CICLOS = "ciclos"
+log = obtener_logger("ciclos")
+
+
+def fila_ciclo(ciclo_id, placa, puntos_mascara, inicio, ultimo_escaneo, ahora=None):
+    """Fila de la tabla de ciclos abiertos; None si le faltan fechas."""
+    inicio_dt = convertir_a_panama(inicio)
+    ultimo_dt = convertir_a_panama(ultimo_escaneo)
+    if not inicio_dt or not ultimo_dt:
+        return None
+
+    # 🔹 Puntos escaneados a partir de la máscara (números únicos en orden)
+    numeros = numeros_de_mascara(puntos_mascara or 0)
+
+    # 🔹 Minutos desde el inicio hasta ahora en Panamá
+    delta_min = ((ahora or ahora_panama()) - inicio_dt).total_seconds() / 60
+
+    return {
+        "ciclo_id": ciclo_id,
+        "placa": placa,
+        "puntos_escaneados": ", ".join(str(n) for n in numeros) if numeros else "-",
+        "inicio": formatear_hora_panama(inicio_dt),
+        "inicio_iso": inicio_dt.isoformat(),
+        "ultimo_escaneo": formatear_hora_panama(ultimo_dt),
+        "minutos_transcurridos": f"{int(round(delta_min)):02d} min",
+    }
+
+
+async def listar_ciclos_abiertos(db) -> list:
+    """Filas de todos los ciclos abiertos (tabla ciclo_estado), el más reciente primero."""
+    estado = models.CicloEstado
+    resultados = (await db.execute(
+        select(estado.ciclo_id, estado.placa, estado.puntos_mascara, estado.inicio, estado.ultimo_escaneo)
+        .order_by(estado.ultimo_escaneo.desc())
+    )).fetchall()
+
+    ahora = ahora_panama()
+    filas = (fila_ciclo(*c, ahora=ahora) for c in resultados)
+    return [f for f in filas if f is not None]  # evita filas incompletas
+
+
+async def publicar_ciclo(evento: str, placa: str, ciclo_id: int, estado=None):
+    """
+    Publica un evento de ciclo (agregado, cambiado, cerrado o eliminado).
+    Llamar después del commit; un fallo al publicar no afecta la operación.
+    """
+    mensaje = {"evento": evento, "placa": placa, "ciclo_id": ciclo_id}
+    if estado is not None:
+        mensaje["fila"] = fila_ciclo(
+            estado.ciclo_id, estado.placa, estado.puntos_mascara, estado.inicio, estado.ultimo_escaneo
+        )
+    try:
+        await pubsub.publicar(CANAL_CICLOS, mensaje)
+    except Exception as e:
+        registrar_evento(log, "ciclo_publicacion_fallida", logging.WARNING, evento=evento, placa=placa, error=str(e))
+
+
+async def publicar_registro(registro: dict):
+    """Publica el evento que dejó un escaneo (si cambió algo)."""
+    if registro.get("evento"):
+        await publicar_ciclo(registro["evento"], registro["placa"], registro["ciclo"].id, registro.get("estado"))
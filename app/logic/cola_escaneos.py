@@ -0,0 +1,323 @@
+# app/logic/cola_escaneos.py
+# Ingesta diferida de escaneos (INGESTA_DIFERIDA=1) para los picos de cambio de turno.
+# El escaneo se guarda en una cola local durable (SQLite en modo WAL) y se confirma
+# al conductor de inmediato; un worker asyncio la vacía por lotes, en orden de
+# llegada, aplicando procesar_escaneo_qr con la hora en que se recibió cada
+# escaneo (así se respeta la ventana de 60 minutos contra duplicados).
+#
+# Con varios workers sobre el mismo archivo, cada uno reclama su lote en una sola
+# sentencia (UPDATE ... SET tomado_por ... RETURNING): ninguna fila la aplican
+# dos workers, y no se reclaman escaneos de un teléfono que tiene otros en manos
+# de otro worker, así se aplican en orden. Lo reclamado por un worker que cayó
+# se libera a los COLA_ESCANEOS_RECLAMO_S segundos.
+#
+# Si el proceso cae entre el commit en la base y el borrado en la cola, el lote se
+# vuelve a aplicar. Cada fila lleva una clave (uuid4) que se guarda en
+# ingesta_aplicada en la misma transacción que el escaneo: al reaplicar, las filas
+# con clave ya registrada se saltan (la ventana de 60 minutos no bastaba: un
+# punto5 repetido abría un ciclo nuevo y lo eliminaba por incompleto).
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete
+from app import config, models
+from app.database import AsyncSessionLocal
+from app.logic.bitacora import obtener_logger, evento
+from app.logic.ciclos_vivo import publicar_registro
+from app.logic.gestion_ciclos import procesar_escaneo_qr, resolver_contexto_escaneo
+from app.logic.maquina_ciclo import TERMINALES, ProgresoCiclo
+from app.utils.timezone import ahora_panama, formatear_hora_panama, convertir_a_panama
+
+log = obtener_logger("cola")
+
+# Claves de ingesta_aplicada: basta con guardarlas hasta que su fila sale de la cola
+CLAVES_RETENCION = timedelta(days=1)
+PURGA_CADA_S = 3600
+
+
+class ColaEscaneos:
+    """Cola FIFO durable en un archivo SQLite (WAL). Las filas se borran al aplicarse."""
+
+    def __init__(self, ruta: str, reclamo_s: float = 300):
+        self.ruta = ruta
+        self.reclamo_s = reclamo_s
+        self.trabajador = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def abrir(self):
+        if self._conn is not None:
+            return
+        conn = sqlite3.connect(self.ruta, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")  # el escaneo confirmado sobrevive a un corte de luz
+        conn.execute("PRAGMA busy_timeout=5000")  # otros workers escribiendo el mismo archivo
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS pendientes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                device_cookie TEXT NOT NULL,
+                punto TEXT NOT NULL,
+                fecha_hora TEXT NOT NULL,
+                clave TEXT,
+                tomado_por TEXT,
+                tomado_en REAL
+            )
+        """)
+        # Archivos creados antes de las claves y del reclamo por worker
+        columnas = {fila[1] for fila in conn.execute("PRAGMA table_info(pendientes)")}
+        for columna, tipo in (("clave", "TEXT"), ("tomado_por", "TEXT"), ("tomado_en", "REAL")):
+            if columna not in columnas:
+                conn.execute(f"ALTER TABLE pendientes ADD COLUMN {columna} {tipo}")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS fallidos (
+                id INTEGER PRIMARY KEY,
+                device_cookie TEXT NOT NULL,
+                punto TEXT NOT NULL,
+                fecha_hora TEXT NOT NULL,
+                error TEXT,
+                registrado TEXT NOT NULL
+            )
+        """)
+        self._conn = conn
+
+    def cerrar(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def encolar(self, device_cookie: str, punto: str, fecha_hora: datetime) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO pendientes (device_cookie, punto, fecha_hora, clave) VALUES (?, ?, ?, ?)",
+                (device_cookie, punto, fecha_hora.isoformat(), uuid.uuid4().hex),
+            )
+            return cursor.lastrowid
+
+    def tomar(self, limite: int) -> list:
+        """
+        Reclama para este worker las `limite` filas libres más antiguas (más las que
+        ya tenía) y las devuelve en orden: (id, device_cookie, punto, fecha_hora, clave).
+        """
+        vencido = time.time() - self.reclamo_s
+        with self._lock:
+            filas = self._conn.execute(
+                """
+                UPDATE pendientes SET tomado_por = :yo, tomado_en = :ahora
+                WHERE id IN (
+                    SELECT id FROM pendientes
+                    WHERE (tomado_por IS NULL OR tomado_por = :yo OR tomado_en < :vencido)
+                      AND device_cookie NOT IN (
+                          SELECT device_cookie FROM pendientes
+                          WHERE tomado_por <> :yo AND tomado_en >= :vencido
+                      )
+                    ORDER BY id LIMIT :limite
+                )
+                RETURNING id, device_cookie, punto, fecha_hora, clave
+                """,
+                {"yo": self.trabajador, "ahora": time.time(), "vencido": vencido, "limite": limite},
+            ).fetchall()
+        return sorted(
+            (i, cookie, punto, datetime.fromisoformat(fecha), clave) for i, cookie, punto, fecha, clave in filas
+        )
+
+    def confirmar(self, ids: list):
+        with self._lock:
+            self._conn.executemany("DELETE FROM pendientes WHERE id = ?", [(i,) for i in ids])
+
+    def mover_a_fallidos(self, fila, error: str):
+        id_, cookie, punto, fecha_hora, _ = fila
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fallidos (id, device_cookie, punto, fecha_hora, error, registrado) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (id_, cookie, punto, fecha_hora.isoformat(), error[:500], ahora_panama().isoformat()),
+            )
+            self._conn.execute("DELETE FROM pendientes WHERE id = ?", (id_,))
+            self._conn.execute("COMMIT")
+
+    def estado(self) -> dict:
+        """Profundidad de la cola, escaneo más antiguo pendiente y fallidos."""
+        with self._lock:
+            profundidad, antiguo, tomados = self._conn.execute(
+                "SELECT COUNT(*), MIN(fecha_hora), COUNT(tomado_por) FROM pendientes"
+            ).fetchone()
+            fallidos = self._conn.execute("SELECT COUNT(*) FROM fallidos").fetchone()[0]
+        return {
+            "profundidad": profundidad,
+            "tomados": tomados,
+            "mas_antiguo": datetime.fromisoformat(antiguo) if antiguo else None,
+            "fallidos": fallidos,
+        }
+
+
+class IngestaDiferida:
+    """Worker que vacía la cola por lotes (un commit por lote) y publica los cambios."""
+
+    def __init__(self, cola: ColaEscaneos, lote: int = 200, espera_s: float = 0.2):
+        self.cola = cola
+        self.lote = lote
+        self.espera_s = espera_s
+        self._tarea = None
+        self._aviso = asyncio.Event()
+        self._activo = False
+        self._proxima_purga = 0.0
+        self._metricas = {
+            "encolados": 0, "aplicados": 0, "lotes": 0, "fallidos": 0,
+            "ultimo_lote_ms": 0.0, "ultimo_retraso_s": 0.0,
+        }
+
+    async def iniciar(self):
+        self.cola.abrir()
+        self._activo = True
+        self._tarea = asyncio.create_task(self._trabajar())
+
+    async def detener(self):
+        self._activo = False
+        self._aviso.set()
+        if self._tarea is not None:
+            await self._tarea  # termina el lote en curso; lo pendiente queda en el archivo
+            self._tarea = None
+        self.cola.cerrar()
+
+    async def encolar(self, device_cookie: str, punto: str, fecha_hora: datetime) -> int:
+        id_ = await asyncio.to_thread(self.cola.encolar, device_cookie, punto, fecha_hora)
+        self._metricas["encolados"] += 1
+        self._aviso.set()
+        return id_
+
+    async def _trabajar(self):
+        while self._activo:
+            self._aviso.clear()  # antes de leer, para no perder un aviso que llegue durante el lote
+            try:
+                aplicados = await self.drenar_lote()
+            except Exception as e:
+                evento(log, "cola_error_drenado", logging.ERROR, error=str(e))
+                aplicados = 0
+            if aplicados < self.lote and self._activo:
+                try:
+                    await asyncio.wait_for(self._aviso.wait(), timeout=self.espera_s * 5)
+                except asyncio.TimeoutError:
+                    pass
+                await asyncio.sleep(self.espera_s)  # junta los escaneos de la ráfaga en un lote
+
+    async def drenar_lote(self) -> int:
+        """Aplica hasta `lote` escaneos en una transacción. Devuelve cuántos se tomaron."""
+        filas = await asyncio.to_thread(self.cola.tomar, self.lote)
+        if not filas:
+            return 0
+
+        inicio = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            try:
+                registros = await db.run_sync(_aplicar_lote, filas)
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                evento(log, "cola_lote_fallido", logging.WARNING, escaneos=len(filas), error=str(e))
+                registros = await self._aplicar_uno_por_uno(db, filas)
+            else:
+                await asyncio.to_thread(self.cola.confirmar, [f[0] for f in filas])
+
+        for registro in registros:
+            await publicar_registro(registro)
+
+        if time.monotonic() >= self._proxima_purga:
+            self._proxima_purga = time.monotonic() + PURGA_CADA_S
+            async with AsyncSessionLocal() as db:
+                await db.run_sync(_purgar_claves, ahora_panama() - CLAVES_RETENCION)
+
+        self._metricas["lotes"] += 1
+        self._metricas["aplicados"] += len(filas)
+        self._metricas["ultimo_lote_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+        self._metricas["ultimo_retraso_s"] = round(
+            (ahora_panama() - convertir_a_panama(filas[-1][3])).total_seconds(), 3
+        )
+        return len(filas)
+
+    async def _aplicar_uno_por_uno(self, db, filas) -> list:
+        registros = []
+        for fila in filas:
+            try:
+                registros += await db.run_sync(_aplicar_lote, [fila])
+                await db.commit()
+                await asyncio.to_thread(self.cola.confirmar, [fila[0]])
+            except Exception as e:
+                await db.rollback()
+                await asyncio.to_thread(self.cola.mover_a_fallidos, fila, str(e))
+                self._metricas["fallidos"] += 1
+                evento(log, "cola_escaneo_descartado", logging.ERROR, id=fila[0], punto=fila[2], error=str(e))
+        return registros
+
+    def metricas(self) -> dict:
+        estado = self.cola.estado() if self._activo else {
+            "profundidad": None, "tomados": None, "mas_antiguo": None, "fallidos": None,
+        }
+        antiguo = estado.pop("mas_antiguo")
+        return {
+            "activa": self._activo,
+            **estado,
+            "retraso_s": round((ahora_panama() - convertir_a_panama(antiguo)).total_seconds(), 3) if antiguo else 0.0,
+            **self._metricas,
+        }
+
+
+def _aplicar_lote(db, filas) -> list:
+    """
+    Aplica las filas en orden sobre la sesión síncrona, sin commit, saltando las
+    que ya se aplicaron (clave en ingesta_aplicada) y registrando las demás.
+    """
+    claves = [f[4] for f in filas if f[4]]
+    aplicadas = set()
+    if claves:
+        aplicadas = set(db.execute(
+            select(models.IngestaAplicada.clave).where(models.IngestaAplicada.clave.in_(claves))
+        ).scalars())
+    registros = []
+    for _, cookie, punto, fecha_hora, clave in filas:
+        if clave in aplicadas:
+            continue
+        registro = procesar_escaneo_qr(db, cookie, punto, ahora=convertir_a_panama(fecha_hora), confirmar=False)
+        if clave:
+            db.add(models.IngestaAplicada(clave=clave))
+        if registro is not None and registro["evento"]:
+            registros.append(registro)
+    return registros
+
+
+def _purgar_claves(db, antes: datetime) -> int:
+    """Borra las claves aplicadas antes de `antes` (sus filas ya salieron de la cola)."""
+    resultado = db.execute(delete(models.IngestaAplicada).where(models.IngestaAplicada.aplicado < antes))
+    db.commit()
+    return resultado.rowcount
+
+
+def confirmacion_provisional(db, device_cookie: str, punto: str, ahora: datetime):
+    """
+    Lo que muestra la pantalla al encolar: placa, hora y estados del ciclo abierto
+    más el punto recién escaneado. Solo lee; None si la cookie no tiene sesión activa.
+    """
+    contexto = resolver_contexto_escaneo(db, device_cookie)
+    if contexto is None:
+        return None
+    identidad, ciclo, _, escaneos = contexto
+    progreso = ProgresoCiclo.desde_puntos(e.punto for e in escaneos)
+    progreso.agregar(punto)
+    return {
+        "placa": identidad.placa,
+        "hora": formatear_hora_panama(ahora),
+        "salida": punto in TERMINALES,  # el punto terminal siempre cierra o elimina el ciclo
+        "estados": progreso.estados,
+    }
+
+
+ingesta = IngestaDiferida(
+    ColaEscaneos(config.COLA_ESCANEOS_RUTA, reclamo_s=config.COLA_ESCANEOS_RECLAMO_S),
+    lote=config.COLA_ESCANEOS_LOTE,
+    espera_s=config.COLA_ESCANEOS_ESPERA_MS / 1000,
+)
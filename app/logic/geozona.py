@@ -0,0 +1,238 @@
+# app/logic/geozona.py
+# Validación de la geozona de la planta en el servidor (la página también la valida en el navegador).
+#
+# Las zonas se cargan una vez al importar el módulo: por defecto el círculo de
+# ZONA_LAT/ZONA_LON/ZONA_METROS; con GEOZONAS_ARCHIVO, las de un GeoJSON
+# (Polygon/MultiPolygon por planta, o Point con "radio_m" para un círculo).
+#
+# Cada zona precalcula su caja (lat/lon mín. y máx.): un punto fuera de la caja
+# se descarta con cuatro comparaciones. Dentro de la caja, el círculo usa la
+# distancia plana (equirectangular) y solo cerca del borde recurre a haversine,
+# así el resultado es el mismo que con haversine siempre; el polígono usa el
+# cruce de rayos sobre sus aristas. contiene_lote() hace lo mismo con numpy
+# para los lotes de la sincronización offline.
+import json
+import math
+from bisect import bisect_right
+from typing import NamedTuple
+import numpy as np
+from app import config
+
+RADIO_TIERRA_M = 6371e3
+METROS_POR_GRADO = RADIO_TIERRA_M * math.pi / 180
+MARGEN_BORDE = 1e-3  # ±0,1 % del radio: franja donde la distancia plana no decide y se usa haversine
+
+
+def distancia_metros(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distancia haversine en metros (la misma fórmula que usa index.html)."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = math.radians(lat2 - lat1)
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return RADIO_TIERRA_M * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def distancia_metros_lote(lats, lons, lat0: float, lon0: float) -> np.ndarray:
+    """distancia_metros vectorizada (mismo orden de operaciones)."""
+    p1, p2 = np.radians(lats), math.radians(lat0)
+    dp = np.radians(lat0 - lats)
+    dl = np.radians(lon0 - lons)
+    a = np.sin(dp / 2) ** 2 + np.cos(p1) * math.cos(p2) * np.sin(dl / 2) ** 2
+    return RADIO_TIERRA_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+# =============================================
+# 🔹 ZONAS
+# =============================================
+class Caja(NamedTuple):
+    lat_min: float
+    lat_max: float
+    lon_min: float
+    lon_max: float
+
+
+class Circulo:
+    """Radio en metros alrededor de un punto."""
+
+    def __init__(self, nombre: str, lat: float, lon: float, radio_m: float):
+        self.nombre = nombre
+        self.lat, self.lon, self.radio_m = lat, lon, radio_m
+        # Metros por grado de longitud en el centro (la caja se ensancha un margen)
+        self.k_lon = METROS_POR_GRADO * math.cos(math.radians(lat))
+        dlat = radio_m / METROS_POR_GRADO * (1 + MARGEN_BORDE)
+        dlon = radio_m / max(self.k_lon, 1e-9) * (1 + MARGEN_BORDE)
+        self.caja = Caja(lat - dlat, lat + dlat, lon - dlon, lon + dlon)
+        self.r2_seguro = (radio_m * (1 - MARGEN_BORDE)) ** 2  # dentro sin duda
+        self.r2_limite = (radio_m * (1 + MARGEN_BORDE)) ** 2  # fuera sin duda
+
+    def contiene(self, lat: float, lon: float) -> bool:
+        lat_min, lat_max, lon_min, lon_max = self.caja
+        if lat < lat_min or lat > lat_max or lon < lon_min or lon > lon_max:
+            return False
+        dy = (lat - self.lat) * METROS_POR_GRADO
+        dx = (lon - self.lon) * self.k_lon
+        d2 = dx * dx + dy * dy
+        if d2 <= self.r2_seguro:
+            return True
+        if d2 > self.r2_limite:
+            return False
+        return distancia_metros(lat, lon, self.lat, self.lon) <= self.radio_m
+
+    def contiene_lote(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        dentro = np.zeros(len(lats), dtype=bool)
+        indices = _en_caja(self.caja, lats, lons)
+        if len(indices):
+            dentro[indices] = distancia_metros_lote(lats[indices], lons[indices], self.lat, self.lon) <= self.radio_m
+        return dentro
+
+
+class Poligono:
+    """
+    Uno o más anillos [(lat, lon), ...]; el primero es el contorno y los demás, huecos.
+    Las aristas se reparten en franjas horizontales entre latitudes de vértices:
+    un punto solo prueba las aristas de su franja (búsqueda binaria).
+    """
+
+    def __init__(self, nombre: str, anillos: list):
+        self.nombre = nombre
+        aristas = []
+        for anillo in anillos:
+            if anillo[0] == anillo[-1]:
+                anillo = anillo[:-1]  # GeoJSON repite el primer vértice al final
+            for (lat1, lon1), (lat2, lon2) in zip(anillo, anillo[1:] + anillo[:1]):
+                if lat1 != lat2:  # las aristas horizontales no cruzan el rayo
+                    aristas.append((lat1, lat2, lon1, (lon2 - lon1) / (lat2 - lat1)))
+        todos = [p for anillo in anillos for p in anillo]
+        self.caja = Caja(
+            min(p[0] for p in todos), max(p[0] for p in todos),
+            min(p[1] for p in todos), max(p[1] for p in todos),
+        )
+        # Franja i = [cortes[i], cortes[i + 1]): aristas que la atraviesan, como (lon1, lat1, pendiente)
+        self.cortes = sorted({p[0] for p in todos})
+        self.franjas = tuple(
+            tuple(
+                (lon1, lat1, pendiente)
+                for lat1, lat2, lon1, pendiente in aristas
+                if min(lat1, lat2) <= desde and max(lat1, lat2) >= hasta
+            )
+            for desde, hasta in zip(self.cortes, self.cortes[1:])
+        )
+        self._lat1, self._lat2, self._lon1, self._pendiente = (np.array(c) for c in zip(*aristas))
+
+    def contiene(self, lat: float, lon: float) -> bool:
+        lat_min, lat_max, lon_min, lon_max = self.caja
+        if lat < lat_min or lat >= lat_max or lon < lon_min or lon > lon_max:
+            return False
+        # Cruce de rayos hacia el este, par-impar (los huecos restan solos)
+        dentro = False
+        for lon1, lat1, pendiente in self.franjas[bisect_right(self.cortes, lat) - 1]:
+            if lon < lon1 + (lat - lat1) * pendiente:
+                dentro = not dentro
+        return dentro
+
+    def contiene_lote(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        dentro = np.zeros(len(lats), dtype=bool)
+        indices = _en_caja(self.caja, lats, lons)
+        if len(indices):
+            lat, lon = lats[indices, None], lons[indices, None]  # puntos × aristas
+            cruza = ((self._lat1 > lat) != (self._lat2 > lat)) & (lon < self._lon1 + (lat - self._lat1) * self._pendiente)
+            dentro[indices] = np.count_nonzero(cruza, axis=1) % 2 == 1
+        return dentro
+
+
+def _en_caja(caja: Caja, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Índices de los puntos dentro de la caja."""
+    return np.flatnonzero(
+        (lats >= caja.lat_min) & (lats <= caja.lat_max) & (lons >= caja.lon_min) & (lons <= caja.lon_max)
+    )
+
+
+# =============================================
+# 🔹 GEOCERCA (todas las zonas)
+# =============================================
+class Geocerca:
+    """Conjunto de zonas de planta; un punto es válido si cae en cualquiera."""
+
+    def __init__(self, zonas: list):
+        if not zonas:
+            raise ValueError("La geocerca necesita al menos una zona")
+        self.zonas = tuple(zonas)
+        self.caja = Caja(
+            min(z.caja.lat_min for z in zonas), max(z.caja.lat_max for z in zonas),
+            min(z.caja.lon_min for z in zonas), max(z.caja.lon_max for z in zonas),
+        )
+        if len(zonas) == 1:
+            self.contiene = zonas[0].contiene  # una sola zona: su caja ya es la global
+
+    def zona_de(self, lat: float, lon: float):
+        """Nombre de la primera zona que contiene el punto, o None."""
+        lat_min, lat_max, lon_min, lon_max = self.caja
+        if lat < lat_min or lat > lat_max or lon < lon_min or lon > lon_max:
+            return None
+        for zona in self.zonas:
+            if zona.contiene(lat, lon):
+                return zona.nombre
+        return None
+
+    def contiene(self, lat: float, lon: float) -> bool:
+        lat_min, lat_max, lon_min, lon_max = self.caja
+        if lat < lat_min or lat > lat_max or lon < lon_min or lon > lon_max:
+            return False
+        for zona in self.zonas:
+            if zona.contiene(lat, lon):
+                return True
+        return False
+
+    def contiene_lote(self, lats, lons) -> np.ndarray:
+        """contiene() para arreglos de latitudes y longitudes; devuelve un arreglo de bool."""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        dentro = np.zeros(len(lats), dtype=bool)
+        for zona in self.zonas:
+            pendientes = np.flatnonzero(~dentro)
+            if not len(pendientes):
+                break
+            dentro[pendientes] = zona.contiene_lote(lats[pendientes], lons[pendientes])
+        return dentro
+
+
+def _zonas_geojson(ruta: str) -> list:
+    """Zonas de un FeatureCollection: Polygon/MultiPolygon, o Point con properties.radio_m."""
+    with open(ruta, encoding="utf-8") as archivo:
+        datos = json.load(archivo)
+    zonas = []
+    for i, elemento in enumerate(datos.get("features", [])):
+        geometria = elemento["geometry"]
+        propiedades = elemento.get("properties") or {}
+        nombre = propiedades.get("nombre") or f"zona{i + 1}"
+        tipo = geometria["type"]
+
+        def anillos(poligono):
+            return [[(lat, lon) for lon, lat, *_ in anillo] for anillo in poligono]  # GeoJSON: [lon, lat]
+
+        if tipo == "Polygon":
+            zonas.append(Poligono(nombre, anillos(geometria["coordinates"])))
+        elif tipo == "MultiPolygon":
+            zonas.extend(Poligono(nombre, anillos(p)) for p in geometria["coordinates"])
+        elif tipo == "Point":
+            lon, lat = geometria["coordinates"][:2]
+            zonas.append(Circulo(nombre, lat, lon, float(propiedades["radio_m"])))
+        else:
+            raise ValueError(f"Geometría no soportada en {ruta}: {tipo}")
+    return zonas
+
+
+def cargar_geocerca() -> Geocerca:
+    if config.GEOZONAS_ARCHIVO:
+        return Geocerca(_zonas_geojson(config.GEOZONAS_ARCHIVO))
+    return Geocerca([Circulo("planta", config.ZONA_LAT, config.ZONA_LON, config.ZONA_METROS)])
+
+
+geocerca = cargar_geocerca()
+
+# Solo el círculo de config: el navegador puede hacer la misma validación (index.html)
+SOLO_CIRCULO_CONFIG = not config.GEOZONAS_ARCHIVO
+
+
+def dentro_de_planta(lat: float, lon: float) -> bool:
+    return geocerca.contiene(lat, lon)
@@ -1,18 +1,67 @@
 # app/logic/ciclos.py
+import logging
+import time
 from datetime import timedelta
 from typing import Optional
-from sqlalchemy import text
+from sqlalchemy import text, and_, delete
 from app import models
-from app.utils.timezone import ahora_panama, formatear_hora_panama
+from app.logic.cache_identidad import Identidad, cache_identidad
+from app.logic.bitacora import obtener_logger, evento
+from app.logic.maquina_ciclo import PUNTOS, CIERRA, ELIMINA, ProgresoCiclo, mascara_puntos
+from app.utils.timezone import ahora_panama, formatear_hora_panama, convertir_a_panama
 
-def registrar_escaneo(db, device_cookie: str, placa: str, punto: Optional[str] = None, crud_module=None, crear_escaneo: bool = True):
+log = obtener_logger("ciclos")
+
+# =============================================
+# 🔹 ESTADO VIVO DEL CICLO (tabla ciclo_estado)
+# =============================================
+
+def actualizar_estado_ciclo(db, ciclo, placa: str, escaneo, estado=None):
+    """
+    Aplica un escaneo a la fila de ciclo_estado del ciclo (la crea si no existe).
+    No hace commit: queda dentro de la transacción del escaneo.
+    """
+    if estado is None:
+        estado = db.get(models.CicloEstado, ciclo.id)
+    if estado is None:
+        estado = models.CicloEstado(
+            ciclo_id=ciclo.id,
+            sesion_id=ciclo.sesion_id,
+            placa=placa,
+            puntos_mascara=0,
+            inicio=ciclo.inicio,
+        )
+        db.add(estado)
+
+    estado.puntos_mascara = (estado.puntos_mascara or 0) | mascara_puntos([escaneo.punto])
+    if (
+        estado.ultimo_escaneo is None
+        or convertir_a_panama(escaneo.fecha_hora) >= convertir_a_panama(estado.ultimo_escaneo)
+    ):
+        estado.ultimo_escaneo = escaneo.fecha_hora
+        estado.ultimo_punto = escaneo.punto
+    return estado
+
+def retirar_estado_ciclo(db, ciclo_ids):
+    """Quita de ciclo_estado los ciclos que se cierran o eliminan (sin commit)."""
+    db.execute(
+        delete(models.CicloEstado).where(models.CicloEstado.ciclo_id.in_(list(ciclo_ids))),
+        execution_options={"synchronize_session": False},
+    )
+
+def registrar_escaneo(db, device_cookie: str, placa: str, punto: Optional[str] = None, crud_module=None,
+                      crear_escaneo: bool = True, ahora=None, confirmar: bool = True, perfil_ciclo: str = "ciclo"):
     """
     Registra un escaneo reutilizando ciclos existentes cuando la misma placa escanea
     desde otro dispositivo dentro de la última hora.
+
+    `ahora` y `confirmar` permiten aplicarlo con la hora del cliente dentro de una
+    transacción mayor (sincronización offline): sin commit, solo flush.
+    `perfil_ciclo` es el perfil de carga del ciclo devuelto (perfiles_carga.PERFILES).
     """
     if crud_module is None:
         raise ValueError("crud_module es requerido para registrar escaneos")
-    ahora = ahora_panama()
+    ahora = ahora or ahora_panama()
     limite_reutilizacion = ahora - timedelta(minutes=60)
 
     cookie_canonica = device_cookie
@@ -24,14 +73,14 @@ def registrar_escaneo(db, device_cookie: str, placa: str, punto: Optional[str] =
     if sesion is None and placa:
         sesion_placa = crud_module.get_sesion_activa_por_placa(db, placa)
         if sesion_placa:
-            ciclo_existente = crud_module.get_ciclo_activo(db, sesion_placa.id)
+            ciclo_existente = crud_module.get_ciclo_activo(db, sesion_placa.id, perfil_ciclo)
             ultimo_escaneo = None
             if ciclo_existente:
                 ultimo_escaneo = crud_module.get_ultimo_escaneo_por_ciclo(db, ciclo_existente.id)
             if (
                 ciclo_existente
                 and ultimo_escaneo
-                and ultimo_escaneo.fecha_hora >= limite_reutilizacion
+                and convertir_a_panama(ultimo_escaneo.fecha_hora) >= limite_reutilizacion
                 and sesion_placa.camion
                 and sesion_placa.camion.device_cookie
                 and sesion_placa.camion.device_cookie != device_cookie
@@ -43,27 +92,39 @@ def registrar_escaneo(db, device_cookie: str, placa: str, punto: Optional[str] =
                 reutilizo = True
 
     if camion is None:
-        camion = crud_module.create_camion(db, device_cookie=cookie_canonica)
+        camion = crud_module.create_camion(db, device_cookie=cookie_canonica, confirmar=confirmar)
 
     if sesion is None:
-        sesion = crud_module.create_sesion(db, camion.id, placa)
+        sesion = crud_module.create_sesion(db, camion.id, placa, ahora=ahora, confirmar=confirmar)
+        cache_identidad.invalidar(device_cookie, cookie_canonica)
     elif sesion.camion_id != camion.id:
         sesion.camion_id = camion.id
-        db.commit()
-        db.refresh(sesion)
+        if confirmar:
+            db.commit()
+            db.refresh(sesion)
+        else:
+            db.flush()
+        cache_identidad.invalidar(device_cookie, cookie_canonica)
+        cache_identidad.invalidar_sesion(sesion.id)
 
     if ciclo is None:
-        ciclo = crud_module.get_ciclo_activo(db, sesion.id)
+        ciclo = crud_module.get_ciclo_activo(db, sesion.id, perfil_ciclo)
     if ciclo is None:
-        ciclo = crud_module.create_ciclo(db, sesion.id)
+        ciclo = crud_module.create_ciclo(db, sesion.id, ahora=ahora, confirmar=confirmar)
 
     escaneo = None
     if crear_escaneo and punto is not None:
         escaneo = crud_module.create_escaneo(
-    db=db,
-    ciclo_id=ciclo.id,
-    punto=punto,
-    device_cookie=device_cookie)
+            db=db,
+            ciclo_id=ciclo.id,
+            punto=punto,
+            device_cookie=device_cookie,
+            ahora=ahora,
+            confirmar=False,  # el escaneo y ciclo_estado van en el mismo commit
+        )
+        actualizar_estado_ciclo(db, ciclo, sesion.placa, escaneo)
+        if confirmar:
+            db.commit()
 
     return {
         "camion": camion,
@@ -74,26 +135,233 @@ def registrar_escaneo(db, device_cookie: str, placa: str, punto: Optional[str] =
         "reutilizado": reutilizo,
     }
 
-def registrar_cierre_ciclo(sesion, hora_cierre):
-    """Registra en consola el cierre de un ciclo."""
-    print(f"✅ Ciclo completado: Placa {sesion.placa} — {formatear_hora_panama(hora_cierre)}")
+# =============================================
+# 🔹 MOTOR DE ESCANEO (GET /scan/{punto})
+# =============================================
+
+def resolver_contexto_escaneo(db, device_cookie: str):
+    """
+    Resuelve la identidad (camión y sesión activa), el ciclo abierto, su fila de
+    ciclo_estado y sus escaneos. Devuelve (identidad, ciclo, estado, escaneos), o
+    None si la cookie no tiene sesión activa.
+
+    Con la identidad en caché solo se consulta el ciclo abierto de la sesión; si
+    no, una sola consulta desde camiones resuelve todo y llena la caché.
+    """
+    if not device_cookie:
+        return None
+
+    identidad = cache_identidad.obtener(device_cookie)
+    if identidad is not None:
+        filas = (
+            db.query(models.Ciclo, models.CicloEstado, models.Escaneo)
+            .outerjoin(models.CicloEstado, models.CicloEstado.ciclo_id == models.Ciclo.id)
+            .outerjoin(models.Escaneo, models.Escaneo.ciclo_id == models.Ciclo.id)
+            .filter(models.Ciclo.sesion_id == identidad.sesion_id, models.Ciclo.completado == False)
+            .order_by(models.Ciclo.id.desc(), models.Escaneo.fecha_hora)
+            .all()
+        )
+        if not filas:
+            return identidad, None, None, []
+        ciclo, estado, _ = filas[0]
+        escaneos = [e for (c, _, e) in filas if e is not None and c is ciclo]
+        return identidad, ciclo, estado, escaneos
+
+    filas = (
+        db.query(models.Camion, models.Sesion, models.Ciclo, models.CicloEstado, models.Escaneo)
+        .join(models.Sesion, and_(
+            models.Sesion.camion_id == models.Camion.id,
+            models.Sesion.cerrada == False,
+            models.Sesion.fin >= ahora_panama()
+        ))
+        .outerjoin(models.Ciclo, and_(
+            models.Ciclo.sesion_id == models.Sesion.id,
+            models.Ciclo.completado == False
+        ))
+        .outerjoin(models.CicloEstado, models.CicloEstado.ciclo_id == models.Ciclo.id)
+        .outerjoin(models.Escaneo, models.Escaneo.ciclo_id == models.Ciclo.id)
+        .filter(models.Camion.device_cookie == device_cookie)
+        .order_by(models.Sesion.id.desc(), models.Ciclo.id.desc(), models.Escaneo.fecha_hora)
+        .all()
+    )
+    if not filas:
+        return None
+
+    # La primera fila trae la sesión más reciente y su ciclo abierto más reciente
+    camion, sesion, ciclo, estado, _ = filas[0]
+    escaneos = [
+        e for (_, s, c, _, e) in filas
+        if e is not None and s is sesion and c is ciclo
+    ]
+    identidad = Identidad(camion.id, sesion.id, sesion.placa, sesion.fin)
+    cache_identidad.guardar(device_cookie, identidad)
+    return identidad, ciclo, estado, escaneos
+
+def procesar_escaneo_qr(db, device_cookie: str, punto: str, ahora=None, confirmar: bool = True):
+    """
+    Registra un escaneo de un camión con sesión activa en una sola transacción:
+    crea el ciclo si hace falta, evita duplicar el punto dentro de los últimos
+    60 minutos y cierra (o elimina, si omitió punto3) el ciclo en punto5.
+
+    `ahora` es la hora del escaneo (la cola diferida pasa la hora en que se
+    recibió); con confirmar=False solo hace flush y el commit queda al llamador.
+
+    Devuelve None si la cookie no tiene sesión activa; en otro caso, un dict con
+    todo lo que necesitan las plantillas de confirmación.
+    """
+    inicio = time.perf_counter()
+    contexto = resolver_contexto_escaneo(db, device_cookie)
+    if contexto is None:
+        return None
+    identidad, ciclo, estado, escaneos = contexto
+
+    ahora = ahora or ahora_panama()
+    hace_60_min = ahora - timedelta(minutes=60)
+
+    ciclo_nuevo = ciclo is None
+    if ciclo_nuevo:
+        ciclo = models.Ciclo(sesion_id=identidad.sesion_id, inicio=ahora)
+        db.add(ciclo)
+        db.flush()
+
+    # Una sola pasada por los escaneos: avance del ciclo y último escaneo reciente del punto
+    progreso = ProgresoCiclo()
+    escaneo = None
+    for e in escaneos:
+        progreso.agregar(e.punto)
+        if e.punto == punto and convertir_a_panama(e.fecha_hora) >= hace_60_min:
+            escaneo = e
+    nuevo = escaneo is None
+    if nuevo:
+        escaneo = models.Escaneo(ciclo_id=ciclo.id, punto=punto, fecha_hora=ahora)
+        db.add(escaneo)
+        escaneos.append(escaneo)
+
+    desenlace = progreso.escanear(punto)
+    placa = identidad.placa
+    hora = formatear_hora_panama(escaneo.fecha_hora)
+    cerrado = False
+    eliminado = False
+    retirado = False  # el ciclo salió de la tabla de abiertos
+
+    if desenlace == ELIMINA:
+        db.flush()
+        retirado = eliminar_ciclo_incompleto(db, ciclo, placa, None, confirmar=confirmar)
+        eliminado = True
+    elif desenlace == CIERRA:
+        ciclo.fin = ahora
+        ciclo.completado = True
+        if estado is not None:
+            db.delete(estado)
+        hora = formatear_hora_panama(ahora)
+        cerrado = True
+        retirado = True
 
-def eliminar_ciclo_incompleto(db, ciclo, sesion, crud):
+    if nuevo and not retirado:
+        estado = actualizar_estado_ciclo(db, ciclo, placa, escaneo, estado)
+
+    if cerrado:
+        registrar_cierre_ciclo(placa, ahora)
+    if confirmar:
+        db.commit()
+    else:
+        db.flush()
+
+    evento(
+        log, "escaneo", placa=placa, punto=punto, ciclo_id=ciclo.id, nuevo=nuevo,
+        cerrado=cerrado, eliminado=eliminado, latencia_ms=round((time.perf_counter() - inicio) * 1000, 2),
+    )
+    return {
+        "identidad": identidad,
+        "ciclo": ciclo,
+        "escaneo": escaneo,
+        "cookie": device_cookie,
+        "placa": placa,
+        "hora": hora,
+        "puntos": PUNTOS,
+        "estados": progreso.estados,
+        "cerrado": cerrado,
+        "eliminado": eliminado,
+        "estado": None if retirado else estado,
+        "evento": _evento_ciclo(nuevo, ciclo_nuevo, cerrado, eliminado and retirado),
+    }
+
+def _evento_ciclo(nuevo: bool, ciclo_nuevo: bool, cerrado: bool, eliminado: bool):
+    """Evento para la vista en vivo de ciclos (None si el escaneo no cambió nada)."""
+    if cerrado:
+        return "cerrado"
+    if eliminado:
+        return "eliminado"
+    if not nuevo:
+        return None
+    return "agregado" if ciclo_nuevo else "cambiado"
+
+def registrar_escaneo_formulario(db, device_cookie: str, placa: str, punto: str, crud_module=None,
+                                 confirmar: bool = True):
+    """
+    Registra el escaneo enviado desde el formulario de placa (POST /scan/{punto}).
+    Si es punto5 y el ciclo omitió punto3, el ciclo se elimina en lugar de registrar el escaneo.
+    Con confirmar=False no hace commit (queda en la transacción del llamador).
+    """
+    registro = registrar_escaneo(
+        db=db,
+        device_cookie=device_cookie,
+        placa=placa,
+        punto=punto,
+        crud_module=crud_module,
+        crear_escaneo=False,
+        confirmar=confirmar,
+        perfil_ciclo="ciclo_con_puntos",
+    )
+    registro["eliminado"] = False
+    registro["estado"] = None
+    registro["placa"] = registro["sesion"].placa
+    ciclo = registro["ciclo"]
+
+    progreso = ProgresoCiclo.desde_puntos(e.punto for e in ciclo.escaneos)
+    if progreso.escanear(punto) == ELIMINA:
+        retirado = eliminar_ciclo_incompleto(db, ciclo, registro["placa"], crud_module, confirmar=confirmar)
+        registro["eliminado"] = True
+        registro["evento"] = "eliminado" if retirado else None
+        return registro
+
+    registro["escaneo"] = crud_module.create_escaneo(db, ciclo.id, punto, confirmar=False)
+    registro["estado"] = actualizar_estado_ciclo(db, ciclo, registro["placa"], registro["escaneo"])
+    registro["evento"] = "cambiado"
+    if confirmar:
+        db.commit()
+    return registro
+
+def registrar_cierre_ciclo(placa, hora_cierre):
+    """Registra en el log el cierre de un ciclo."""
+    evento(log, "ciclo_completado", placa=placa, hora=hora_cierre)
+
+def eliminar_ciclo_incompleto(db, ciclo, placa, crud, confirmar: bool = True) -> bool:
+    """
+    Elimina el ciclo que llegó a punto5 sin punto3. Devuelve True si se eliminó.
+    Con confirmar=False no hace commit (queda en la transacción del llamador).
+    """
+    sesion_id = ciclo.sesion_id
     # 1️⃣ Verificar si ya se registró esta eliminación
     existe = db.execute(text("""
         SELECT id FROM ciclo_manual
         WHERE sesion_id = :sid OR placa = :placa
         ORDER BY id DESC LIMIT 1;
-    """), {"sid": sesion.id, "placa": sesion.placa}).fetchone()
+    """), {"sid": sesion_id, "placa": placa}).fetchone()
 
     if existe:
-        print(f"⚠️ Eliminación ya registrada previamente para {sesion.placa}, no se repite.")
-        return  # Evita duplicar el registro
+        evento(log, "eliminacion_repetida", logging.WARNING, placa=placa, ciclo_id=ciclo.id)
+        return False  # Evita duplicar el registro
 
-    # 2️⃣ Proceder con eliminación si no existe
-    db.query(models.Escaneo).filter(models.Escaneo.ciclo_id == ciclo.id).delete()
-    db.delete(ciclo)
-    db.commit()
+    # 2️⃣ Proceder con eliminación si no existe (DELETE directos: no carga los
+    # escaneos del ciclo y saca de la sesión los que ya estaban cargados)
+    retirar_estado_ciclo(db, [ciclo.id])
+    db.execute(delete(models.Escaneo).where(models.Escaneo.ciclo_id == ciclo.id))
+    db.execute(delete(models.Ciclo).where(models.Ciclo.id == ciclo.id))
+    if confirmar:
+        db.commit()
+    else:
+        db.flush()
 
     hora_eliminacion = ahora_panama()
     db.execute(
@@ -102,14 +370,16 @@ def eliminar_ciclo_incompleto(db, ciclo, sesion, crud):
             VALUES (:placa, :fecha_eliminacion, :sesion_id, :ciclo_id, 'Omitió punto3', '{}', 'Sistema');
         """),
         {
-            "placa": sesion.placa,
+            "placa": placa,
             "fecha_eliminacion": hora_eliminacion,
-            "sesion_id": sesion.id,
+            "sesion_id": sesion_id,
             "ciclo_id": ciclo.id
         }
     )
-    db.commit()
-    print(f"🚫 Ciclo eliminado por omitir punto3: Placa {sesion.placa} — {formatear_hora_panama(hora_eliminacion)}")
+    if confirmar:
+        db.commit()
+    evento(log, "ciclo_eliminado", placa=placa, ciclo_id=ciclo.id, motivo="Omitió punto3", hora=hora_eliminacion)
+    return True
 
 # =============================================
 # 🔹 NUEVAS FUNCIONES PARA GESTIÓN MANUAL DE CICLOS
@@ -118,6 +388,7 @@ def eliminar_ciclo_incompleto(db, ciclo, sesion, crud):
 def cerrar_ciclo_manual(db, ciclo_id, sesion_id, placa, motivo, detalles, registrado_por):
     """Marca el ciclo como completado manualmente y lo registra en ciclo_manual."""
     hora_cierre = ahora_panama()
+    retirar_estado_ciclo(db, [ciclo_id])
     db.execute(text("""
         UPDATE ciclos 
         SET completado = TRUE, fin = :hora_cierre
@@ -139,7 +410,10 @@ def cerrar_ciclo_manual(db, ciclo_id, sesion_id, placa, motivo, detalles, regist
         "registrado_por": registrado_por
     })
     db.commit()
-    print(f"🟢 Ciclo cerrado manualmente — Placa {placa} — {motivo} — {registrado_por} — {formatear_hora_panama(hora_cierre)}")
+    evento(
+        log, "ciclo_cerrado_manual", placa=placa, ciclo_id=ciclo_id, motivo=motivo,
+        registrado_por=registrado_por, hora=hora_cierre,
+    )
 
 
 def eliminar_ciclo_manual(db, ciclo_id, sesion_id, placa, motivo, detalles, registrado_por):
@@ -161,7 +435,25 @@ def eliminar_ciclo_manual(db, ciclo_id, sesion_id, placa, motivo, detalles, regi
     })
     db.commit()
 
+    retirar_estado_ciclo(db, [ciclo_id])
     db.execute(text("DELETE FROM escaneos WHERE ciclo_id = :ciclo_id"), {"ciclo_id": ciclo_id})
     db.execute(text("DELETE FROM ciclos WHERE id = :ciclo_id"), {"ciclo_id": ciclo_id})
     db.commit()
-    print(f"🚫 Ciclo eliminado manualmente — Placa {placa} — {motivo} — {registrado_por} — {formatear_hora_panama(hora_eliminacion)}")
+    evento(
+        log, "ciclo_eliminado_manual", placa=placa, ciclo_id=ciclo_id, motivo=motivo,
+        registrado_por=registrado_por, hora=hora_eliminacion,
+    )
+
+
+# =============================================
+# 🔹 VERSIONES ASÍNCRONAS (AsyncSession)
+# =============================================
+# La lógica vive una sola vez en las funciones síncronas de arriba; estas
+# versiones las ejecutan con AsyncSession.run_sync, de modo que cada consulta
+# cede el event loop mientras espera a la base de datos.
+
+async def procesar_escaneo_qr_async(db, device_cookie: str, punto: str):
+    return await db.run_sync(procesar_escaneo_qr, device_cookie, punto)
+
+async def registrar_escaneo_formulario_async(db, device_cookie: str, placa: str, punto: str, crud_module=None):
+    return await db.run_sync(registrar_escaneo_formulario, device_cookie, placa, punto, crud_module=crud_module)
@@ -0,0 +1,208 @@
+# app/logic/informe.py
+# Informe de ciclos por rango de fechas (/descargar_informe).
+# Las filas salen de un cursor del lado del servidor y se escriben a medida que
+# llegan, así la memoria no depende del tamaño del rango. Los ciclos ya
+# archivados (app/logic/archivo.py) se mezclan por fecha de inicio.
+import csv
+import heapq
+import io
+import tempfile
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, case, distinct
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+from app import models
+from app.database import engine_lectura
+from app.logic import archivo
+from app.logic.maquina_ciclo import PUNTOS, numeros_de_mascara, puntos_omitidos
+from app.utils.timezone import PANAMA_TZ, convertir_a_panama
+
+COLUMNAS = ["Placa", "Inicio", "Fin", "Duración (min)", "Puntos", "Saltos", "Puntos omitidos", "Estado"]
+ANCHOS = [14, 20, 20, 18, 16, 10, 18, 15]
+FORMATO_FECHA = "%Y-%m-%d %H:%M"
+
+TAMANO_LOTE = 2000      # filas por viaje al cursor del servidor
+TAMANO_TROZO = 64 * 1024  # bytes por trozo enviado al cliente
+
+
+def rango_fechas(fecha_inicio: str, fecha_fin: str):
+    """Días YYYY-MM-DD (ambos incluidos) → [desde, hasta) en hora de Panamá."""
+    desde = PANAMA_TZ.localize(datetime.strptime(fecha_inicio, "%Y-%m-%d"))
+    hasta = PANAMA_TZ.localize(datetime.strptime(fecha_fin, "%Y-%m-%d") + timedelta(days=1))
+    return desde, hasta
+
+
+def consulta_informe(desde, hasta):
+    """Un registro por ciclo iniciado en el rango, con la máscara de sus puntos escaneados."""
+    mascara = func.sum(distinct(case(
+        *[(models.Escaneo.punto == p, 1 << i) for i, p in enumerate(PUNTOS)],
+        else_=0,
+    )))
+    return (
+        select(
+            models.Sesion.placa,
+            models.Ciclo.inicio,
+            models.Ciclo.fin,
+            models.Ciclo.completado,
+            func.coalesce(mascara, 0).label("mascara"),
+        )
+        .join(models.Sesion, models.Sesion.id == models.Ciclo.sesion_id)
+        .outerjoin(models.Escaneo, models.Escaneo.ciclo_id == models.Ciclo.id)
+        .where(models.Ciclo.inicio >= desde, models.Ciclo.inicio < hasta)
+        .group_by(models.Ciclo.id, models.Sesion.placa)
+        .order_by(models.Ciclo.inicio, models.Ciclo.id)
+    )
+
+
+def fila_informe(placa, inicio, fin, completado, mascara) -> list:
+    inicio_dt = convertir_a_panama(inicio)
+    fin_dt = convertir_a_panama(fin)
+    duracion = round((fin_dt - inicio_dt).total_seconds() / 60, 1) if fin_dt else None
+    omitidos = puntos_omitidos(mascara)
+    return [
+        placa,
+        inicio_dt.strftime(FORMATO_FECHA),
+        fin_dt.strftime(FORMATO_FECHA) if fin_dt else "",
+        duracion,
+        ", ".join(str(n) for n in numeros_de_mascara(mascara)) or "-",
+        "Sí" if omitidos else "No",
+        ", ".join(str(n) for n in omitidos),
+        "Completado" if completado else "Incompleto",
+    ]
+
+
+def filas_informe(desde, hasta, lote: int = TAMANO_LOTE):
+    """
+    Genera las filas del informe leyendo por lotes (stream_results: cursor con
+    nombre en psycopg2), junto con las del archivo, en orden de inicio. Abre su
+    propia conexión de lectura (réplica o pool aparte) porque se consume mientras
+    se envía la respuesta, cuando las dependencias de la ruta ya se cerraron.
+    """
+    with engine_lectura.connect() as conn:
+        resultado = conn.execution_options(stream_results=True, max_row_buffer=lote).execute(
+            consulta_informe(desde, hasta)
+        )
+        archivados = archivo.registros_informe(desde, hasta)
+        for registro in heapq.merge(archivados, resultado, key=_clave_inicio):
+            yield fila_informe(*registro)
+
+
+def _clave_inicio(registro):
+    return convertir_a_panama(registro[1])
+
+
+def generar_csv(filas, lote: int = 1000):
+    """CSV (UTF-8 con BOM para Excel) enviado cada `lote` filas."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    buffer.write("\ufeff")
+    escritor.writerow(COLUMNAS)
+    for i, fila in enumerate(filas, start=1):
+        escritor.writerow(["" if v is None else v for v in fila])
+        if i % lote == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def _estilos(wb):
+    """Registra una sola vez los estilos de cabecera y datos (write_only no permite retocar celdas)."""
+    thin = Side(border_style="thin", color="E0E0E0")
+    center_align = Alignment(horizontal="center", vertical="center")
+    cabecera = NamedStyle(
+        name="cabecera",
+        font=Font(bold=True, color="FFFFFF", size=12, name="Arial"),
+        fill=PatternFill("solid", fgColor="071D49"),  # Azul Argos
+        alignment=center_align,
+    )
+    dato = NamedStyle(
+        name="dato",
+        font=Font(color="071D49", size=11, name="Arial"),
+        alignment=center_align,
+        border=Border(left=thin, right=thin, top=thin, bottom=thin),
+    )
+    wb.add_named_style(cabecera)
+    wb.add_named_style(dato)
+
+
+# Secciones de la hoja de resumen: (título, clave en la analítica, columnas)
+SECCIONES_RESUMEN = [
+    ("Permanencia entre puntos (min)", "permanencia_min", ["desde", "hasta", "n", "media", "p50", "p90"]),
+    ("Por punto", "por_punto", ["punto", "escaneos", "tasa_omision"]),
+    ("Por hora", "por_hora", ["hora", "escaneos", "ciclos_cerrados", "escaneos_por_dia"]),
+    ("Por placa", "por_placa", ["placa", "ciclos", "completados", "duracion_p50", "tasa_saltos"]),
+]
+
+
+def filas_resumen(analitica: dict):
+    """Filas (valores, estilo) de la hoja de resumen a partir de analitica.calcular_analitica()."""
+    yield ["Resumen", "Valor"], "cabecera"
+    for clave, valor in analitica["resumen"].items():
+        yield [clave, valor], "dato"
+    for clave, valor in analitica["duracion_ciclo_min"].items():
+        yield [f"duración ciclo {clave}", valor], "dato"
+
+    for titulo, clave, columnas in SECCIONES_RESUMEN:
+        yield [], "dato"
+        yield [titulo], "cabecera"
+        yield columnas, "cabecera"
+        for registro in analitica[clave]:
+            yield [registro[c] for c in columnas], "dato"
+
+
+def generar_xlsx(filas, trozo: int = TAMANO_TROZO, resumen=None):
+    """
+    XLSX en modo write_only: las filas se vuelcan a disco mientras llegan y el
+    archivo terminado se envía por trozos desde un temporal.
+
+    `resumen` es una función opcional que devuelve la analítica del rango; se
+    llama después de escribir las filas y llena la hoja "Resumen". Es opcional
+    porque la analítica carga el rango completo en pandas: sin ella, la memoria
+    no depende del tamaño del rango.
+    """
+    wb = Workbook(write_only=True)
+    _estilos(wb)
+    ws_resumen = wb.create_sheet("Resumen") if resumen else None
+    ws = wb.create_sheet("Informe QRLogix")
+
+    for i, ancho in enumerate(ANCHOS, start=1):
+        ws.column_dimensions[chr(64 + i)].width = ancho
+    ws.freeze_panes = "A2"
+    ws.auto_filter.ref = f"A1:{chr(64 + len(COLUMNAS))}1"
+
+    # Asignar el estilo con nombre celda por celda cuesta casi tanto como escribirla;
+    # se resuelve una vez y se comparte el arreglo de estilo (no se modifica al escribir).
+    plantillas = {}
+    for estilo in ("cabecera", "dato"):
+        plantillas[estilo] = WriteOnlyCell(ws)
+        plantillas[estilo].style = estilo
+
+    def celdas(valores, estilo, hoja=ws):
+        arreglo = plantillas[estilo]._style
+        fila = []
+        for valor in valores:
+            celda = WriteOnlyCell(hoja, value=valor)
+            celda._style = arreglo
+            fila.append(celda)
+        return fila
+
+    ws.append(celdas(COLUMNAS, "cabecera"))
+    for fila in filas:
+        ws.append(celdas(fila, "dato"))
+
+    if ws_resumen is not None:
+        for i, ancho in enumerate([30, 16, 16, 16, 16, 16], start=1):
+            ws_resumen.column_dimensions[chr(64 + i)].width = ancho
+        for valores, estilo in filas_resumen(resumen()):
+            ws_resumen.append(celdas(valores, estilo, ws_resumen))
+
+    with tempfile.TemporaryFile() as archivo:
+        wb.save(archivo)
+        archivo.seek(0)
+        while True:
+            datos = archivo.read(trozo)
+            if not datos:
+                break
+            yield datos
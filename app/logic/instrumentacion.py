@@ -0,0 +1,170 @@
+# app/logic/instrumentacion.py
+# Instrumentación por request (INSTRUMENTACION=1): cuántas consultas SQL hizo,
+# cuánto tiempo pasó en la base, cuál fue la sentencia más lenta y cuánto tardó
+# el handler. Los eventos del engine (app/database.py) anotan cada consulta en
+# la medición del request en curso; este middleware la abre, la publica en la
+# cabecera Server-Timing y en el log (evento "request"), y la acumula por ruta
+# para /metrics.
+#
+# Es un middleware ASGI puro (no BaseHTTPMiddleware) para no romper las
+# respuestas en streaming del tablero (SSE).
+import time
+from collections import defaultdict
+from app.database import MedicionRequest, medicion_actual, estado_pool, CONSULTAS_LENTAS
+from app.logic.bitacora import obtener_logger, evento, descartados
+from app.logic.rebote import rebote
+
+log = obtener_logger("metricas")
+
+# Límites del histograma de duración (segundos), como los de los clientes de Prometheus
+LIMITES_DURACION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class MetricasRutas:
+    """Acumulado por ruta (plantilla, p. ej. /scan/{punto}) desde el arranque del proceso."""
+
+    def __init__(self):
+        self.requests = defaultdict(int)                                  # (metodo, ruta, estado)
+        self.cubetas = defaultdict(lambda: [0] * len(LIMITES_DURACION))   # (metodo, ruta)
+        self.duracion_total = defaultdict(float)
+        self.conteo = defaultdict(int)
+        self.consultas_total = defaultdict(int)
+        self.tiempo_db_total = defaultdict(float)
+        self.consultas_max = defaultdict(int)
+
+    def registrar(self, metodo: str, ruta: str, estado: int, duracion: float, medicion: MedicionRequest):
+        clave = (metodo, ruta)
+        self.requests[(metodo, ruta, estado)] += 1
+        cubetas = self.cubetas[clave]
+        for i, limite in enumerate(LIMITES_DURACION):
+            if duracion <= limite:
+                cubetas[i] += 1
+        self.duracion_total[clave] += duracion
+        self.conteo[clave] += 1
+        self.consultas_total[clave] += medicion.consultas
+        self.tiempo_db_total[clave] += medicion.tiempo_db
+        self.consultas_max[clave] = max(self.consultas_max[clave], medicion.consultas)
+
+    def prometheus(self) -> str:
+        """Formato de texto de Prometheus (versión 0.0.4)."""
+        lineas = []
+
+        def metrica(nombre, tipo, ayuda, muestras):
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            for etiquetas, valor in muestras:
+                texto = ",".join(f'{k}="{v}"' for k, v in etiquetas.items())
+                lineas.append(f"{nombre}{{{texto}}} {valor}" if texto else f"{nombre} {valor}")
+
+        metrica("qrlogix_http_requests_total", "counter", "Requests atendidos por ruta y código de estado.", [
+            ({"metodo": m, "ruta": r, "estado": e}, n) for (m, r, e), n in sorted(self.requests.items())
+        ])
+
+        lineas.append("# HELP qrlogix_http_duracion_segundos Duración del request completo.")
+        lineas.append("# TYPE qrlogix_http_duracion_segundos histogram")
+        for (metodo, ruta), cubetas in sorted(self.cubetas.items()):
+            base = f'metodo="{metodo}",ruta="{ruta}"'
+            for limite, n in zip(LIMITES_DURACION, cubetas):
+                lineas.append(f'qrlogix_http_duracion_segundos_bucket{{{base},le="{limite}"}} {n}')
+            lineas.append(f'qrlogix_http_duracion_segundos_bucket{{{base},le="+Inf"}} {self.conteo[(metodo, ruta)]}')
+            lineas.append(f"qrlogix_http_duracion_segundos_sum{{{base}}} {self.duracion_total[(metodo, ruta)]:.6f}")
+            lineas.append(f"qrlogix_http_duracion_segundos_count{{{base}}} {self.conteo[(metodo, ruta)]}")
+
+        claves = sorted(self.conteo)
+        metrica("qrlogix_db_consultas_total", "counter", "Consultas SQL ejecutadas por los requests de la ruta.", [
+            ({"metodo": m, "ruta": r}, self.consultas_total[(m, r)]) for m, r in claves
+        ])
+        metrica("qrlogix_db_tiempo_segundos_total", "counter", "Tiempo en la base de los requests de la ruta.", [
+            ({"metodo": m, "ruta": r}, f"{self.tiempo_db_total[(m, r)]:.6f}") for m, r in claves
+        ])
+        metrica("qrlogix_db_consultas_por_request_max", "gauge", "Máximo de consultas SQL en un solo request.", [
+            ({"metodo": m, "ruta": r}, self.consultas_max[(m, r)]) for m, r in claves
+        ])
+        metrica("qrlogix_logs_descartados_total", "counter", "Eventos de log perdidos con la cola llena.", [
+            ({}, descartados()),
+        ])
+        metrica("qrlogix_db_consultas_lentas", "gauge", "Consultas lentas con EXPLAIN guardadas (últimas 50).", [
+            ({}, len(CONSULTAS_LENTAS)),
+        ])
+
+        rebote_estado = rebote.estadisticas()
+        metrica("qrlogix_rebote_duplicados_total", "counter", "Escaneos repetidos respondidos desde memoria.", [
+            ({}, rebote_estado["duplicados_descartados"]),
+        ])
+        metrica("qrlogix_rebote_limitados_total", "counter", "Escaneos rechazados con 429 por el límite por teléfono.", [
+            ({}, rebote_estado["limitados"]),
+        ])
+        metrica("qrlogix_rebote_dispositivos", "gauge", "Teléfonos recordados por el antirrebote.", [
+            ({}, rebote_estado["dispositivos"]),
+        ])
+
+        pools = estado_pool()
+        metrica("qrlogix_pool_en_uso", "gauge", "Conexiones del pool en uso.", [
+            ({"pool": p}, e["en_uso"]) for p, e in pools.items()
+        ])
+        metrica("qrlogix_pool_overflow", "gauge", "Conexiones abiertas por encima de pool_size.", [
+            ({"pool": p}, e["overflow"]) for p, e in pools.items()
+        ])
+        metrica("qrlogix_pool_timeouts_total", "counter", "Checkouts que agotaron pool_timeout.", [
+            ({"pool": p}, e["timeouts"]) for p, e in pools.items()
+        ])
+        metrica("qrlogix_pool_espera_segundos_total", "counter", "Tiempo total esperando una conexión libre.", [
+            ({"pool": p}, f"{e['espera_total_ms'] / 1000:.6f}") for p, e in pools.items()
+        ])
+        return "\n".join(lineas) + "\n"
+
+
+metricas_rutas = MetricasRutas()
+
+
+def _ruta(scope) -> str:
+    """Plantilla de la ruta que atendió el request (FastAPI la deja en scope["route"])."""
+    ruta = scope.get("route")
+    if ruta is not None and getattr(ruta, "path", None):
+        return ruta.path
+    if scope["path"].startswith("/static/"):
+        return "/static"
+    return "otras"  # 404: no se usa la ruta cruda para no crear una serie por URL
+
+
+class MiddlewareInstrumentacion:
+    """Mide cada request HTTP y agrega la cabecera Server-Timing."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        medicion = MedicionRequest()
+        token = medicion_actual.set(medicion)
+        inicio = time.perf_counter()
+        estado = 500
+
+        async def enviar(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+                app_ms = (time.perf_counter() - inicio) * 1000
+                valor = (
+                    f'db;dur={medicion.tiempo_db * 1000:.1f};desc="{medicion.consultas} consultas", '
+                    f"app;dur={app_ms:.1f}"
+                )
+                mensaje["headers"] = [*mensaje.get("headers", []), (b"server-timing", valor.encode("latin-1"))]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracion = time.perf_counter() - inicio
+            medicion_actual.reset(token)
+            ruta = _ruta(scope)
+            metricas_rutas.registrar(scope["method"], ruta, estado, duracion, medicion)
+            evento(
+                log, "request", metodo=scope["method"], ruta=ruta, estado=estado,
+                duracion_ms=round(duracion * 1000, 2), consultas=medicion.consultas,
+                db_ms=round(medicion.tiempo_db * 1000, 2), mas_lenta_ms=round(medicion.mas_lenta * 1000, 2),
+                sentencia_mas_lenta=medicion.sentencia_mas_lenta,
+            )
@@ -0,0 +1,143 @@
+# app/logic/maquina_ciclo.py
+# Máquina de estados del ciclo de un camión. Las reglas de cada punto viven en
+# una sola tabla (REGLAS) y el avance del ciclo es una máscara de 5 bits
+# (punto1 = bit 0), la misma que guarda ciclo_estado.puntos_mascara.
+#
+# Como solo hay 32 máscaras posibles, los estados por punto (completed/skipped/
+# pending), los números escaneados y los omitidos se calculan una vez al
+# importar el módulo; en cada escaneo son una búsqueda en una tupla.
+from typing import NamedTuple
+
+
+class Regla(NamedTuple):
+    nombre: str            # nombre en la pantalla de confirmación
+    requerido: bool        # sin él, el punto terminal elimina el ciclo en vez de cerrarlo
+    terminal: bool         # escanearlo termina el ciclo
+    tablero: str | None    # columna del tablero mientras es el último punto (None = no aparece)
+
+
+# =============================================
+# 🔹 TABLA DE REGLAS
+# =============================================
+REGLAS = {
+    "punto1": Regla("Patio", requerido=False, terminal=False, tablero="Patio"),
+    "punto2": Regla("Espera", requerido=False, terminal=False, tablero="Bodega"),
+    "punto3": Regla("Cargando", requerido=True, terminal=False, tablero="Cargando"),
+    "punto4": Regla("Lona", requerido=False, terminal=False, tablero=None),
+    "punto5": Regla("Salida", requerido=False, terminal=True, tablero=None),
+}
+
+PUNTOS = list(REGLAS)
+NOMBRES_PUNTOS = {p: r.nombre for p, r in REGLAS.items()}
+PUNTO_A_ESTADO = {p: r.tablero for p, r in REGLAS.items() if r.tablero}
+BIT = {p: 1 << i for i, p in enumerate(PUNTOS)}
+MASCARA_REQUERIDA = sum(BIT[p] for p, r in REGLAS.items() if r.requerido)
+TERMINALES = frozenset(p for p, r in REGLAS.items() if r.terminal)
+
+# Desenlace de un escaneo
+AVANZA = "avanza"
+CIERRA = "cierra"
+ELIMINA = "elimina"
+
+# =============================================
+# 🔹 TABLAS PRECALCULADAS POR MÁSCARA
+# =============================================
+COMPLETED, SKIPPED, PENDING = "completed", "skipped", "pending"
+
+
+def _estados(mascara: int) -> tuple:
+    # Un punto sin escanear queda "skipped" si el punto siguiente sí se escaneó
+    return tuple(
+        COMPLETED if mascara & (1 << i) else SKIPPED if mascara & (1 << (i + 1)) else PENDING
+        for i in range(len(PUNTOS))
+    )
+
+
+_TODAS = range(1 << len(PUNTOS))
+_ESTADOS = tuple(_estados(m) for m in _TODAS)
+_NUMEROS = tuple(tuple(i + 1 for i in range(len(PUNTOS)) if m & (1 << i)) for m in _TODAS)
+_OMITIDOS = tuple(tuple(i + 1 for i in range(m.bit_length()) if not m & (1 << i)) for m in _TODAS)
+
+
+def mascara_puntos(puntos) -> int:
+    """Convierte una colección de puntos en su máscara de bits (punto1 = bit 0)."""
+    mascara = 0
+    for p in puntos:
+        mascara |= BIT.get(p, 0)
+    return mascara
+
+
+def numeros_de_mascara(mascara: int) -> list:
+    """Números de punto (1-5) presentes en la máscara, en orden."""
+    return list(_NUMEROS[mascara])
+
+
+def puntos_omitidos(mascara: int) -> list:
+    """Números de punto que faltan antes del último punto escaneado."""
+    return list(_OMITIDOS[mascara])
+
+
+def estados_de_mascara(mascara: int) -> dict:
+    """Estado (completed/skipped/pending) de cada punto."""
+    return dict(zip(PUNTOS, _ESTADOS[mascara]))
+
+
+def calcular_estados(puntos_escaneados) -> dict:
+    """Igual que estados_de_mascara, a partir de los nombres de los puntos escaneados."""
+    return estados_de_mascara(mascara_puntos(puntos_escaneados))
+
+
+def transicion(mascara: int, punto: str):
+    """
+    Aplica el escaneo de `punto`. Devuelve (máscara nueva, desenlace): AVANZA, o
+    en un punto terminal CIERRA si tiene todos los requeridos y ELIMINA si no.
+    """
+    mascara |= BIT[punto]
+    if punto not in TERMINALES:
+        return mascara, AVANZA
+    if mascara & MASCARA_REQUERIDA == MASCARA_REQUERIDA:
+        return mascara, CIERRA
+    return mascara, ELIMINA
+
+
+# =============================================
+# 🔹 PROGRESO DE UN CICLO
+# =============================================
+class ProgresoCiclo:
+    """Avance de un ciclo en memoria: solo la máscara de puntos escaneados."""
+
+    __slots__ = ("mascara",)
+
+    def __init__(self, mascara: int = 0):
+        self.mascara = mascara
+
+    @classmethod
+    def desde_puntos(cls, puntos):
+        return cls(mascara_puntos(puntos))
+
+    def agregar(self, punto: str):
+        """Marca el punto como escaneado sin evaluar reglas (historial ya registrado)."""
+        self.mascara |= BIT.get(punto, 0)  # tolera puntos desconocidos en datos antiguos
+
+    def escanear(self, punto: str) -> str:
+        """Marca el punto y devuelve el desenlace (AVANZA, CIERRA o ELIMINA)."""
+        self.mascara, desenlace = transicion(self.mascara, punto)
+        return desenlace
+
+    def tiene(self, punto: str) -> bool:
+        return bool(self.mascara & BIT[punto])
+
+    @property
+    def estados(self) -> dict:
+        return estados_de_mascara(self.mascara)
+
+    @property
+    def numeros(self) -> list:
+        return numeros_de_mascara(self.mascara)
+
+    @property
+    def omitidos(self) -> list:
+        return puntos_omitidos(self.mascara)
+
+    def __repr__(self):
+        return f"ProgresoCiclo({self.mascara:05b})"
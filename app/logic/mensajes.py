@@ -1,35 +1,30 @@
 # app/logic/mensajes.py
 import random
 
-def obtener_mensaje(modo="recordatorio"):
-    recordatorios = [
-
-
-                {"titulo": "Cinturón de Seguridad", 
-                 "texto": "- Es obligatorio usarlo en todo momento.",
-                 "imagen": "/static/mensaje/M_1.webp"},
-
+# Recordatorios que rotan en la pantalla de confirmación del escaneo
+RECORDATORIOS = [
+    {"titulo": "Cinturón de Seguridad",
+     "texto": "- Es obligatorio usarlo en todo momento.",
+     "imagen": "/static/mensaje/M_1.webp"},
 
-                {"titulo": "Usar el EPP", 
-                 "texto": "- Al circular por las áreas operativas.",
-                 "imagen": "/static/mensaje/M_3.jpg"},
+    {"titulo": "Usar el EPP",
+     "texto": "- Al circular por las áreas operativas.",
+     "imagen": "/static/mensaje/M_3.jpg"},
 
+    {"titulo": "CheckList",
+     "texto": "- Asegúrate de realizar siempre la inspección preoperativa.",
+     "imagen": "/static/mensaje/M_2.webp"},
 
-                {"titulo": "CheckList", 
-                 "texto": "- Asegúrate de realizar siempre la inspección preoperativa.",
-                 "imagen": "/static/mensaje/M_2.webp"},
+    {"titulo": "Inspección Técnica Vehicular",
+     "texto": "- Asegúrate que el vehículo cuente con el ITV al día.",
+     "imagen": "/static/mensaje/M_2.webp"},
 
+    {"titulo": "¡PROHIBIDO!",
+     "texto": "- Transportar pasajeros.",
+     "imagen": "/static/mensaje/M_4.webp"},
+]
 
-                 {"titulo": "Inspección Técnica Vehicular", 
-                 "texto": "- Asegúrate que el vehículo cuente con el ITV al día.",
-                 "imagen": "/static/mensaje/M_2.webp"},
+MENSAJE_GENERAL = {"titulo": "Recuerda", "texto": "Mantén tus documentos y permisos actualizados."}
 
-
-                {"titulo": "¡PROHIBIDO!", 
-                 "texto": "- Transportar pasajeros.",
-                 "imagen": "/static/mensaje/M_4.webp"},
-            ]
-    
-
-    mensaje = {"titulo": "Recuerda", "texto": "Mantén tus documentos y permisos actualizados."}
-    return random.choice(recordatorios) if modo == "recordatorio" else mensaje
\ No newline at end of file
+def obtener_mensaje(modo="recordatorio"):
+    return random.choice(RECORDATORIOS) if modo == "recordatorio" else MENSAJE_GENERAL
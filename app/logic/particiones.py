@@ -0,0 +1,229 @@
+# app/logic/particiones.py
+# Particionado mensual de escaneos en PostgreSQL (PARTITION BY RANGE fecha_hora).
+# Cada mes (hora de Panamá) es una tabla escaneos_AAAA_MM; el escaneo en vivo
+# solo escribe en la del mes actual y, con el archivo frío (app/logic/archivo.py)
+# vaciando los meses viejos, la tabla que recorre el escaneo queda en unos pocos
+# meses aunque el historial crezca por años.
+#
+# Se administra con `python -m app.mantenimiento` (no desde la app):
+#   particionar       convierte la tabla escaneos existente (una vez, con ventana
+#                     de mantenimiento: copia las filas bajo ACCESS EXCLUSIVE)
+#   crear-particiones crea los meses siguientes antes de que lleguen
+#   archivar          después del archivo, quita las particiones que quedaron vacías
+#
+# La clave primaria pasa a ser (id, fecha_hora), como exige PostgreSQL; el ORM
+# sigue usando id. ciclos no se particiona: ciclo_estado y escaneos tienen
+# claves foráneas hacia ciclos.id, y una tabla particionada solo puede ser
+# referenciada por una clave única que incluya la columna de partición.
+import re
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from app.database import engine, ES_POSTGRES
+from app.logic.bitacora import obtener_logger, evento
+from app.utils.timezone import PANAMA_TZ, ahora_panama
+
+log = obtener_logger("particiones")
+
+PATRON_PARTICION = re.compile(r"^escaneos_(\d{4})_(\d{2})$")
+
+SQL_ES_PARTICIONADA = text(
+    "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('escaneos'))"
+)
+# Vistas que leen escaneos (p. ej. ciclos_abiertos): se recrean tras el cambio de tabla
+SQL_VISTAS_DEPENDIENTES = text("""
+    SELECT DISTINCT vista.oid::regclass::text AS nombre, pg_get_viewdef(vista.oid) AS definicion
+    FROM pg_depend
+    JOIN pg_rewrite ON pg_rewrite.oid = pg_depend.objid
+    JOIN pg_class vista ON vista.oid = pg_rewrite.ev_class
+    WHERE pg_depend.refobjid = to_regclass('escaneos') AND vista.oid <> to_regclass('escaneos')
+""")
+SQL_PARTICIONES = text("""
+    SELECT hija.relname AS nombre,
+           hija.reltuples::bigint AS filas_estimadas,
+           pg_total_relation_size(hija.oid) AS bytes
+    FROM pg_inherits
+    JOIN pg_class hija ON hija.oid = pg_inherits.inhrelid
+    WHERE pg_inherits.inhparent = to_regclass('escaneos')
+    ORDER BY hija.relname
+""")
+
+
+def _exigir_postgres():
+    if not ES_POSTGRES:
+        raise RuntimeError("El particionado de escaneos requiere PostgreSQL")
+
+
+def inicio_mes(fecha: datetime) -> datetime:
+    """Primer instante del mes de `fecha` en hora de Panamá."""
+    local = fecha.astimezone(PANAMA_TZ)
+    return PANAMA_TZ.localize(datetime(local.year, local.month, 1))
+
+
+def mes_siguiente(mes: datetime) -> datetime:
+    return inicio_mes(mes + timedelta(days=32))
+
+
+def _sql_particion(padre: str, mes: datetime) -> str:
+    nombre = f"escaneos_{mes:%Y_%m}"
+    return (
+        f"CREATE TABLE IF NOT EXISTS {nombre} PARTITION OF {padre} "
+        f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{mes_siguiente(mes).isoformat()}')"
+    )
+
+
+def es_particionada(conn) -> bool:
+    return bool(conn.execute(SQL_ES_PARTICIONADA).scalar())
+
+
+def particionar_escaneos(meses_adelante: int = 3) -> dict:
+    """
+    Convierte escaneos en una tabla particionada por mes, en una sola
+    transacción: crea la tabla nueva con sus meses (más una partición DEFAULT),
+    copia las filas, le pasa la secuencia de id y reemplaza la tabla vieja
+    (las vistas que la leen se borran y se vuelven a crear).
+    No hace nada si escaneos ya está particionada.
+    """
+    _exigir_postgres()
+    with engine.begin() as conn:
+        if es_particionada(conn):
+            return {"particionada": True, "convertida": False}
+
+        conn.execute(text("LOCK TABLE escaneos IN ACCESS EXCLUSIVE MODE"))
+        primera = conn.execute(text("SELECT MIN(fecha_hora) FROM escaneos")).scalar()
+        secuencia = conn.execute(text("SELECT pg_get_serial_sequence('escaneos', 'id')")).scalar()
+        if secuencia is None:
+            secuencia = "escaneos_id_seq"
+            conn.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {secuencia}"))
+            conn.execute(text(
+                f"SELECT setval('{secuencia}', COALESCE((SELECT MAX(id) FROM escaneos), 0) + 1, false)"
+            ))
+
+        conn.execute(text(f"""
+            CREATE TABLE escaneos_nueva (
+                id INTEGER NOT NULL DEFAULT nextval('{secuencia}'),
+                ciclo_id INTEGER REFERENCES ciclos(id) ON DELETE CASCADE,
+                punto VARCHAR NOT NULL,
+                fecha_hora TIMESTAMP WITH TIME ZONE NOT NULL,
+                PRIMARY KEY (id, fecha_hora)
+            ) PARTITION BY RANGE (fecha_hora)
+        """))
+
+        ahora = ahora_panama()
+        mes = inicio_mes(primera or ahora)
+        ultimo = inicio_mes(ahora)
+        for _ in range(meses_adelante):
+            ultimo = mes_siguiente(ultimo)
+        meses = 0
+        while mes <= ultimo:
+            conn.execute(text(_sql_particion("escaneos_nueva", mes)))
+            mes = mes_siguiente(mes)
+            meses += 1
+        # Red de seguridad si un mes no se creó a tiempo (crear-particiones vacía esta tabla)
+        conn.execute(text("CREATE TABLE escaneos_default PARTITION OF escaneos_nueva DEFAULT"))
+
+        filas = conn.execute(text("""
+            INSERT INTO escaneos_nueva (id, ciclo_id, punto, fecha_hora)
+            SELECT id, ciclo_id, punto, fecha_hora FROM escaneos
+        """)).rowcount
+        vistas = conn.execute(SQL_VISTAS_DEPENDIENTES).fetchall()
+        for vista in vistas:
+            conn.execute(text(f"DROP VIEW {vista.nombre}"))
+        conn.execute(text(f"ALTER SEQUENCE {secuencia} OWNED BY escaneos_nueva.id"))
+        conn.execute(text("DROP TABLE escaneos"))
+        conn.execute(text("ALTER TABLE escaneos_nueva RENAME TO escaneos"))
+        conn.execute(text("ALTER TABLE escaneos RENAME CONSTRAINT escaneos_nueva_pkey TO escaneos_pkey"))
+        conn.execute(text(
+            "ALTER TABLE escaneos RENAME CONSTRAINT escaneos_nueva_ciclo_id_fkey TO escaneos_ciclo_id_fkey"
+        ))
+        # Los mismos índices de app/models.py, ahora en cada partición
+        conn.execute(text("CREATE INDEX ix_escaneos_id ON escaneos (id)"))
+        conn.execute(text(
+            "CREATE INDEX ix_escaneos_ciclo_punto_fecha ON escaneos (ciclo_id, punto, fecha_hora)"
+        ))
+        for vista in vistas:
+            conn.execute(text(f"CREATE VIEW {vista.nombre} AS {vista.definicion}"))
+
+    resultado = {"particionada": True, "convertida": True, "filas": filas, "particiones": meses}
+    evento(log, "escaneos_particionada", **resultado)
+    return resultado
+
+
+def crear_particiones(meses_adelante: int = 3) -> list:
+    """
+    Crea las particiones del mes actual y de los `meses_adelante` siguientes que
+    falten. Si la partición DEFAULT tiene filas de ese mes, se mueven a la nueva.
+    """
+    _exigir_postgres()
+    creadas = []
+    mes = inicio_mes(ahora_panama())
+    with engine.begin() as conn:
+        if not es_particionada(conn):
+            return creadas
+        existentes = {fila.nombre for fila in conn.execute(SQL_PARTICIONES)}
+        for _ in range(meses_adelante + 1):
+            nombre = f"escaneos_{mes:%Y_%m}"
+            if nombre not in existentes:
+                _crear_desde_default(conn, mes)
+                creadas.append(nombre)
+            mes = mes_siguiente(mes)
+    if creadas:
+        evento(log, "particiones_creadas", particiones=creadas)
+    return creadas
+
+
+def _crear_desde_default(conn, mes: datetime):
+    """Crea la partición del mes pasando antes sus filas fuera de escaneos_default."""
+    rango = {"desde": mes, "hasta": mes_siguiente(mes)}
+    pendientes = conn.execute(text(
+        "SELECT COUNT(*) FROM escaneos_default WHERE fecha_hora >= :desde AND fecha_hora < :hasta"
+    ), rango).scalar()
+    if not pendientes:
+        conn.execute(text(_sql_particion("escaneos", mes)))
+        return
+    conn.execute(text("""
+        CREATE TEMP TABLE escaneos_mover AS
+        SELECT * FROM escaneos_default WHERE fecha_hora >= :desde AND fecha_hora < :hasta
+    """), rango)
+    conn.execute(text(
+        "DELETE FROM escaneos_default WHERE fecha_hora >= :desde AND fecha_hora < :hasta"
+    ), rango)
+    conn.execute(text(_sql_particion("escaneos", mes)))
+    conn.execute(text("INSERT INTO escaneos SELECT * FROM escaneos_mover"))
+    conn.execute(text("DROP TABLE escaneos_mover"))
+
+
+def quitar_particiones_vacias(antes_de: datetime) -> list:
+    """Separa y borra las particiones mensuales vacías que terminan antes de `antes_de`."""
+    _exigir_postgres()
+    quitadas = []
+    with engine.begin() as conn:
+        if not es_particionada(conn):
+            return quitadas
+        for fila in conn.execute(SQL_PARTICIONES).fetchall():
+            coincide = PATRON_PARTICION.match(fila.nombre)
+            if not coincide:
+                continue
+            mes = PANAMA_TZ.localize(datetime(int(coincide[1]), int(coincide[2]), 1))
+            if mes_siguiente(mes) > antes_de:
+                continue
+            if conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {fila.nombre})")).scalar():
+                continue
+            conn.execute(text(f"ALTER TABLE escaneos DETACH PARTITION {fila.nombre}"))
+            conn.execute(text(f"DROP TABLE {fila.nombre}"))
+            quitadas.append(fila.nombre)
+    if quitadas:
+        evento(log, "particiones_quitadas", particiones=quitadas)
+    return quitadas
+
+
+def estado_particiones() -> dict:
+    """Particiones de escaneos con sus filas estimadas y tamaño."""
+    if not ES_POSTGRES:
+        return {"particionada": False, "particiones": []}
+    with engine.connect() as conn:
+        if not es_particionada(conn):
+            return {"particionada": False, "particiones": []}
+        return {
+            "particionada": True,
+            "particiones": [dict(fila._mapping) for fila in conn.execute(SQL_PARTICIONES)],
+        }
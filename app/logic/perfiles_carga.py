@@ -0,0 +1,35 @@
+# app/logic/perfiles_carga.py
+# Perfiles de carga del ORM: qué relaciones y columnas trae cada consulta según
+# el caso de uso, para que cada ruta haga un número fijo de consultas.
+#
+# Las relaciones de app/models.py son perezosas; con ORM_CARGA_ESTRICTA=1 pasan
+# a "raise_on_sql", de modo que cualquier acceso que no esté cubierto por un
+# perfil lanza error en vez de hacer un SELECT oculto. Los perfiles agregan
+# además raiseload("*") en ese modo, para que nada fuera del perfil se cargue.
+from sqlalchemy.orm import joinedload, selectinload, raiseload
+from app import config, models
+
+PERFILES = {
+    # Traspaso de cookie en registrar_escaneo: la sesión activa de la placa con la
+    # cookie de su camión, en el mismo SELECT (JOIN)
+    "sesion_con_camion": (
+        joinedload(models.Sesion.camion).load_only(models.Camion.id, models.Camion.device_cookie),
+    ),
+    # Formulario de placa: el ciclo con sus puntos ya escaneados (solo punto y
+    # hora, en un segundo SELECT ... IN) para la regla del punto terminal
+    "ciclo_con_puntos": (
+        selectinload(models.Ciclo.escaneos).load_only(
+            models.Escaneo.ciclo_id, models.Escaneo.punto, models.Escaneo.fecha_hora,
+        ),
+    ),
+    # Ciclo sin relaciones (get_ciclo_activo por defecto)
+    "ciclo": (),
+}
+
+
+def con_perfil(consulta, perfil: str):
+    """Aplica el perfil a una consulta (Query o select)."""
+    opciones = PERFILES[perfil]
+    if config.ORM_CARGA_ESTRICTA:
+        opciones = (*opciones, raiseload("*"))
+    return consulta.options(*opciones) if opciones else consulta
@@ -0,0 +1,105 @@
+# app/logic/plantillas.py
+# Render de las páginas del escaneo (confirmación, salida y registro de placa).
+# Las plantillas se compilan una vez al arrancar y cada página se guarda como
+# esqueleto: HTML ya renderizado con marcas donde van la placa y la hora. Por
+# escaneo solo se escapan esos valores y se unen los trozos fijos.
+import re
+from functools import lru_cache
+from jinja2 import Environment, FileSystemLoader
+from markupsafe import Markup, escape
+from app import config
+from app.logic.geozona import SOLO_CIRCULO_CONFIG
+from app.logic.maquina_ciclo import PUNTOS, NOMBRES_PUNTOS
+
+DIRECTORIO = "app/templates"
+PLANTILLAS_ESCANEO = ["confirmacion.html", "confirmacion_salida.html", "index.html"]
+
+# Mismo entorno que Jinja2Templates (autoescape), sin revisar el archivo en cada render
+entorno = Environment(loader=FileSystemLoader(DIRECTORIO), autoescape=True, auto_reload=False)
+
+_MARCA = re.compile("\x00(\\w+)\x00")
+
+
+def _marca(campo: str) -> Markup:
+    return Markup(f"\x00{campo}\x00")
+
+
+class Esqueleto:
+    """HTML renderizado partido en trozos fijos y los campos que van entre ellos."""
+
+    def __init__(self, html: str):
+        partes = _MARCA.split(html)
+        self.fijos = partes[0::2]
+        self.campos = partes[1::2]
+
+    def rellenar(self, **valores) -> str:
+        salida = [self.fijos[0]]
+        for campo, fijo in zip(self.campos, self.fijos[1:]):
+            salida.append(escape(valores[campo]))
+            salida.append(fijo)
+        return "".join(salida)
+
+
+def precompilar():
+    """Compila las plantillas del escaneo (se llama al arrancar la app)."""
+    for nombre in PLANTILLAS_ESCANEO:
+        entorno.get_template(nombre)
+
+
+# =============================================
+# 🔹 ESQUELETOS (uno por combinación de partes fijas)
+# =============================================
+
+@lru_cache(maxsize=512)
+def _esqueleto_confirmacion(estados: tuple, modo: str, titulo: str, texto: str, imagen) -> Esqueleto:
+    html = entorno.get_template("confirmacion.html").render(
+        placa=_marca("placa"),
+        hora=_marca("hora"),
+        puntos=PUNTOS,
+        estados=dict(zip(PUNTOS, estados)),
+        nombres=NOMBRES_PUNTOS,
+        modo=modo,
+        mensaje_titulo=titulo,
+        mensaje_texto=texto,
+        ilustracion=imagen,
+    )
+    return Esqueleto(html)
+
+
+@lru_cache(maxsize=1)
+def _esqueleto_salida() -> Esqueleto:
+    html = entorno.get_template("confirmacion_salida.html").render(
+        placa=_marca("placa"),
+        hora=_marca("hora"),
+    )
+    return Esqueleto(html)
+
+
+# =============================================
+# 🔹 PÁGINAS
+# =============================================
+
+def pagina_confirmacion(placa: str, hora: str, estados: dict, mensaje: dict, modo: str = "recordatorio") -> str:
+    esqueleto = _esqueleto_confirmacion(
+        tuple(estados.get(p, "pending") for p in PUNTOS),
+        modo, mensaje["titulo"], mensaje["texto"], mensaje.get("imagen"),
+    )
+    return esqueleto.rellenar(placa=placa, hora=hora)
+
+
+def pagina_salida(placa: str, hora: str) -> str:
+    return _esqueleto_salida().rellenar(placa=placa, hora=hora)
+
+
+@lru_cache(maxsize=16)
+def pagina_registro(punto: str) -> str:
+    """Formulario de placa: solo cambia con el punto (la geozona viene de config)."""
+    return entorno.get_template("index.html").render(
+        punto=punto,
+        submitted=False,
+        ZONA_LAT=config.ZONA_LAT,
+        ZONA_LON=config.ZONA_LON,
+        ZONA_METROS=config.ZONA_METROS,
+        VALIDAR_GEOZONA=config.VALIDAR_GEOZONA,
+        GEOZONA_NAVEGADOR=SOLO_CIRCULO_CONFIG,
+    )
@@ -0,0 +1,180 @@
+# app/logic/pubsub.py
+# Pub/sub para los eventos en vivo (ciclos abiertos, tablero).
+# Con un solo worker basta el backend en memoria; con varios workers se usa
+# LISTEN/NOTIFY de PostgreSQL para que todos reciban los mismos eventos.
+import asyncio
+import json
+import logging
+from app import config
+from app.logic.bitacora import obtener_logger, evento
+
+log = obtener_logger("pubsub")
+
+RESINCRONIZAR = {"evento": "resincronizar"}
+
+
+class PubSubMemoria:
+    """Reparte los mensajes a las colas y oyentes del propio proceso."""
+
+    def __init__(self, max_cola: int = 100):
+        self.max_cola = max_cola
+        self._colas = {}    # canal → set de asyncio.Queue
+        self._oyentes = {}  # canal → lista de funciones síncronas
+
+    async def iniciar(self):
+        pass
+
+    async def detener(self):
+        pass
+
+    def suscribir(self, canal: str) -> asyncio.Queue:
+        cola = asyncio.Queue(maxsize=self.max_cola)
+        self._colas.setdefault(canal, set()).add(cola)
+        return cola
+
+    def desuscribir(self, canal: str, cola: asyncio.Queue):
+        self._colas.get(canal, set()).discard(cola)
+
+    def escuchar(self, canal: str, funcion):
+        """Registra una función que se llama con cada mensaje del canal."""
+        self._oyentes.setdefault(canal, []).append(funcion)
+
+    async def publicar(self, canal: str, mensaje: dict):
+        self._repartir(canal, mensaje)
+
+    def _repartir(self, canal: str, mensaje: dict):
+        for funcion in self._oyentes.get(canal, []):
+            try:
+                funcion(mensaje)
+            except Exception as e:
+                evento(log, "pubsub_error_oyente", logging.WARNING, canal=canal, error=str(e))
+        for cola in list(self._colas.get(canal, ())):
+            try:
+                cola.put_nowait(mensaje)
+            except asyncio.QueueFull:
+                # Suscriptor lento: se descarta lo pendiente y se le pide recargar todo
+                while not cola.empty():
+                    cola.get_nowait()
+                cola.put_nowait(RESINCRONIZAR)
+
+
+class PubSubPostgres(PubSubMemoria):
+    """
+    Publica con pg_notify y escucha con LISTEN en una conexión asyncpg dedicada;
+    cada worker reenvía lo recibido a sus suscriptores locales.
+
+    publicar() no espera a la base: deja el mensaje en una cola acotada y una
+    sola tarea la vacía por la conexión de envío, juntando en un viaje
+    (executemany) lo que se acumuló. Si la cola se llena o falla el envío, los
+    mensajes se descartan y, al recuperarse, se publica "resincronizar" en
+    esos canales.
+    """
+
+    CANAL_PG = "qrlogix_eventos"
+
+    def __init__(self, dsn: str, ssl=None, max_cola: int = 100, max_pendientes: int = 1000):
+        super().__init__(max_cola=max_cola)
+        self._dsn = dsn
+        self._ssl = ssl
+        self._escucha = None
+        self._envio = None
+        self._pendientes = asyncio.Queue(maxsize=max_pendientes)
+        self._perdidos = set()  # canales con mensajes descartados
+        self._enviador = None
+        self._activo = False
+
+    async def _conectar(self):
+        import asyncpg
+        return await asyncpg.connect(self._dsn, ssl=self._ssl)
+
+    async def iniciar(self):
+        self._activo = True
+        self._escucha = await self._conectar()
+        await self._escucha.add_listener(self.CANAL_PG, self._recibir)
+        self._escucha.add_termination_listener(self._conexion_perdida)
+        if self._enviador is None:
+            self._enviador = asyncio.create_task(self._enviar())
+
+    async def detener(self):
+        self._activo = False
+        if self._enviador is not None:
+            self._enviador.cancel()
+            try:
+                await self._enviador
+            except asyncio.CancelledError:
+                pass
+            self._enviador = None
+        for conexion in (self._escucha, self._envio):
+            if conexion is not None and not conexion.is_closed():
+                await conexion.close()
+        self._escucha = self._envio = None
+
+    def _conexion_perdida(self, conexion):
+        if self._activo:
+            evento(log, "pubsub_conexion_perdida", logging.WARNING)
+            asyncio.get_running_loop().create_task(self._reconectar())
+
+    async def _reconectar(self):
+        espera = 1
+        while self._activo:
+            try:
+                await self.iniciar()
+                # Lo publicado mientras no había conexión se perdió: que recarguen
+                for canal in self._colas:
+                    self._repartir(canal, RESINCRONIZAR)
+                return
+            except Exception as e:
+                evento(log, "pubsub_reintento_fallido", logging.WARNING, error=str(e), espera_s=espera)
+                await asyncio.sleep(espera)
+                espera = min(espera * 2, 30)
+
+    def _recibir(self, conexion, pid, canal_pg, carga):
+        datos = json.loads(carga)
+        self._repartir(datos["canal"], datos["mensaje"])
+
+    async def publicar(self, canal: str, mensaje: dict):
+        try:
+            self._pendientes.put_nowait((canal, json.dumps({"canal": canal, "mensaje": mensaje}, default=str)))
+        except asyncio.QueueFull:
+            if canal not in self._perdidos:
+                evento(log, "pubsub_cola_llena", logging.WARNING, canal=canal)
+            self._perdidos.add(canal)
+
+    async def _enviar(self):
+        """Única tarea que usa la conexión de envío: vacía la cola en lotes."""
+        espera = 1
+        while True:
+            lote = [await self._pendientes.get()]
+            while not self._pendientes.empty():
+                lote.append(self._pendientes.get_nowait())
+            if self._perdidos:
+                lote += [
+                    (canal, json.dumps({"canal": canal, "mensaje": RESINCRONIZAR}))
+                    for canal in self._perdidos
+                ]
+                self._perdidos.clear()
+            try:
+                if self._envio is None or self._envio.is_closed():
+                    self._envio = await self._conectar()
+                await self._envio.executemany(
+                    "SELECT pg_notify($1, $2)", [(self.CANAL_PG, carga) for _, carga in lote]
+                )
+                espera = 1
+            except Exception as e:
+                self._perdidos.update(canal for canal, _ in lote)
+                if self._envio is not None:
+                    self._envio.terminate()  # se reconecta en el próximo lote
+                    self._envio = None
+                evento(log, "pubsub_envio_fallido", logging.WARNING, mensajes=len(lote), error=str(e), espera_s=espera)
+                await asyncio.sleep(espera)
+                espera = min(espera * 2, 30)
+
+
+def crear_pubsub():
+    if config.PUBSUB_BACKEND == "postgres":
+        dsn = config.DATABASE_URL.replace("postgresql+psycopg2://", "postgresql://")
+        return PubSubPostgres(dsn, ssl="require" if "render.com" in dsn else None)
+    return PubSubMemoria()
+
+
+pubsub = crear_pubsub()
@@ -0,0 +1,229 @@
+# app/logic/rebote.py
+# Antirrebote y límite de escaneos por teléfono, antes de llegar a /scan/{punto}.
+#
+# Un QR leído dos veces seguidas (el teléfono reintenta, el conductor toca de
+# nuevo) recorría todo el escaneo hasta que crud.create_escaneo descubría, con
+# una consulta, que ya había uno reciente. Este middleware recuerda por
+# device_cookie la última respuesta de GET /scan/{punto}: si el mismo teléfono
+# vuelve a pedir el mismo punto dentro de REBOTE_VENTANA_S segundos, responde
+# con esa misma página sin tocar la base.
+#
+# Además, cada teléfono tiene un balde de fichas (REBOTE_RAFAGA fichas que se
+# reponen a REBOTE_FICHAS_S por segundo): los escaneos que no son duplicados
+# gastan una y, sin fichas, se responde 429.
+#
+# La memoria está acotada: un LRU de REBOTE_MAX_DISPOSITIVOS teléfonos, con una
+# sola respuesta guardada por teléfono (la del último punto; escanear otro punto
+# la reemplaza, así nunca se devuelve un estado viejo del ciclo). Un POST al
+# formulario de placa o a la sincronización offline (/api/scans/sync), que
+# cambian la sesión o el ciclo del teléfono, borra lo guardado.
+#
+# Es por proceso (como la caché de identidad): con varios workers cada uno
+# tiene su propio antirrebote. Middleware ASGI puro, igual que la instrumentación.
+import re
+import time
+from collections import OrderedDict
+from http.cookies import SimpleCookie
+from app import config
+from app.logic.bitacora import obtener_logger, evento
+from app.logic.maquina_ciclo import REGLAS
+
+log = obtener_logger("rebote")
+
+COOKIE_NAME = "device_cookie"  # la misma de app/routes/scan.py
+RUTA_ESCANEO = re.compile(r"^/scan/([^/]+)$")
+RUTA_SINCRONIZACION = "/api/scans/sync"
+CABECERA_REBOTE = (b"x-rebote", b"duplicado")
+
+
+class Dispositivo:
+    """Estado de un teléfono: fichas del balde y la última respuesta de escaneo."""
+
+    __slots__ = ("fichas", "repuesto", "punto", "vence", "cuerpo", "tipo")
+
+    def __init__(self, fichas: float, ahora: float):
+        self.fichas = fichas
+        self.repuesto = ahora
+        self.punto = None
+        self.vence = 0.0
+        self.cuerpo = b""
+        self.tipo = b"text/html; charset=utf-8"
+
+
+class Rebote:
+    """LRU acotado de dispositivos. Solo se usa desde el event loop, sin locks."""
+
+    def __init__(self, ventana_s: float = 10, rafaga: int = 10, fichas_s: float = 1.0, max_dispositivos: int = 10_000):
+        self.ventana_s = ventana_s
+        self.rafaga = rafaga
+        self.fichas_s = fichas_s
+        self.max_dispositivos = max_dispositivos
+        self._dispositivos = OrderedDict()  # cookie → Dispositivo
+        self._contadores = dict.fromkeys(
+            ["duplicados_descartados", "limitados", "respuestas_guardadas", "invalidaciones", "desalojos"], 0
+        )
+
+    def _dispositivo(self, cookie: str, ahora: float) -> Dispositivo:
+        dispositivo = self._dispositivos.get(cookie)
+        if dispositivo is None:
+            dispositivo = self._dispositivos[cookie] = Dispositivo(self.rafaga, ahora)
+            while len(self._dispositivos) > self.max_dispositivos:
+                self._dispositivos.popitem(last=False)
+                self._contadores["desalojos"] += 1
+        else:
+            self._dispositivos.move_to_end(cookie)
+        return dispositivo
+
+    def duplicado(self, cookie: str, punto: str, ahora: float):
+        """(cuerpo, tipo) guardado si es el mismo punto dentro de la ventana; si no, None."""
+        dispositivo = self._dispositivos.get(cookie)
+        if dispositivo is None or dispositivo.punto != punto or ahora >= dispositivo.vence:
+            return None
+        self._dispositivos.move_to_end(cookie)
+        self._contadores["duplicados_descartados"] += 1
+        return dispositivo.cuerpo, dispositivo.tipo
+
+    def tomar_ficha(self, cookie: str, ahora: float) -> bool:
+        """Gasta una ficha del balde del teléfono; False si no le quedan."""
+        dispositivo = self._dispositivo(cookie, ahora)
+        dispositivo.fichas = min(self.rafaga, dispositivo.fichas + (ahora - dispositivo.repuesto) * self.fichas_s)
+        dispositivo.repuesto = ahora
+        if dispositivo.fichas < 1:
+            self._contadores["limitados"] += 1
+            return False
+        dispositivo.fichas -= 1
+        return True
+
+    def guardar(self, cookie: str, punto: str, cuerpo: bytes, tipo: bytes, ahora: float):
+        dispositivo = self._dispositivo(cookie, ahora)
+        dispositivo.punto, dispositivo.vence = punto, ahora + self.ventana_s
+        dispositivo.cuerpo, dispositivo.tipo = cuerpo, tipo
+        self._contadores["respuestas_guardadas"] += 1
+
+    def invalidar(self, *cookies):
+        """Olvida la respuesta guardada (el balde de fichas se conserva)."""
+        for cookie in cookies:
+            dispositivo = self._dispositivos.get(cookie)
+            if dispositivo is not None and dispositivo.punto is not None:
+                dispositivo.punto, dispositivo.cuerpo = None, b""
+                self._contadores["invalidaciones"] += 1
+
+    def limpiar(self):
+        self._dispositivos.clear()
+
+    def estadisticas(self) -> dict:
+        return {
+            "dispositivos": len(self._dispositivos),
+            "max_dispositivos": self.max_dispositivos,
+            "ventana_s": self.ventana_s,
+            "rafaga": self.rafaga,
+            "fichas_s": self.fichas_s,
+            "bytes_guardados": sum(len(d.cuerpo) for d in self._dispositivos.values()),
+            **self._contadores,
+        }
+
+
+rebote = Rebote(
+    ventana_s=config.REBOTE_VENTANA_S,
+    rafaga=config.REBOTE_RAFAGA,
+    fichas_s=config.REBOTE_FICHAS_S,
+    max_dispositivos=config.REBOTE_MAX_DISPOSITIVOS,
+)
+
+
+def _cookie(scope) -> str:
+    for nombre, valor in scope["headers"]:
+        if nombre == b"cookie":
+            galleta = SimpleCookie()
+            galleta.load(valor.decode("latin-1"))
+            if COOKIE_NAME in galleta:
+                return galleta[COOKIE_NAME].value
+    return None
+
+
+async def _responder(send, estado: int, cuerpo: bytes, cabeceras: list):
+    await send({
+        "type": "http.response.start",
+        "status": estado,
+        "headers": [(b"content-length", str(len(cuerpo)).encode()), *cabeceras],
+    })
+    await send({"type": "http.response.body", "body": cuerpo})
+
+
+class MiddlewareRebote:
+    """Responde los escaneos duplicados desde memoria y limita los escaneos por teléfono."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == RUTA_SINCRONIZACION and scope["method"] == "POST":
+            cookie = _cookie(scope)
+            if cookie is not None:
+                await self._formulario(scope, receive, send, cookie)
+                return
+        coincide = RUTA_ESCANEO.match(scope["path"]) if scope["type"] == "http" else None
+        cookie = _cookie(scope) if coincide else None
+        # Sin cookie (primer escaneo del teléfono) o punto desconocido: sigue sin cambios
+        if cookie is None or coincide[1] not in REGLAS:
+            await self.app(scope, receive, send)
+            return
+
+        punto, ahora = coincide[1], time.monotonic()
+        if scope["method"] == "POST":
+            await self._formulario(scope, receive, send, cookie)
+            return
+        if scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        guardado = rebote.duplicado(cookie, punto, ahora)
+        if guardado is not None:
+            cuerpo, tipo = guardado
+            await _responder(send, 200, cuerpo, [(b"content-type", tipo), CABECERA_REBOTE])
+            return
+
+        if not rebote.tomar_ficha(cookie, ahora):
+            evento(log, "escaneo_limitado", punto=punto)
+            espera = max(1, round(1 / rebote.fichas_s)) if rebote.fichas_s > 0 else 60
+            await _responder(
+                send, 429, "Demasiados escaneos seguidos. Espere unos segundos.".encode(),
+                [(b"content-type", b"text/plain; charset=utf-8"), (b"retry-after", str(espera).encode())],
+            )
+            return
+
+        await self._escaneo(scope, receive, send, cookie, punto)
+
+    async def _escaneo(self, scope, receive, send, cookie, punto):
+        """Atiende el escaneo y guarda la página si fue un 200 completo."""
+        estado, tipo, partes = None, None, []
+
+        async def enviar(mensaje):
+            nonlocal estado, tipo
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+                tipo = dict(mensaje.get("headers", [])).get(b"content-type")
+            elif mensaje["type"] == "http.response.body" and estado == 200:
+                partes.append(mensaje.get("body", b""))
+                if not mensaje.get("more_body", False):
+                    rebote.guardar(cookie, punto, b"".join(partes), tipo or b"text/html; charset=utf-8", time.monotonic())
+            await send(mensaje)
+
+        await self.app(scope, receive, enviar)
+
+    async def _formulario(self, scope, receive, send, cookie):
+        """
+        El registro de placa y la sincronización cambian la sesión o el ciclo del
+        teléfono: olvida lo guardado antes y después de atenderlos (también de la cookie canónica).
+        """
+        rebote.invalidar(cookie)
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                rebote.invalidar(cookie)  # un GET atendido mientras tanto pudo guardar el estado anterior
+                for nombre, valor in mensaje.get("headers", []):
+                    if nombre == b"set-cookie" and valor.startswith(COOKIE_NAME.encode() + b"="):
+                        rebote.invalidar(valor.split(b";", 1)[0].split(b"=", 1)[1].decode("latin-1"))
+            await send(mensaje)
+
+        await self.app(scope, receive, enviar)
@@ -0,0 +1,131 @@
+# app/logic/sincronizacion.py
+# Sincronización de los escaneos guardados sin conexión por el service worker (/sw.js).
+# El teléfono sube todo lo pendiente en un solo POST /api/scans/sync; el lote se
+# valida (punto, hora del cliente, geozona, orden) y se aplica en una transacción
+# con la misma lógica que los escaneos en línea.
+from datetime import datetime, timedelta
+from app import config, crud
+from app.logic.cache_identidad import cache_identidad
+from app.logic.geozona import geocerca
+from app.logic.gestion_ciclos import registrar_escaneo, resolver_contexto_escaneo, procesar_escaneo_qr
+from app.logic.maquina_ciclo import PUNTOS
+from app.utils.timezone import ahora_panama, convertir_a_panama
+
+MAX_ESCANEOS_SYNC = 200
+TOLERANCIA_RELOJ = timedelta(minutes=2)  # relojes de teléfono adelantados
+ANTIGUEDAD_MAXIMA = timedelta(minutes=config.SESSION_DURATION_MINUTES)
+
+
+def ubicaciones_dentro(escaneos: list) -> list:
+    """
+    Geozona de todo el lote de una vez (geocerca.contiene_lote): True/False por
+    escaneo, o None si no trae ubicación o no es numérica.
+    """
+    dentro, indices, lats, lons = [None] * len(escaneos), [], [], []
+    for i, item in enumerate(escaneos):
+        lat, lon = item.get("lat"), item.get("lon")
+        if lat is None or lon is None:
+            continue
+        try:
+            lat, lon = float(lat), float(lon)
+        except (TypeError, ValueError):
+            continue
+        indices.append(i)
+        lats.append(lat)
+        lons.append(lon)
+    if indices:
+        for i, valor in zip(indices, geocerca.contiene_lote(lats, lons).tolist()):
+            dentro[i] = valor
+    return dentro
+
+
+def validar_escaneo(item: dict, ahora: datetime, dentro: bool = None):
+    """
+    Devuelve (escaneo normalizado, None) o (None, motivo del rechazo).
+    `dentro` es el resultado de ubicaciones_dentro() si el lote ya se evaluó.
+    """
+    punto = item.get("punto")
+    if punto not in PUNTOS:
+        return None, "punto inválido"
+
+    try:
+        fecha = convertir_a_panama(datetime.fromisoformat(str(item.get("fecha"))))
+    except ValueError:
+        return None, "fecha inválida"
+    if fecha > ahora + TOLERANCIA_RELOJ:
+        return None, "fecha en el futuro"
+    if fecha < ahora - ANTIGUEDAD_MAXIMA:
+        return None, "escaneo demasiado antiguo"
+
+    placa = (item.get("placa") or "").strip().upper() or None
+    if placa is not None and not (placa.isalnum() and len(placa) <= 6):
+        return None, "placa inválida"
+
+    lat, lon = item.get("lat"), item.get("lon")
+    if config.VALIDAR_GEOZONA:
+        if lat is None or lon is None:
+            # El registro de placa exige ubicación, igual que el formulario en línea
+            if placa is not None:
+                return None, "sin ubicación"
+        else:
+            if dentro is None:
+                try:
+                    dentro = geocerca.contiene(float(lat), float(lon))
+                except (TypeError, ValueError):
+                    return None, "ubicación inválida"
+            if not dentro:
+                return None, "fuera de la geozona"
+
+    return {"id": item.get("id"), "punto": punto, "fecha": min(fecha, ahora), "placa": placa}, None
+
+
+def sincronizar_escaneos(db, device_cookie: str, escaneos: list) -> dict:
+    """
+    Aplica el lote en orden de hora del cliente y hace un solo commit.
+    Un escaneo más antiguo que el último ya registrado en su ciclo se rechaza
+    (fuera de orden). Devuelve ids aplicados, rechazados con motivo, la cookie
+    canónica y los registros con evento para publicar.
+    """
+    ahora = ahora_panama()
+    validos, rechazados = [], []
+    dentro = ubicaciones_dentro(escaneos) if config.VALIDAR_GEOZONA else [None] * len(escaneos)
+    for item, en_zona in zip(escaneos, dentro):
+        escaneo, motivo = validar_escaneo(item, ahora, en_zona)
+        if motivo:
+            rechazados.append({"id": item.get("id"), "motivo": motivo})
+        else:
+            validos.append(escaneo)
+    validos.sort(key=lambda e: e["fecha"])
+
+    cookie = device_cookie
+    aplicados, registros = [], []
+    try:
+        for escaneo in validos:
+            if escaneo["placa"]:
+                registro = registrar_escaneo(
+                    db, cookie, escaneo["placa"], crud_module=crud, crear_escaneo=False,
+                    ahora=escaneo["fecha"], confirmar=False,
+                )
+                cookie = registro["cookie"]
+
+            contexto = resolver_contexto_escaneo(db, cookie)
+            if contexto is None:
+                rechazados.append({"id": escaneo["id"], "motivo": "sin sesión activa"})
+                continue
+            ultimos = [convertir_a_panama(e.fecha_hora) for e in contexto[3]]
+            if ultimos and max(ultimos) > escaneo["fecha"]:
+                rechazados.append({"id": escaneo["id"], "motivo": "fuera de orden"})
+                continue
+
+            registro = procesar_escaneo_qr(db, cookie, escaneo["punto"], ahora=escaneo["fecha"], confirmar=False)
+            aplicados.append(escaneo["id"])
+            if registro["evento"]:
+                registros.append(registro)
+        db.commit()
+    except Exception:
+        db.rollback()
+        # La caché pudo guardar una identidad creada en esta transacción
+        cache_identidad.invalidar(device_cookie, cookie)
+        raise
+
+    return {"aplicados": aplicados, "rechazados": rechazados, "cookie": cookie, "registros": registros}
@@ -0,0 +1,132 @@
+# app/logic/tablero_vivo.py
+# Tablero en vivo: un único difusor en el proceso recalcula el tablero cuando
+# hay un cambio y envía solo las diferencias a cada pantalla conectada (SSE).
+# Los avisos llegan por el canal de ciclos del pub/sub.
+import asyncio
+import logging
+from sqlalchemy import select
+from app import models
+from app.database import AsyncSessionLocal
+from app.logic.pubsub import pubsub
+from app.logic.ciclos_vivo import CANAL_CICLOS
+from app.logic.bitacora import obtener_logger, evento
+from app.logic.maquina_ciclo import PUNTO_A_ESTADO
+from app.utils.timezone import formatear_hora_panama, convertir_a_panama
+
+log = obtener_logger("tablero")
+
+
+def consulta_tablero():
+    """
+    Último punto de cada ciclo abierto, leído de ciclo_estado.
+    Solo recorre los ciclos abiertos, sin importar cuánto historial tenga escaneos.
+    """
+    return (
+        select(
+            models.CicloEstado.placa,
+            models.CicloEstado.ultimo_punto,
+            models.CicloEstado.ultimo_escaneo
+        )
+        .join(models.Sesion, models.Sesion.id == models.CicloEstado.sesion_id)
+        .filter(
+            models.CicloEstado.ultimo_punto.in_(list(PUNTO_A_ESTADO)),
+            models.Sesion.cerrada == False
+        )
+        .order_by(models.CicloEstado.ultimo_escaneo.desc())
+    )
+
+
+async def calcular_tablero() -> dict:
+    """Placa → {estado, hora, orden}; si una placa aparece dos veces gana su escaneo más reciente."""
+    async with AsyncSessionLocal() as db:
+        registros = (await db.execute(consulta_tablero())).all()
+
+    tablero = {}
+    for placa, punto, fecha in registros:
+        tablero.setdefault(placa, {
+            "estado": PUNTO_A_ESTADO[punto],
+            "hora": formatear_hora_panama(fecha),
+            "orden": convertir_a_panama(fecha).isoformat(),
+        })
+    return tablero
+
+
+def diferencias(anterior: dict, nuevo: dict) -> list:
+    """Cambios mínimos para pasar de un tablero a otro."""
+    cambios = []
+    for placa, datos in nuevo.items():
+        if anterior.get(placa) != datos:
+            cambios.append({"tipo": "upsert", "placa": placa, **datos})
+    for placa in anterior.keys() - nuevo.keys():
+        cambios.append({"tipo": "baja", "placa": placa})
+    return cambios
+
+
+class DifusorTablero:
+    """
+    Recalcula el tablero una vez por cambio (no una vez por pantalla) y
+    reparte las diferencias a las colas de los suscriptores.
+    """
+
+    def __init__(self, calcular=calcular_tablero, espera_rafaga: float = 0.3,
+                 intervalo_respaldo: float = 30.0, max_cola: int = 50):
+        self._calcular = calcular
+        self.espera_rafaga = espera_rafaga  # agrupa escaneos seguidos en un solo recálculo
+        self.intervalo_respaldo = intervalo_respaldo  # recálculo periódico aunque no haya avisos
+        self.max_cola = max_cola
+        self._suscriptores: set[asyncio.Queue] = set()
+        self._cambio = asyncio.Event()
+        self._tarea = None
+        self.tablero = {}
+        self.version = 0
+
+    def notificar(self):
+        """Avisa que algo cambió (escaneo, cierre o acción manual)."""
+        self._cambio.set()
+
+    async def suscribir(self):
+        """Devuelve (cola, tablero actual). La cola recibe los mensajes de cambios."""
+        cola = asyncio.Queue(maxsize=self.max_cola)
+        self._suscriptores.add(cola)
+        if self._tarea is None or self._tarea.done():
+            # Primer suscriptor: el tablero guardado puede estar viejo, se recalcula
+            self._tarea = asyncio.create_task(self._bucle())
+            await self._refrescar()
+        return cola, {"version": self.version, "tablero": self.tablero}
+
+    def desuscribir(self, cola):
+        self._suscriptores.discard(cola)
+
+    async def _bucle(self):
+        while self._suscriptores:
+            try:
+                await asyncio.wait_for(self._cambio.wait(), timeout=self.intervalo_respaldo)
+                await asyncio.sleep(self.espera_rafaga)
+            except asyncio.TimeoutError:
+                pass
+            self._cambio.clear()
+            try:
+                await self._refrescar()
+            except Exception as e:
+                evento(log, "tablero_error_recalculo", logging.WARNING, error=str(e))
+
+    async def _refrescar(self):
+        nuevo = await self._calcular()
+        cambios = diferencias(self.tablero, nuevo)
+        self.tablero = nuevo
+        if not cambios:
+            return
+        self.version += 1
+        mensaje = {"tipo": "cambios", "version": self.version, "cambios": cambios}
+        for cola in list(self._suscriptores):
+            try:
+                cola.put_nowait(mensaje)
+            except asyncio.QueueFull:
+                # Pantalla lenta: se descarta lo pendiente y se le envía el tablero completo
+                while not cola.empty():
+                    cola.get_nowait()
+                cola.put_nowait({"tipo": "completo", "version": self.version, "tablero": self.tablero})
+
+
+difusor_tablero = DifusorTablero()
+pubsub.escuchar(CANAL_CICLOS, lambda mensaje: difusor_tablero.notificar())
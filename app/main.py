@@ -1,31 +1,70 @@
 # punto de entrada de FastAPI
 # app/main.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import ciclos_routes, scan, tablero
+from app.routes import ciclos_routes, scan, tablero, interno
 from fastapi import Request
 from app.routes import ciclos_routes
+from app.logic.pubsub import pubsub
+from app.logic.plantillas import precompilar
+from app.logic.cola_escaneos import ingesta
+from app.logic.barrido import barrido
+from app.logic.instrumentacion import MiddlewareInstrumentacion
+from app.logic.rebote import MiddlewareRebote
+from app.logic.bitacora import configurar_logs, detener_logs
+from app.database import cerrar_motores
+from app import config
+
+# Arranque y apagado: logs por cola, plantillas del escaneo, pub/sub de eventos en vivo,
+# cola de ingesta diferida y barrido de sesiones vencidas / ciclos abandonados
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configurar_logs()
+    precompilar()
+    await pubsub.iniciar()
+    if config.INGESTA_DIFERIDA:
+        await ingesta.iniciar()
+    if config.BARRIDO_ACTIVO:
+        await barrido.iniciar()
+    yield
+    if config.BARRIDO_ACTIVO:
+        await barrido.detener()
+    if config.INGESTA_DIFERIDA:
+        await ingesta.detener()
+    await pubsub.detener()
+    await cerrar_motores()
+    detener_logs()  # escribe lo que quedó en la cola
 
 # Crear la app FastAPI con metadata
 app = FastAPI(
     title="QRLogix",
     description="Sistema de registro de camiones y puntos QR para trazabilidad en planta",
-    version="3.1.0"
+    version="3.1.0",
+    lifespan=lifespan
 )
 
 # Archivos estáticos (logo, CSS, etc.)
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
-# Configuración de CORS (puedes limitar dominios si quieres más seguridad)
+# Configuración de CORS: la misma lista de orígenes que las acciones sobre ciclos
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # o especificar ["https://midominio.com"]
+    allow_origins=config.ORIGENES_PERMITIDOS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Consultas SQL y tiempos por request (Server-Timing, log JSON y /metrics)
+if config.INSTRUMENTACION:
+    app.add_middleware(MiddlewareInstrumentacion)
+
+# Escaneos repetidos y ráfagas por teléfono, antes de la instrumentación y de la base
+if config.REBOTE_ACTIVO:
+    app.add_middleware(MiddlewareRebote)
+
 # Incluir las rutas de escaneo
 app.include_router(scan.router)
 
@@ -37,3 +76,6 @@ async def healthcheck(request: Request):
 app.include_router(tablero.router)
 
 app.include_router(ciclos_routes.router)
+
+app.include_router(interno.router)
+app.include_router(interno.router_metricas)
@@ -0,0 +1,75 @@
+# app/mantenimiento.py
+"""
+Mantenimiento del historial de escaneos: particiones mensuales (PostgreSQL) y
+archivo frío en Parquet. Pensado para un cron job de Render; no corre en la app.
+
+    python -m app.mantenimiento particionar          # una vez, con ventana de mantenimiento
+    python -m app.mantenimiento crear-particiones    # mes actual + PARTICIONES_MESES_ADELANTE
+    python -m app.mantenimiento archivar --dias 180  # ciclos cerrados → Parquet, quita meses vacíos
+    python -m app.mantenimiento diario               # crear-particiones + archivar
+    python -m app.mantenimiento estado
+
+Cada comando imprime su resultado en JSON.
+"""
+import argparse
+import json
+import sys
+from datetime import timedelta
+from app import config
+from app.database import ES_POSTGRES
+from app.logic import archivo, particiones
+from app.logic.bitacora import configurar_logs, detener_logs
+from app.utils.timezone import ahora_panama
+
+
+def _archivar(dias: int, lote: int) -> dict:
+    resultado = archivo.archivar_ciclos(dias=dias, lote=lote)
+    if ES_POSTGRES:
+        corte = ahora_panama() - timedelta(days=dias)
+        resultado["particiones_quitadas"] = particiones.quitar_particiones_vacias(corte)
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    p = comandos.add_parser("particionar", help="Convierte escaneos en tabla particionada por mes")
+    p.add_argument("--meses", type=int, default=config.PARTICIONES_MESES_ADELANTE, help="Meses futuros a crear")
+
+    p = comandos.add_parser("crear-particiones", help="Crea las particiones de los próximos meses")
+    p.add_argument("--meses", type=int, default=config.PARTICIONES_MESES_ADELANTE)
+
+    for nombre in ("archivar", "diario"):
+        p = comandos.add_parser(nombre, help="Mueve al archivo los ciclos cerrados antiguos")
+        p.add_argument("--dias", type=int, default=config.ARCHIVO_DIAS, help="Antigüedad mínima del cierre")
+        p.add_argument("--lote", type=int, default=config.ARCHIVO_LOTE, help="Ciclos por transacción")
+        p.add_argument("--meses", type=int, default=config.PARTICIONES_MESES_ADELANTE)
+
+    comandos.add_parser("estado", help="Particiones y meses archivados")
+    args = parser.parse_args(argv)
+
+    configurar_logs()
+    try:
+        if args.comando == "particionar":
+            resultado = particiones.particionar_escaneos(args.meses)
+        elif args.comando == "crear-particiones":
+            resultado = {"creadas": particiones.crear_particiones(args.meses)}
+        elif args.comando == "archivar":
+            resultado = _archivar(args.dias, args.lote)
+        elif args.comando == "diario":
+            creadas = particiones.crear_particiones(args.meses) if ES_POSTGRES else []
+            resultado = {"particiones_creadas": creadas, **_archivar(args.dias, args.lote)}
+        else:
+            resultado = {"particiones": particiones.estado_particiones(), "archivo": archivo.estado_archivo()}
+    except RuntimeError as e:
+        parser.exit(1, f"{e}\n")
+    finally:
+        detener_logs()
+
+    json.dump(resultado, sys.stdout, ensure_ascii=False, indent=2, default=str)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,25 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index, text
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import timedelta
-from app.config import SESSION_DURATION_MINUTES
+from app.config import SESSION_DURATION_MINUTES, ORM_CARGA_ESTRICTA
 from app.utils.timezone import ahora_panama
 
+# Carga de relaciones por defecto. En modo estricto, acceder a una relación no
+# cargada explícitamente lanza error (raise_on_sql) en lugar de consultar.
+LAZY = "raise_on_sql" if ORM_CARGA_ESTRICTA else "select"
+
 class Camion(Base):
     __tablename__ = "camiones"
     id = Column(Integer, primary_key=True, index=True)
     device_cookie = Column(String, nullable=True)  # Identificador único por cookie (sin unique=True)
-    sesiones = relationship("Sesion", back_populates="camion", cascade="all, delete-orphan")
+    sesiones = relationship("Sesion", back_populates="camion", cascade="all, delete-orphan", lazy=LAZY)
+
+    __table_args__ = (
+        # crud.get_camion_by_cookie / resolver_contexto_escaneo
+        Index("ix_camiones_device_cookie", "device_cookie"),
+    )
 
 class Sesion(Base):
     __tablename__ = "sesiones"
@@ -26,8 +35,26 @@ class Sesion(Base):
     fin = Column(DateTime(timezone=True), default=default_fin, nullable=False)
     cerrada = Column(Boolean, default=False)
 
-    camion = relationship("Camion", back_populates="sesiones")
-    ciclos = relationship("Ciclo", back_populates="sesion", cascade="all, delete-orphan")
+    camion = relationship("Camion", back_populates="sesiones", lazy=LAZY)
+    ciclos = relationship("Ciclo", back_populates="sesion", cascade="all, delete-orphan", lazy=LAZY)
+
+    __table_args__ = (
+        # crud.get_sesion_activa: camion_id + cerrada = false + fin >= ahora
+        Index(
+            "ix_sesiones_camion_activas", "camion_id", "fin",
+            postgresql_where=text("cerrada = false"), sqlite_where=text("cerrada = 0"),
+        ),
+        # crud.get_sesion_activa_por_placa: placa + cerrada = false + fin >= ahora
+        Index(
+            "ix_sesiones_placa_activas", "placa", "fin",
+            postgresql_where=text("cerrada = false"), sqlite_where=text("cerrada = 0"),
+        ),
+        # Barrido (app/logic/barrido.py): sesiones abiertas con fin < ahora
+        Index(
+            "ix_sesiones_fin_abiertas", "fin",
+            postgresql_where=text("cerrada = false"), sqlite_where=text("cerrada = 0"),
+        ),
+    )
 
 class Ciclo(Base):
     __tablename__ = "ciclos"
@@ -37,8 +64,18 @@ class Ciclo(Base):
     fin = Column(DateTime(timezone=True), nullable=True)
     completado = Column(Boolean, default=False)
 
-    sesion = relationship("Sesion", back_populates="ciclos")
-    escaneos = relationship("Escaneo", back_populates="ciclo", cascade="all, delete-orphan")
+    sesion = relationship("Sesion", back_populates="ciclos", lazy=LAZY)
+    escaneos = relationship("Escaneo", back_populates="ciclo", cascade="all, delete-orphan", lazy=LAZY)
+
+    __table_args__ = (
+        # crud.get_ciclo_activo: sesion_id + completado = false, el más reciente primero
+        Index(
+            "ix_ciclos_sesion_abiertos", "sesion_id", "id",
+            postgresql_where=text("completado = false"), sqlite_where=text("completado = 0"),
+        ),
+        # Informe (/descargar_informe): ciclos iniciados en un rango de fechas
+        Index("ix_ciclos_inicio", "inicio"),
+    )
 
 class Escaneo(Base):
     __tablename__ = "escaneos"
@@ -47,4 +84,36 @@ class Escaneo(Base):
     punto = Column(String, nullable=False)
     fecha_hora = Column(DateTime(timezone=True), default=ahora_panama, nullable=False)
 
-    ciclo = relationship("Ciclo", back_populates="escaneos")
\ No newline at end of file
+    ciclo = relationship("Ciclo", back_populates="escaneos", lazy=LAZY)
+
+    __table_args__ = (
+        # crud.create_escaneo (deduplicación de 60 min) y los joins por ciclo_id
+        Index("ix_escaneos_ciclo_punto_fecha", "ciclo_id", "punto", "fecha_hora"),
+    )
+
+class CicloEstado(Base):
+    """Estado vivo de un ciclo abierto: se actualiza con cada escaneo y se borra al cerrar el ciclo."""
+    __tablename__ = "ciclo_estado"
+    ciclo_id = Column(Integer, ForeignKey("ciclos.id", ondelete="CASCADE"), primary_key=True)
+    sesion_id = Column(Integer, ForeignKey("sesiones.id", ondelete="CASCADE"), nullable=False)
+    placa = Column(String(6), nullable=False)
+    puntos_mascara = Column(Integer, nullable=False, default=0)  # bit 0 = punto1 ... bit 4 = punto5
+    inicio = Column(DateTime(timezone=True), nullable=False)
+    ultimo_escaneo = Column(DateTime(timezone=True), nullable=False)
+    ultimo_punto = Column(String, nullable=False)
+
+    __table_args__ = (
+        # /ciclos/accion busca el ciclo abierto más reciente de una placa
+        Index("ix_ciclo_estado_placa", "placa", "ultimo_escaneo"),
+    )
+
+class IngestaAplicada(Base):
+    """Escaneos de la cola de ingesta diferida ya aplicados: evita reaplicarlos si se reprocesa un lote."""
+    __tablename__ = "ingesta_aplicada"
+    clave = Column(String(32), primary_key=True)  # ColaEscaneos: uuid4 de la fila encolada
+    aplicado = Column(DateTime(timezone=True), default=ahora_panama, nullable=False)
+
+    __table_args__ = (
+        # Purga de claves viejas (IngestaDiferida._purgar_claves)
+        Index("ix_ingesta_aplicada_aplicado", "aplicado"),
+    )
@@ -1,10 +1,20 @@
 # app/routes/ciclos_routes.py
-from fastapi import APIRouter, Request, Depends
+import asyncio
+import logging
+import time
+from urllib.parse import urlsplit
+from fastapi import APIRouter, Request, Depends, WebSocket, WebSocketDisconnect
+from starlette.requests import HTTPConnection
 from fastapi.responses import HTMLResponse, JSONResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from app.database import get_db
-from app.utils.timezone import formatear_hora_panama, ahora_panama, convertir_a_panama
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text, bindparam, insert, func, table, column
+from app.database import (
+    get_async_db, get_async_db_lectura, AsyncSessionLocal, AsyncSessionLectura, marcar_escritura,
+)
+from app.logic.ciclos_vivo import CANAL_CICLOS, listar_ciclos_abiertos, publicar_ciclo
+from app.logic.pubsub import pubsub
+from app import config
+from app.logic.bitacora import obtener_logger, evento as registrar_evento
 from fastapi.templating import Jinja2Templates
 from datetime import datetime
 from typing import List, Optional
@@ -12,6 +22,7 @@ from pydantic import BaseModel
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
+log = obtener_logger("ciclos")
 
 # ======================================================
 # 🔹 MODELOS PYDANTIC PARA VALIDACIÓN
@@ -41,157 +52,130 @@ async def mostrar_ciclos(request: Request):
     })
 
 # ======================================================
-# 🔹 API: Datos de la vista ciclos_abiertos
+# 🔹 API: Ciclos abiertos (tabla ciclo_estado)
 # ======================================================
 @router.get("/api/ciclos")
-async def obtener_ciclos_abiertos(db: Session = Depends(get_db)):
+async def obtener_ciclos_abiertos(db: AsyncSession = Depends(get_async_db_lectura)):
     try:
-        query = text("""
-            SELECT 
-                placa,
-                puntos_escaneados,
-                inicio_ciclo,
-                ultimo_escaneo
-            FROM ciclos_abiertos
-            ORDER BY ultimo_escaneo DESC;
-        """)
-        resultados = db.execute(query).fetchall()
+        ciclos = await listar_ciclos_abiertos(db)
     except Exception as e:
-        print(f"⚠️ Error al consultar la vista ciclos_abiertos: {e}")
+        registrar_evento(log, "ciclos_error_consulta", logging.ERROR, error=str(e))
         return JSONResponse(content=[], status_code=500)
 
-    ahora = ahora_panama()
-    ciclos = []
-    for c in resultados:
-        # 🔹 Limpiar puntos escaneados (mostrar solo números únicos en orden)
-        if isinstance(c.puntos_escaneados, list):
-            puntos = [p for p in c.puntos_escaneados if p.startswith("punto")]
-            numeros = sorted({int(p.replace("punto", "")) for p in puntos})
-            puntos_str = ", ".join(str(n) for n in numeros)
-        elif isinstance(c.puntos_escaneados, str):
-            partes = c.puntos_escaneados.split(",")
-            numeros = sorted({int(p.replace("punto", "")) for p in partes if "punto" in p})
-            puntos_str = ", ".join(str(n) for n in numeros)
-        else:
-            puntos_str = "-"
-
-        inicio_dt = convertir_a_panama(c.inicio_ciclo)
-        ultimo_dt = convertir_a_panama(c.ultimo_escaneo)
-
-        if not inicio_dt or not ultimo_dt:
-            continue  # evita filas incompletas
-
-        # 🔹 Calcular tiempo total (minutos desde inicio hasta ahora en Panamá)
-        delta_min = (ahora - inicio_dt).total_seconds() / 60
-        tiempo_str = f"{int(round(delta_min)):02d} min"
-
-        ciclos.append({
-            "placa": c.placa,
-            "puntos_escaneados": puntos_str,
-            "inicio": formatear_hora_panama(inicio_dt),
-            "ultimo_escaneo": formatear_hora_panama(ultimo_dt),
-            "minutos_transcurridos": tiempo_str
-        })
-
     return JSONResponse(content=ciclos)
 
 # ======================================================
 # ⚙️ REGISTRO MANUAL (CERRAR O ELIMINAR) - OPTIMIZADO
 # ======================================================
+ORIGEN_NO_PERMITIDO = {"error": "Origen no permitido para acciones sobre ciclos"}
+
+def origen_permitido(conexion: HTTPConnection) -> bool:
+    """
+    Política única de las acciones (POST /ciclos/accion y mensajes de /ws/ciclos):
+    si el navegador envía Origin, debe ser el mismo host o uno de ORIGENES_PERMITIDOS.
+    Sin Origin (clientes que no son navegador) se acepta.
+    """
+    origen = conexion.headers.get("origin")
+    if origen is None:
+        return True
+    origen = origen.rstrip("/")
+    return origen in config.ORIGENES_PERMITIDOS or urlsplit(origen).netloc == conexion.headers.get("host")
+
 @router.post("/ciclos/accion")
-async def accion_manual(request: Request, db: Session = Depends(get_db)):
+async def accion_manual(request: Request, db: AsyncSession = Depends(get_async_db)):
+    if not origen_permitido(request):
+        return JSONResponse(status_code=403, content=ORIGEN_NO_PERMITIDO)
     try:
         data = await request.json()
-        
-        # Validar datos básicos
-        motivo = data.get("motivo")
-        detalles = data.get("detalles", "")
-        registrado_por = data.get("registrado_por")
-        accion = data.get("accion")
-        
-        if not motivo or not registrado_por or not accion:
-            return JSONResponse(
-                status_code=400, 
-                content={"error": "Faltan campos obligatorios: motivo, registrado_por o acción"}
-            )
-        
-        if accion not in ["cerrar", "eliminar"]:
-            return JSONResponse(
-                status_code=400, 
-                content={"error": "Acción no válida. Debe ser 'cerrar' o 'eliminar'"}
-            )
-        
-        # Determinar si es acción individual o múltiple
-        placas = data.get("placas")  # Lista de placas para acción múltiple
-        placa_individual = data.get("placa")  # Placa individual
-        
-        if placas and isinstance(placas, list):
-            # 🔹 ACCIÓN MÚLTIPLE
-            return await procesar_accion_multiple(
-                db, placas, motivo, detalles, registrado_por, accion
-            )
-        elif placa_individual:
-            # 🔹 ACCIÓN INDIVIDUAL
-            return await procesar_accion_individual(
-                db, placa_individual, motivo, detalles, registrado_por, accion
-            )
-        else:
-            return JSONResponse(
-                status_code=400,
-                content={"error": "Debe proporcionar 'placa' o 'placas'"}
-            )
+        status, contenido = await ejecutar_accion(db, data)
+        respuesta = JSONResponse(status_code=status, content=contenido)
+        if status == 200:
+            marcar_escritura(respuesta)  # la próxima /api/ciclos de este cliente lee del primario
+        return respuesta
             
     except Exception as e:
-        print(f"❌ Error en accion_manual: {e}")
+        registrar_evento(log, "accion_manual_error", logging.ERROR, exc_info=e, error=str(e))
         return JSONResponse(
             status_code=500,
             content={"error": f"Error interno del servidor: {str(e)}"}
         )
 
+async def ejecutar_accion(db: AsyncSession, data: dict):
+    """Valida y ejecuta una acción de cerrar/eliminar. Devuelve (status HTTP, contenido)."""
+    # Validar datos básicos
+    motivo = data.get("motivo")
+    detalles = data.get("detalles", "")
+    registrado_por = data.get("registrado_por")
+    accion = data.get("accion")
+    
+    if not motivo or not registrado_por or not accion:
+        return 400, {"error": "Faltan campos obligatorios: motivo, registrado_por o acción"}
+    
+    if accion not in ["cerrar", "eliminar"]:
+        return 400, {"error": "Acción no válida. Debe ser 'cerrar' o 'eliminar'"}
+    
+    # Determinar si es acción individual o múltiple
+    placas = data.get("placas")  # Lista de placas para acción múltiple
+    placa_individual = data.get("placa")  # Placa individual
+    
+    if placas and isinstance(placas, list):
+        # 🔹 ACCIÓN MÚLTIPLE
+        return await procesar_accion_multiple(
+            db, placas, motivo, detalles, registrado_por, accion
+        )
+    elif placa_individual:
+        # 🔹 ACCIÓN INDIVIDUAL
+        return await procesar_accion_individual(
+            db, placa_individual, motivo, detalles, registrado_por, accion
+        )
+    else:
+        return 400, {"error": "Debe proporcionar 'placa' o 'placas'"}
+
 # ======================================================
 # 🔧 FUNCIÓN AUXILIAR: PROCESAR ACCIÓN INDIVIDUAL
 # ======================================================
 async def procesar_accion_individual(
-    db: Session, 
+    db: AsyncSession, 
     placa: str, 
     motivo: str, 
     detalles: str, 
     registrado_por: str, 
     accion: str
 ):
-    """Procesa cerrar o eliminar un ciclo individual"""
+    """Procesa cerrar o eliminar un ciclo individual. Devuelve (status HTTP, contenido)."""
     
-    # Verificar ciclo activo mediante la vista
-    ciclo = db.execute(text("""
+    # Verificar ciclo activo mediante ciclo_estado
+    ciclo = (await db.execute(text("""
         SELECT sesion_id, ciclo_id 
-        FROM ciclos_abiertos 
+        FROM ciclo_estado 
         WHERE placa = :placa 
         ORDER BY ultimo_escaneo DESC 
         LIMIT 1;
-    """), {"placa": placa}).fetchone()
+    """), {"placa": placa})).fetchone()
 
     if not ciclo:
-        return JSONResponse(
-            status_code=404, 
-            content={"error": f"No se encontró ciclo abierto para la placa {placa}"}
-        )
+        return 404, {"error": f"No se encontró ciclo abierto para la placa {placa}"}
 
     try:
         if accion == "eliminar":
-            # Eliminar escaneos y ciclo
-            db.execute(text("""
+            # Eliminar estado vivo, escaneos y ciclo
+            await db.execute(text("""
+                DELETE FROM ciclo_estado WHERE ciclo_id = :cid;
+            """), {"cid": ciclo.ciclo_id})
+
+            await db.execute(text("""
                 DELETE FROM escaneos WHERE ciclo_id = :cid;
             """), {"cid": ciclo.ciclo_id})
             
-            db.execute(text("""
+            await db.execute(text("""
                 DELETE FROM ciclos WHERE id = :cid;
             """), {"cid": ciclo.ciclo_id})
             
             # Registrar en ciclo_manual
-            db.execute(text("""
+            await db.execute(text("""
                 INSERT INTO ciclo_manual 
                 (placa, fecha_eliminacion, motivo, detalles, sesion_id, ciclo_id, registrado_por)
-                VALUES (:placa, NOW(), :motivo, :detalles, :sid, :cid, :registrado_por);
+                VALUES (:placa, CURRENT_TIMESTAMP, :motivo, :detalles, :sid, :cid, :registrado_por);
             """), {
                 "placa": placa,
                 "motivo": motivo,
@@ -201,27 +185,35 @@ async def procesar_accion_individual(
                 "registrado_por": registrado_por
             })
             
-            db.commit()
-            print(f"❌ Ciclo eliminado manualmente: {placa} ({motivo}) — {registrado_por}")
+            await db.commit()
+            registrar_evento(
+                log, "ciclo_eliminado_manual", placa=placa, ciclo_id=ciclo.ciclo_id,
+                motivo=motivo, registrado_por=registrado_por,
+            )
+            await publicar_ciclo("eliminado", placa, ciclo.ciclo_id)
             
-            return JSONResponse(content={
+            return 200, {
                 "success": True, 
                 "msg": f"Ciclo de {placa} eliminado correctamente",
                 "placa": placa,
                 "accion": "eliminado"
-            })
+            }
 
         elif accion == "cerrar":
-            # Cerrar ciclo
-            db.execute(text("""
-                UPDATE ciclos SET completado = TRUE, fin = NOW() WHERE id = :cid;
+            # Cerrar ciclo y retirarlo del estado vivo
+            await db.execute(text("""
+                UPDATE ciclos SET completado = TRUE, fin = CURRENT_TIMESTAMP WHERE id = :cid;
+            """), {"cid": ciclo.ciclo_id})
+
+            await db.execute(text("""
+                DELETE FROM ciclo_estado WHERE ciclo_id = :cid;
             """), {"cid": ciclo.ciclo_id})
             
             # Registrar en ciclo_manual
-            db.execute(text("""
+            await db.execute(text("""
                 INSERT INTO ciclo_manual 
                 (placa, fecha_eliminacion, motivo, detalles, sesion_id, ciclo_id, registrado_por)
-                VALUES (:placa, NOW(), :motivo, :detalles, :sid, :cid, :registrado_por);
+                VALUES (:placa, CURRENT_TIMESTAMP, :motivo, :detalles, :sid, :cid, :registrado_por);
             """), {
                 "placa": placa,
                 "motivo": motivo,
@@ -231,116 +223,212 @@ async def procesar_accion_individual(
                 "registrado_por": registrado_por
             })
             
-            db.commit()
-            print(f"✅ Ciclo cerrado manualmente: {placa} ({motivo}) — {registrado_por}")
+            await db.commit()
+            registrar_evento(
+                log, "ciclo_cerrado_manual", placa=placa, ciclo_id=ciclo.ciclo_id,
+                motivo=motivo, registrado_por=registrado_por,
+            )
+            await publicar_ciclo("cerrado", placa, ciclo.ciclo_id)
             
-            return JSONResponse(content={
+            return 200, {
                 "success": True, 
                 "msg": f"Ciclo de {placa} cerrado correctamente",
                 "placa": placa,
                 "accion": "cerrado"
-            })
+            }
             
     except Exception as e:
-        db.rollback()
-        print(f"❌ Error al procesar {placa}: {e}")
-        return JSONResponse(
-            status_code=500,
-            content={"error": f"Error al procesar {placa}: {str(e)}"}
-        )
+        await db.rollback()
+        registrar_evento(log, "accion_error", logging.ERROR, placa=placa, accion=accion, error=str(e))
+        return 500, {"error": f"Error al procesar {placa}: {str(e)}"}
 
 # ======================================================
 # 🔧 FUNCIÓN AUXILIAR: PROCESAR ACCIÓN MÚLTIPLE
 # ======================================================
+# Tabla de auditoría de acciones manuales (no tiene modelo ORM)
+CICLO_MANUAL = table(
+    "ciclo_manual",
+    column("placa"), column("fecha_eliminacion"), column("motivo"), column("detalles"),
+    column("sesion_id"), column("ciclo_id"), column("registrado_por"),
+)
+
+# Sentencias por lote: los IN se expanden con la lista de ciclo_id
+SQL_CICLOS_POR_PLACA = text("""
+    SELECT placa, sesion_id, ciclo_id
+    FROM ciclo_estado
+    WHERE placa IN :placas
+    ORDER BY ultimo_escaneo DESC;
+""").bindparams(bindparam("placas", expanding=True))
+SQL_BORRAR_ESTADO = text("DELETE FROM ciclo_estado WHERE ciclo_id IN :cids").bindparams(bindparam("cids", expanding=True))
+SQL_BORRAR_ESCANEOS = text("DELETE FROM escaneos WHERE ciclo_id IN :cids").bindparams(bindparam("cids", expanding=True))
+SQL_BORRAR_CICLOS = text("DELETE FROM ciclos WHERE id IN :cids").bindparams(bindparam("cids", expanding=True))
+SQL_CERRAR_CICLOS = text(
+    "UPDATE ciclos SET completado = TRUE, fin = CURRENT_TIMESTAMP WHERE id IN :cids"
+).bindparams(bindparam("cids", expanding=True))
+
+TAMANO_LOTE_ACCION = 1000  # ids por sentencia (límite de parámetros de los drivers)
+
+def _lotes(elementos, tamano: int = TAMANO_LOTE_ACCION):
+    for i in range(0, len(elementos), tamano):
+        yield elementos[i:i + tamano]
+
 async def procesar_accion_multiple(
-    db: Session, 
+    db: AsyncSession, 
     placas: List[str], 
     motivo: str, 
     detalles: str, 
     registrado_por: str, 
     accion: str
 ):
-    """Procesa cerrar o eliminar múltiples ciclos"""
+    """
+    Procesa cerrar o eliminar múltiples ciclos en bloque: una consulta resuelve
+    todas las placas, los cambios se aplican por lotes de ciclo_id, la auditoría
+    va en un INSERT de varias filas y se hace un solo commit.
+    Devuelve (status HTTP, contenido) con el mismo reporte por placa.
+    """
     
     resultados = {
         "exitosos": [],
         "fallidos": [],
         "total": len(placas)
     }
-    
+
+    def respuesta():
+        return 200, {
+            "success": True,
+            "msg": f"Procesados {len(resultados['exitosos'])} de {resultados['total']} ciclos",
+            "resultados": resultados
+        }
+
+    # 1️⃣ Ciclo abierto más reciente de cada placa, en una sola consulta
+    ciclo_por_placa = {}
+    for lote in _lotes(list(set(placas))):
+        filas = (await db.execute(SQL_CICLOS_POR_PLACA, {"placas": lote})).fetchall()
+        for fila in filas:
+            ciclo_por_placa.setdefault(fila.placa, fila)
+
+    # Cada placa toma su ciclo una sola vez (una placa repetida falla como antes)
+    ciclos = []
     for placa in placas:
-        try:
-            # Verificar ciclo activo
-            ciclo = db.execute(text("""
-                SELECT sesion_id, ciclo_id 
-                FROM ciclos_abiertos 
-                WHERE placa = :placa 
-                ORDER BY ultimo_escaneo DESC 
-                LIMIT 1;
-            """), {"placa": placa}).fetchone()
-
-            if not ciclo:
-                resultados["fallidos"].append({
-                    "placa": placa,
-                    "error": "No se encontró ciclo abierto"
-                })
-                continue
+        ciclo = ciclo_por_placa.pop(placa, None)
+        if ciclo is None:
+            resultados["fallidos"].append({
+                "placa": placa,
+                "error": "No se encontró ciclo abierto"
+            })
+        else:
+            ciclos.append(ciclo)
 
-            if accion == "eliminar":
-                # Eliminar escaneos y ciclo
-                db.execute(text("DELETE FROM escaneos WHERE ciclo_id = :cid"), {"cid": ciclo.ciclo_id})
-                db.execute(text("DELETE FROM ciclos WHERE id = :cid"), {"cid": ciclo.ciclo_id})
-                
-                # Registrar en ciclo_manual
-                db.execute(text("""
-                    INSERT INTO ciclo_manual 
-                    (placa, fecha_eliminacion, motivo, detalles, sesion_id, ciclo_id, registrado_por)
-                    VALUES (:placa, NOW(), :motivo, :detalles, :sid, :cid, :registrado_por);
-                """), {
-                    "placa": placa,
-                    "motivo": motivo,
-                    "detalles": detalles or '',
-                    "sid": ciclo.sesion_id,
-                    "cid": ciclo.ciclo_id,
-                    "registrado_por": registrado_por
-                })
-                
-                db.commit()
-                print(f"❌ Ciclo eliminado (múltiple): {placa} ({motivo}) — {registrado_por}")
-                resultados["exitosos"].append({"placa": placa, "accion": "eliminado"})
+    if not ciclos:
+        return respuesta()
 
+    hecho = "eliminado" if accion == "eliminar" else "cerrado"
+    try:
+        for lote in _lotes([c.ciclo_id for c in ciclos]):
+            if accion == "eliminar":
+                # Eliminar estado vivo, escaneos y ciclos
+                await db.execute(SQL_BORRAR_ESTADO, {"cids": lote})
+                await db.execute(SQL_BORRAR_ESCANEOS, {"cids": lote})
+                await db.execute(SQL_BORRAR_CICLOS, {"cids": lote})
             elif accion == "cerrar":
-                # Cerrar ciclo
-                db.execute(text("UPDATE ciclos SET completado = TRUE, fin = NOW() WHERE id = :cid"), {"cid": ciclo.ciclo_id})
-                
-                # Registrar en ciclo_manual
-                db.execute(text("""
-                    INSERT INTO ciclo_manual 
-                    (placa, fecha_eliminacion, motivo, detalles, sesion_id, ciclo_id, registrado_por)
-                    VALUES (:placa, NOW(), :motivo, :detalles, :sid, :cid, :registrado_por);
-                """), {
-                    "placa": placa,
+                # Cerrar ciclos y retirarlos del estado vivo
+                await db.execute(SQL_CERRAR_CICLOS, {"cids": lote})
+                await db.execute(SQL_BORRAR_ESTADO, {"cids": lote})
+
+        # Registrar en ciclo_manual (INSERT de varias filas)
+        for lote in _lotes(ciclos):
+            await db.execute(insert(CICLO_MANUAL).values([
+                {
+                    "placa": c.placa,
+                    "fecha_eliminacion": func.now(),
                     "motivo": motivo,
                     "detalles": detalles or '',
-                    "sid": ciclo.sesion_id,
-                    "cid": ciclo.ciclo_id,
+                    "sesion_id": c.sesion_id,
+                    "ciclo_id": c.ciclo_id,
                     "registrado_por": registrado_por
-                })
-                
-                db.commit()
-                print(f"✅ Ciclo cerrado (múltiple): {placa} ({motivo}) — {registrado_por}")
-                resultados["exitosos"].append({"placa": placa, "accion": "cerrado"})
-
-        except Exception as e:
-            db.rollback()
-            print(f"❌ Error al procesar {placa}: {e}")
-            resultados["fallidos"].append({
-                "placa": placa,
-                "error": str(e)
-            })
-    
-    return JSONResponse(content={
-        "success": True,
-        "msg": f"Procesados {len(resultados['exitosos'])} de {resultados['total']} ciclos",
-        "resultados": resultados
-    })
\ No newline at end of file
+                }
+                for c in lote
+            ]))
+
+        await db.commit()
+
+    except Exception as e:
+        await db.rollback()
+        registrar_evento(
+            log, "accion_multiple_error", logging.ERROR, accion=accion, ciclos=len(ciclos), error=str(e),
+        )
+        for c in ciclos:
+            resultados["fallidos"].append({"placa": c.placa, "error": str(e)})
+        return respuesta()
+
+    registrar_evento(
+        log, f"ciclos_{hecho}s_multiple", placas=[c.placa for c in ciclos], ciclo_ids=[c.ciclo_id for c in ciclos],
+        motivo=motivo, registrado_por=registrado_por,
+    )
+    for c in ciclos:
+        resultados["exitosos"].append({"placa": c.placa, "accion": hecho})
+        await publicar_ciclo(hecho, c.placa, c.ciclo_id)
+
+    return respuesta()
+
+# ======================================================
+# 📡 WEBSOCKET: CICLOS ABIERTOS EN VIVO
+# ======================================================
+@router.websocket("/ws/ciclos")
+async def ciclos_en_vivo(websocket: WebSocket):
+    """
+    Envía la lista inicial de ciclos abiertos y luego cada evento de ciclo.
+    El cliente también puede enviar acciones {"tipo": "accion", "id": ..., ...}
+    y recibe {"tipo": "resultado", "id": ..., "status": ..., ...} por el mismo socket,
+    con la misma política de origen que POST /ciclos/accion (403 si no se cumple).
+    Cada operación usa su propia sesión para no retener una conexión mientras el socket está abierto.
+    """
+    acciones_permitidas = origen_permitido(websocket)
+    await websocket.accept()
+    cola = pubsub.suscribir(CANAL_CICLOS)
+    recibir = evento = None
+    ultima_accion = None  # read-your-writes: tras una acción propia, la lista se lee del primario
+
+    async def enviar_inicial():
+        reciente = ultima_accion is not None and time.monotonic() - ultima_accion < config.LECTURA_CONSISTENCIA_S
+        async with (AsyncSessionLocal if reciente else AsyncSessionLectura)() as db:
+            ciclos = await listar_ciclos_abiertos(db)
+        await websocket.send_json({"tipo": "inicial", "ciclos": ciclos})
+
+    try:
+        await enviar_inicial()
+        recibir = asyncio.create_task(websocket.receive_json())
+        evento = asyncio.create_task(cola.get())
+        while True:
+            hechos, _ = await asyncio.wait({recibir, evento}, return_when=asyncio.FIRST_COMPLETED)
+
+            if evento in hechos:
+                mensaje = evento.result()
+                if mensaje.get("evento") == "resincronizar":
+                    await enviar_inicial()
+                else:
+                    await websocket.send_json({"tipo": "ciclo", **mensaje})
+                evento = asyncio.create_task(cola.get())
+
+            if recibir in hechos:
+                data = recibir.result()
+                if isinstance(data, dict) and data.get("tipo") == "accion" and not acciones_permitidas:
+                    await websocket.send_json({"tipo": "resultado", "id": data.get("id"), "status": 403, **ORIGEN_NO_PERMITIDO})
+                elif isinstance(data, dict) and data.get("tipo") == "accion":
+                    try:
+                        async with AsyncSessionLocal() as db:
+                            status, contenido = await ejecutar_accion(db, data)
+                        ultima_accion = time.monotonic()
+                    except Exception as e:
+                        registrar_evento(log, "accion_websocket_error", logging.ERROR, exc_info=e, error=str(e))
+                        status, contenido = 500, {"error": f"Error interno del servidor: {str(e)}"}
+                    await websocket.send_json({"tipo": "resultado", "id": data.get("id"), "status": status, **contenido})
+                recibir = asyncio.create_task(websocket.receive_json())
+
+    except WebSocketDisconnect:
+        pass
+    finally:
+        pubsub.desuscribir(CANAL_CICLOS, cola)
+        for tarea in (recibir, evento):
+            if tarea is not None:
+                tarea.cancel()
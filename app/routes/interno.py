@@ -0,0 +1,61 @@
+# app/routes/interno.py
+# Endpoints internos de diagnóstico (no se enlazan desde ninguna vista)
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from app import config
+from app.database import estado_pool, CONSULTAS_LENTAS
+from app.logic.cache_identidad import cache_identidad
+from app.logic.cola_escaneos import ingesta
+from app.logic.barrido import barrido
+from app.logic.rebote import rebote
+from app.logic.instrumentacion import metricas_rutas
+
+def verificar_token(x_metricas_token: str | None = Header(default=None)):
+    """
+    Exige METRICAS_TOKEN en la cabecera X-Metricas-Token. Sin METRICAS_TOKEN
+    configurado los endpoints internos no existen (404).
+    """
+    if not config.METRICAS_TOKEN:
+        raise HTTPException(status_code=404)
+    if x_metricas_token != config.METRICAS_TOKEN:
+        raise HTTPException(status_code=403, detail="Token de métricas inválido")
+
+router = APIRouter(prefix="/interno", dependencies=[Depends(verificar_token)])
+
+# /metrics va sin prefijo: es la ruta que Prometheus consulta por defecto
+router_metricas = APIRouter(dependencies=[Depends(verificar_token)])
+
+# 🔌 Estado del pool de conexiones (en uso, overflow y espera de checkout)
+@router.get("/pool")
+async def metricas_pool():
+    return estado_pool()
+
+# 🪪 Caché de identidad del escaneo (aciertos, fallos, invalidaciones)
+@router.get("/cache")
+async def metricas_cache():
+    return cache_identidad.estadisticas()
+
+# 📥 Cola de ingesta diferida (profundidad, retraso y lotes aplicados)
+@router.get("/cola")
+async def metricas_cola():
+    return ingesta.metricas()
+
+# 🧹 Barrido de sesiones vencidas y ciclos abandonados (totales y última pasada)
+@router.get("/barrido")
+async def metricas_barrido():
+    return barrido.metricas()
+
+# 🔁 Antirrebote de /scan/{punto} (duplicados respondidos desde memoria y escaneos limitados)
+@router.get("/rebote")
+async def metricas_rebote():
+    return rebote.estadisticas()
+
+# 🐢 Últimas consultas que superaron DB_CONSULTA_LENTA_MS, con su plan (EXPLAIN)
+@router.get("/consultas-lentas")
+async def consultas_lentas():
+    return list(reversed(CONSULTAS_LENTAS))
+
+# 📈 Requests, consultas SQL y tiempo en la base por ruta, más el pool (formato Prometheus)
+@router_metricas.get("/metrics", response_class=PlainTextResponse)
+async def metricas_prometheus():
+    return PlainTextResponse(metricas_rutas.prometheus(), media_type="text/plain; version=0.0.4")
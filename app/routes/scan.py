@@ -1,15 +1,21 @@
-from fastapi import APIRouter, Request, Form, Depends
-from fastapi.responses import HTMLResponse, RedirectResponse
+from typing import Optional
+from fastapi import APIRouter, Request, Form, Depends, HTTPException
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, FileResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app import crud
-from app.utils.timezone import ahora_panama, formatear_hora_panama
 import uuid
 from app import config
 from app.logic.mensajes import obtener_mensaje
-from app.logic.gestion_ciclos import eliminar_ciclo_incompleto
-from app.logic.gestion_ciclos import registrar_cierre_ciclo, registrar_escaneo
+from app.logic.ciclos_vivo import publicar_registro
+from app.logic.geozona import dentro_de_planta
+from app.logic.gestion_ciclos import procesar_escaneo_qr_async, registrar_escaneo_formulario_async
+from app.logic.maquina_ciclo import REGLAS
+from app.logic.plantillas import pagina_confirmacion, pagina_salida, pagina_registro
+from app.logic.cola_escaneos import ingesta, confirmacion_provisional
+from app.logic.sincronizacion import sincronizar_escaneos, MAX_ESCANEOS_SYNC
+from app.utils.timezone import ahora_panama
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
@@ -17,6 +23,18 @@ templates = Jinja2Templates(directory="app/templates")
 COOKIE_NAME = "device_cookie"
 COOKIE_MAX_AGE = 365 * 24 * 60 * 60  # 1 año
 
+def validar_punto(punto: str):
+    """Solo los puntos de la tabla de reglas del ciclo tienen QR."""
+    if punto not in REGLAS:
+        raise HTTPException(status_code=404, detail="Punto QR desconocido")
+
+def ubicacion_en_planta(lat, lon) -> bool:
+    """Campos ocultos lat/lon del formulario (vacíos si el navegador no dio ubicación)."""
+    try:
+        return dentro_de_planta(float(lat), float(lon))
+    except (TypeError, ValueError):
+        return False
+
 def ensure_device_cookie(request: Request, response) -> str:
     device_id = request.cookies.get(COOKIE_NAME)
     if not device_id:
@@ -31,130 +49,66 @@ def ensure_device_cookie(request: Request, response) -> str:
     return device_id
 
 @router.get("/scan/{punto}", response_class=HTMLResponse)
-async def scan_qr(request: Request, punto: str, db: Session = Depends(get_db)):
+async def scan_qr(request: Request, punto: str, db: AsyncSession = Depends(get_async_db)):
+    validar_punto(punto)
     if config.MANTENIMIENTO:
         return templates.TemplateResponse("mantenimiento.html", {"request": request})
 
     device_id = request.cookies.get(COOKIE_NAME)
-    camion = crud.get_camion_by_cookie(db, device_id)
-
-    if not camion:
-        return templates.TemplateResponse("index.html", {
-            "request": request,
-            "punto": punto,
-            "submitted": False,
-            "ZONAA_LAT": config.ZONA_LAT,
-            "ZONA_LON": config.ZONA_LON,
-            "ZONA_METROS": config.ZONA_METROS,
-            "VALIDAR_GEOZONA": config.VALIDAR_GEOZONA,
-        })
-
-    sesion = crud.get_sesion_activa(db, camion.id)
-    if not sesion:
-        return templates.TemplateResponse("index.html", {
-            "request": request,
-            "punto": punto,
-            "submitted": False,
-            "ZONA_LAT": config.ZONA_LAT,
-            "ZONA_LON": config.ZONA_LON,
-            "ZONA_METROS": config.ZONA_METROS,
-            "VALIDAR_GEOZONA": config.VALIDAR_GEOZONA,
-        })
-
-    registro = registrar_escaneo(
-        db=db,
-        device_cookie=device_id,
-        placa=sesion.placa,
-        punto=punto,
-        crud_module=crud,
-    )
-    sesion = registro["sesion"]
-    ciclo = registro["ciclo"]
-    escaneo = registro["escaneo"]
-    cookie_canonica = registro["cookie"]
 
-    if punto == "punto5":
-        if not any(e.punto == "punto3" for e in ciclo.escaneos):
-            eliminar_ciclo_incompleto(db, ciclo, sesion, crud)
-            response = templates.TemplateResponse("confirmacion_salida.html", {
-                "request": request,
-                "punto": punto,
-                "placa": sesion.placa,
-                "hora": formatear_hora_panama(escaneo.fecha_hora),
-            })
-            if cookie_canonica and cookie_canonica != device_id:
-                response.set_cookie(
-                    key=COOKIE_NAME,
-                    value=cookie_canonica,
-                    max_age=COOKIE_MAX_AGE,
-                    httponly=True,
-                    samesite="Lax",
-                )
-            return response
-        else:
-            ciclo.fin = ahora_panama()
-            ciclo.completado = True
-            db.commit()
-            registrar_cierre_ciclo(sesion, ciclo.fin)
-            hora_cierre = formatear_hora_panama(ciclo.fin)
-            print(f"✅ Ciclo completado: Placa {sesion.placa} — {hora_cierre}")
-            seleccionado = obtener_mensaje("recordatorio")
-            response = templates.TemplateResponse("confirmacion_salida.html", {
-                "request": request,
-                "punto": punto,
-                "placa": sesion.placa,
-                "hora": hora_cierre,
-            })
-            if cookie_canonica and cookie_canonica != device_id:
-                response.set_cookie(
-                    key=COOKIE_NAME,
-                    value=cookie_canonica,
-                    max_age=COOKIE_MAX_AGE,
-                    httponly=True,
-                    samesite="Lax",
-                )
-            return response
-
-    estados = {}
-    puntos_list = ["punto1", "punto2", "punto3", "punto4", "punto5"]
-    for idx, p in enumerate(puntos_list, start=1):
-        if any(e.punto == p for e in ciclo.escaneos):
-            estados[p] = "completed"
-        elif any(e.punto == f"punto{idx+1}" for e in ciclo.escaneos):
-            estados[p] = "skipped"
-        else:
-            estados[p] = "pending"
+    if config.INGESTA_DIFERIDA:
+        return await scan_qr_diferido(db, device_id, punto)
+
+    registro = await procesar_escaneo_qr_async(db, device_id, punto)
+
+    if registro is None:
+        return HTMLResponse(pagina_registro(punto))
+
+    await publicar_registro(registro)
+
+    if registro["eliminado"] or registro["cerrado"]:
+        return HTMLResponse(pagina_salida(registro["placa"], registro["hora"]))
 
     # 🟢 Mensajes dinámicos (recordatorios o mensajes generales)
     modo = "recordatorio"  # Cambiar a "mensaje" cuando se deseen mensajes fijos
 
-    seleccionado = obtener_mensaje("recordatorio")
-
-    response = templates.TemplateResponse("confirmacion.html", {
-        "request": request,
-        "punto": punto,
-        "placa": sesion.placa,  # ahora viene de Sesion
-        "hora": formatear_hora_panama(escaneo.fecha_hora),
-        "puntos": puntos_list,
-        "estados": estados,
-        "nombres": {"punto1": "Patio", "punto2": "Espera", "punto3": "Cargando", "punto4": "Lona", "punto5": "Salida"},
-        "modo": modo,
-        "mensaje_titulo": seleccionado["titulo"],
-        "mensaje_texto": seleccionado["texto"],
-        "ilustracion": seleccionado["imagen"],
-    })
-    if cookie_canonica and cookie_canonica != device_id:
-        response.set_cookie(
-            key=COOKIE_NAME,
-            value=cookie_canonica,
-            max_age=COOKIE_MAX_AGE,
-            httponly=True,
-            samesite="Lax",
-        )
-    return response
+    seleccionado = obtener_mensaje(modo)
+
+    # Esqueleto en caché: solo se sustituyen placa y hora
+    return HTMLResponse(pagina_confirmacion(
+        registro["placa"], registro["hora"], registro["estados"], seleccionado, modo
+    ))
+
+async def scan_qr_diferido(db, device_id, punto):
+    """Encola el escaneo y confirma de inmediato; el worker de la cola lo aplica."""
+    ahora = ahora_panama()
+    provisional = await db.run_sync(confirmacion_provisional, device_id, punto, ahora)
+    if provisional is None:
+        return HTMLResponse(pagina_registro(punto))
+
+    await ingesta.encolar(device_id, punto, ahora)
+
+    if provisional["salida"]:
+        return HTMLResponse(pagina_salida(provisional["placa"], provisional["hora"]))
+    modo = "recordatorio"
+    return HTMLResponse(pagina_confirmacion(
+        provisional["placa"], provisional["hora"], provisional["estados"], obtener_mensaje(modo), modo
+    ))
 
 @router.post("/scan/{punto}", response_class=HTMLResponse)
-async def scan_qr_post(request: Request, punto: str, plate: str = Form(...), db: Session = Depends(get_db)):
+async def scan_qr_post(
+    request: Request,
+    punto: str,
+    plate: str = Form(...),
+    lat: Optional[str] = Form(None),
+    lon: Optional[str] = Form(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    validar_punto(punto)
+
+    # La página valida la ubicación en el navegador; aquí se repite con la geocerca
+    if config.VALIDAR_GEOZONA and not ubicacion_en_planta(lat, lon):
+        return RedirectResponse(url="/geozona", status_code=303)
 
     response = RedirectResponse(url=f"/scan/{punto}?placa={plate}", status_code=303)
     device_id = ensure_device_cookie(request, response)
@@ -162,18 +116,16 @@ async def scan_qr_post(request: Request, punto: str, plate: str = Form(...), db:
     # convertir la placa a mayúsculas
     plate = plate.upper()
 
-    registro = registrar_escaneo(
+    registro = await registrar_escaneo_formulario_async(
         db=db,
         device_cookie=device_id,
         placa=plate,
         punto=punto,
         crud_module=crud,
-        crear_escaneo=False,
     )
 
-    sesion = registro["sesion"]
-    ciclo = registro["ciclo"]
     cookie_canonica = registro["cookie"]
+    await publicar_registro(registro)
 
     if cookie_canonica and cookie_canonica != device_id:
         response.set_cookie(
@@ -184,15 +136,57 @@ async def scan_qr_post(request: Request, punto: str, plate: str = Form(...), db:
             samesite="Lax",
         )
 
-    if punto == "punto5":
-        if not any(e.punto == "punto3" for e in ciclo.escaneos):
-            eliminar_ciclo_incompleto(db, ciclo, sesion, crud)
-            return RedirectResponse(url="/", status_code=303)
+    if registro["eliminado"]:
+        return RedirectResponse(url="/", status_code=303)
 
-    crud.create_escaneo(db, ciclo.id, punto)
     return response
 
 
+# 📶 Escaneos guardados sin conexión por el service worker, subidos en un solo lote
+@router.post("/api/scans/sync")
+async def sincronizar_offline(request: Request, db: AsyncSession = Depends(get_async_db)):
+    try:
+        datos = await request.json()
+        escaneos = datos["escaneos"]
+    except Exception:
+        return JSONResponse(status_code=400, content={"error": "Se esperaba {\"escaneos\": [...]}"})
+    if not isinstance(escaneos, list) or not all(isinstance(e, dict) for e in escaneos):
+        return JSONResponse(status_code=400, content={"error": "escaneos debe ser una lista de objetos"})
+    if len(escaneos) > MAX_ESCANEOS_SYNC:
+        return JSONResponse(status_code=413, content={"error": f"Máximo {MAX_ESCANEOS_SYNC} escaneos por lote"})
+
+    device_id = request.cookies.get(COOKIE_NAME)
+    nueva_cookie = device_id is None and any(e.get("placa") for e in escaneos)
+    if nueva_cookie:
+        device_id = uuid.uuid4().hex
+
+    resultado = await db.run_sync(sincronizar_escaneos, device_id, escaneos)
+    for registro in resultado["registros"]:
+        await publicar_registro(registro)
+
+    response = JSONResponse(content={
+        "aplicados": resultado["aplicados"],
+        "rechazados": resultado["rechazados"],
+    })
+    if resultado["cookie"] and (nueva_cookie or resultado["cookie"] != device_id):
+        response.set_cookie(
+            key=COOKIE_NAME,
+            value=resultado["cookie"],
+            max_age=COOKIE_MAX_AGE,
+            httponly=True,
+            samesite="Lax",
+        )
+    return response
+
+# Service worker de la cola offline; servido en la raíz para que controle /scan/*
+@router.get("/sw.js", include_in_schema=False)
+async def service_worker():
+    return FileResponse(
+        "app/static/sw.js",
+        media_type="application/javascript",
+        headers={"Cache-Control": "no-cache", "Service-Worker-Allowed": "/"},
+    )
+
 # Ruta para mostrar la página de geozona
 @router.get("/geozona", response_class=HTMLResponse)
 async def mostrar_geozona(request: Request):
@@ -1,15 +1,15 @@
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from datetime import datetime
-import io
-from fastapi.responses import StreamingResponse, HTMLResponse
+import asyncio
+import json
+from fastapi.responses import StreamingResponse, HTMLResponse, JSONResponse
 from fastapi import APIRouter, Depends, Request
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db_lectura
 from fastapi.templating import Jinja2Templates
-from app import models
 from app.utils.timezone import formatear_hora_panama
+from app.logic.maquina_ciclo import PUNTO_A_ESTADO
+from app.logic.tablero_vivo import consulta_tablero, difusor_tablero
+from app.logic.informe import rango_fechas, filas_informe, generar_csv, generar_xlsx
+from app.logic.analitica import analitica_rango
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
@@ -17,67 +17,13 @@ templates = Jinja2Templates(directory="app/templates")
 
 # 🧭 Vista principal del tablero
 @router.get("/tablero", response_class=HTMLResponse)
-async def mostrar_tablero(request: Request, db: Session = Depends(get_db)):
-    tablero = {  # Estado → listado de placas
-        "Patio": [],
-        "Bodega": [],
-        "Cargando": [],
-    }
-
-    punto_a_estado = {
-        "punto1": "Patio",
-        "punto2": "Bodega",
-        "punto3": "Cargando",
-    }
-
-    # Subconsulta para obtener la última marca de tiempo por ciclo
-    ultimos_por_ciclo = (
-        db.query(
-            models.Escaneo.ciclo_id.label("ciclo_id"),
-            func.max(models.Escaneo.fecha_hora).label("ultima_fecha")
-        )
-        .group_by(models.Escaneo.ciclo_id)
-        .subquery()
-    )
+async def mostrar_tablero(request: Request, db: AsyncSession = Depends(get_async_db_lectura)):
+    tablero = {estado: [] for estado in PUNTO_A_ESTADO.values()}  # Estado → listado de placas
 
-    # Último escaneo por ciclo con su punto asociado
-    ultimo_escaneo = (
-        db.query(
-            models.Escaneo.ciclo_id.label("ciclo_id"),
-            models.Escaneo.punto.label("punto"),
-            models.Escaneo.fecha_hora.label("fecha_hora")
-        )
-        .join(
-            ultimos_por_ciclo,
-            and_(
-                models.Escaneo.ciclo_id == ultimos_por_ciclo.c.ciclo_id,
-                models.Escaneo.fecha_hora == ultimos_por_ciclo.c.ultima_fecha
-            )
-        )
-        .subquery()
-    )
-
-    registros = (
-        db.query(
-            models.Sesion.placa,
-            ultimo_escaneo.c.punto,
-            ultimo_escaneo.c.fecha_hora
-        )
-        .join(models.Ciclo, models.Ciclo.sesion_id == models.Sesion.id)
-        .join(ultimo_escaneo, ultimo_escaneo.c.ciclo_id == models.Ciclo.id)
-        .filter(
-            models.Ciclo.completado == False,
-            models.Sesion.cerrada == False
-        )
-        .order_by(ultimo_escaneo.c.fecha_hora.desc())
-        .all()
-    )
+    registros = await db.execute(consulta_tablero())
 
     for placa, punto, fecha in registros:
-        estado = punto_a_estado.get(punto)
-        if not estado:
-            continue
-        tablero[estado].append({
+        tablero[PUNTO_A_ESTADO[punto]].append({
             "placa": placa,
             "hora": formatear_hora_panama(fecha),
         })
@@ -88,80 +34,60 @@ async def mostrar_tablero(request: Request, db: Session = Depends(get_db)):
     })
 
 
+# 📡 Tablero en vivo (Server-Sent Events): tablero completo al conectar y luego solo cambios
+@router.get("/tablero/stream")
+async def tablero_stream(request: Request):
+    async def eventos():
+        cola, inicial = await difusor_tablero.suscribir()
+        try:
+            yield f"event: completo\ndata: {json.dumps(inicial)}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    mensaje = await asyncio.wait_for(cola.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"  # mantiene viva la conexión detrás de proxies
+                    continue
+                yield f"event: {mensaje['tipo']}\ndata: {json.dumps(mensaje)}\n\n"
+        finally:
+            difusor_tablero.desuscribir(cola)
+
+    return StreamingResponse(eventos(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+
+# 📊 Analítica de ciclos por rango de fechas
+@router.get("/api/analitica")
+def api_analitica(fechaInicio: str, fechaFin: str):
+    desde, hasta = rango_fechas(fechaInicio, fechaFin)
+    return JSONResponse(content=analitica_rango(desde, hasta))
+
+
 # 📊 Descarga de informes Excel
 @router.get("/descargar_informe")
-def descargar_informe(fechaInicio: str, fechaFin: str, db: Session = Depends(get_db)):
-    inicio = datetime.strptime(fechaInicio, "%Y-%m-%d")
-    fin = datetime.strptime(fechaFin, "%Y-%m-%d")
-
-    # 🔹 Datos simulados (luego obtendrás esto desde tu BD)
-    ciclos = [
-        {"placa": "HE2345", "inicio": "2025-10-25 08:00", "fin": "2025-10-25 09:30", "saltos": False, "completado": True},
-        {"placa": "HE7865", "inicio": "2025-10-25 09:00", "fin": "2025-10-25 10:10", "saltos": True, "completado": True},
-    ]
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Informe QRLogix"
-
-    # 🧭 Cabeceras
-    headers = ["Placa", "Inicio", "Fin", "Duración (min)", "Saltos", "Estado"]
-    ws.append(headers)
-
-    # 🎨 Estilos base
-    header_font = Font(bold=True, color="FFFFFF", size=12, name="Arial")
-    header_fill = PatternFill("solid", fgColor="071D49")  # Azul Argos
-    center_align = Alignment(horizontal="center", vertical="center")
-    normal_font = Font(color="071D49", size=11, name="Arial")
-
-    # 🖌️ Estilo de cabecera
-    for cell in ws[1]:
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = center_align
-
-    # 🧾 Agregar datos
-    for c in ciclos:
-        inicio_dt = datetime.strptime(c["inicio"], "%Y-%m-%d %H:%M")
-        fin_dt = datetime.strptime(c["fin"], "%Y-%m-%d %H:%M")
-        duracion = round((fin_dt - inicio_dt).total_seconds() / 60, 1)
-        ws.append([
-            c["placa"],
-            c["inicio"],
-            c["fin"],
-            duracion,
-            "Sí" if c["saltos"] else "No",
-            "Completado" if c["completado"] else "Incompleto"
-        ])
-
-    # 📏 Ajuste de columnas
-    column_widths = [14, 20, 20, 18, 10, 15]
-    for i, width in enumerate(column_widths, start=1):
-        ws.column_dimensions[chr(64 + i)].width = width
-
-    # 🧱 Bordes suaves
-    thin = Side(border_style="thin", color="E0E0E0")
-    border = Border(left=thin, right=thin, top=thin, bottom=thin)
-
-    for row in ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=1, max_col=6):
-        for cell in row:
-            cell.border = border
-            cell.font = normal_font
-            cell.alignment = center_align
-
-    ws.freeze_panes = "A2"
-    ws.auto_filter.ref = "A1:F1"
-
-    # 💾 Guardar en flujo para enviar como descarga
-    stream = io.BytesIO()
-    wb.save(stream)
-    stream.seek(0)
+def descargar_informe(fechaInicio: str, fechaFin: str, formato: str = "xlsx", resumen: bool = False):
+    """
+    Informe de los ciclos iniciados entre fechaInicio y fechaFin (incluidas), en xlsx o csv.
+    Las filas se envían por lotes con memoria constante; resumen=true agrega al xlsx la
+    hoja "Resumen" (analitica_rango), que sí carga los ciclos y escaneos del rango en memoria.
+    """
+    desde, hasta = rango_fechas(fechaInicio, fechaFin)
+    filas = filas_informe(desde, hasta)
+
+    if formato == "csv":
+        filename = f"informe_qrlogix_{fechaInicio}_a_{fechaFin}.csv"
+        return StreamingResponse(
+            generar_csv(filas),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
 
     filename = f"informe_qrlogix_{fechaInicio}_a_{fechaFin}.xlsx"
     headers = {"Content-Disposition": f"attachment; filename={filename}"}
 
     return StreamingResponse(
-        stream,
+        generar_xlsx(filas, resumen=(lambda: analitica_rango(desde, hasta)) if resumen else None),
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers=headers
     )
@@ -0,0 +1,176 @@
+// app/static/sw.js — servido en /sw.js
+// Cola offline de escaneos: si GET/POST /scan/{punto} falla por falta de señal,
+// el escaneo se guarda en IndexedDB con la hora del teléfono y se sube después
+// en un solo POST /api/scans/sync.
+
+const BD_NOMBRE = "qrlogix";
+const BD_TABLA = "escaneos";
+const ETIQUETA_SYNC = "sincronizar-escaneos";
+const RUTA_ESCANEO = /^\/scan\/(punto[1-5])$/;
+const MAX_LOTE = 200;  // igual que MAX_ESCANEOS_SYNC en el servidor
+
+self.addEventListener("install", () => self.skipWaiting());
+self.addEventListener("activate", (event) => event.waitUntil(self.clients.claim()));
+
+// =============================================
+// 🔹 IndexedDB
+// =============================================
+
+function abrirBD() {
+  return new Promise((resolve, reject) => {
+    const peticion = indexedDB.open(BD_NOMBRE, 1);
+    peticion.onupgradeneeded = () => {
+      peticion.result.createObjectStore(BD_TABLA, { keyPath: "id", autoIncrement: true });
+    };
+    peticion.onsuccess = () => resolve(peticion.result);
+    peticion.onerror = () => reject(peticion.error);
+  });
+}
+
+async function operar(modo, fn) {
+  const bd = await abrirBD();
+  return new Promise((resolve, reject) => {
+    const tx = bd.transaction(BD_TABLA, modo);
+    const resultado = fn(tx.objectStore(BD_TABLA));
+    tx.oncomplete = () => { bd.close(); resolve(resultado && resultado.result); };
+    tx.onerror = () => { bd.close(); reject(tx.error); };
+  });
+}
+
+const guardarEscaneo = (escaneo) => operar("readwrite", (tabla) => tabla.add(escaneo));
+const leerPendientes = () => operar("readonly", (tabla) => tabla.getAll());
+const borrarEscaneos = (ids) => operar("readwrite", (tabla) => ids.forEach((id) => tabla.delete(id)));
+
+async function agregarUbicacion(id, lat, lon) {
+  await operar("readwrite", (tabla) => {
+    const peticion = tabla.get(id);
+    peticion.onsuccess = () => {
+      if (peticion.result) tabla.put({ ...peticion.result, lat, lon });
+    };
+  });
+}
+
+// =============================================
+// 🔹 CAPTURA SIN CONEXIÓN
+// =============================================
+
+self.addEventListener("fetch", (event) => {
+  const url = new URL(event.request.url);
+  const coincide = url.origin === self.location.origin && url.pathname.match(RUTA_ESCANEO);
+  if (!coincide || event.request.mode !== "navigate") return;
+
+  const punto = coincide[1];
+  if (event.request.method === "GET") {
+    event.respondWith(enLinea(event.request, async () => ({ punto })));
+  } else if (event.request.method === "POST") {
+    const formulario = event.request.clone().formData();
+    event.respondWith(enLinea(event.request, async () => {
+      const datos = await formulario;
+      return {
+        punto,
+        placa: (datos.get("plate") || "").toUpperCase(),
+        lat: datos.get("lat") ? Number(datos.get("lat")) : null,
+        lon: datos.get("lon") ? Number(datos.get("lon")) : null,
+      };
+    }));
+  }
+});
+
+async function enLinea(peticion, describir) {
+  try {
+    const respuesta = await fetch(peticion);
+    sincronizar().catch(() => {});  // hay señal: aprovechar para subir lo pendiente
+    return respuesta;
+  } catch (error) {
+    const escaneo = { ...(await describir()), fecha: new Date().toISOString() };
+    const id = await guardarEscaneo(escaneo);
+    if (self.registration.sync) {
+      self.registration.sync.register(ETIQUETA_SYNC).catch(() => {});
+    }
+    return paginaSinConexion(id, escaneo);
+  }
+}
+
+function paginaSinConexion(id, escaneo) {
+  const hora = new Date(escaneo.fecha).toLocaleTimeString("es-PA", { hour: "numeric", minute: "2-digit" });
+  const html = `<!DOCTYPE html>
+<html lang="es">
+<head>
+  <meta charset="UTF-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1.0">
+  <title>QRLogix — Sin conexión</title>
+  <style>
+    body { font-family: 'Montserrat', sans-serif; background: #071D49; color: #fff; margin: 0;
+           min-height: 100vh; display: flex; flex-direction: column; align-items: center;
+           justify-content: center; text-align: center; padding: 20px; box-sizing: border-box; }
+    h1 { color: #C4D600; font-size: 1.8rem; margin: 0 0 1rem; }
+    p { font-size: 1.1rem; font-weight: 600; margin: .4rem 0; }
+    .aviso { background: #C4D600; color: #071D49; border-radius: 10px; padding: 12px 18px; margin-top: 1.5rem; }
+  </style>
+</head>
+<body>
+  <h1>SIN CONEXIÓN</h1>
+  <p>Escaneo guardado en el teléfono</p>
+  <p>${escaneo.punto.toUpperCase()} — ${hora}</p>
+  <div class="aviso">Se enviará automáticamente al recuperar la señal.</div>
+  <script>
+    // La ubicación se adjunta al escaneo para validar la geozona en el servidor
+    if (navigator.geolocation && navigator.serviceWorker.controller) {
+      navigator.geolocation.getCurrentPosition((pos) => {
+        navigator.serviceWorker.controller.postMessage({
+          tipo: "ubicacion", id: ${id}, lat: pos.coords.latitude, lon: pos.coords.longitude
+        });
+      }, () => {}, { timeout: 10000 });
+    }
+    window.addEventListener("online", () => {
+      navigator.serviceWorker.controller && navigator.serviceWorker.controller.postMessage({ tipo: "sincronizar" });
+    });
+  </script>
+</body>
+</html>`;
+  return new Response(html, { headers: { "Content-Type": "text/html; charset=utf-8" } });
+}
+
+// =============================================
+// 🔹 SINCRONIZACIÓN
+// =============================================
+
+let sincronizando = null;
+
+function sincronizar() {
+  // Una sola subida a la vez; las llamadas simultáneas esperan la misma
+  if (!sincronizando) {
+    sincronizando = subirPendientes().finally(() => { sincronizando = null; });
+  }
+  return sincronizando;
+}
+
+async function subirPendientes() {
+  const pendientes = await leerPendientes();
+  for (let i = 0; i < pendientes.length; i += MAX_LOTE) {
+    const lote = pendientes.slice(i, i + MAX_LOTE);
+    const respuesta = await fetch("/api/scans/sync", {
+      method: "POST",
+      credentials: "same-origin",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ escaneos: lote }),
+    });
+    if (!respuesta.ok) throw new Error(`sync ${respuesta.status}`);
+    const resultado = await respuesta.json();
+    // Los rechazados (fuera de geozona, fuera de orden...) no se reintentan
+    await borrarEscaneos([...resultado.aplicados, ...resultado.rechazados.map((r) => r.id)]);
+  }
+}
+
+self.addEventListener("sync", (event) => {
+  if (event.tag === ETIQUETA_SYNC) event.waitUntil(sincronizar());
+});
+
+self.addEventListener("message", (event) => {
+  const datos = event.data || {};
+  if (datos.tipo === "ubicacion") {
+    event.waitUntil(agregarUbicacion(datos.id, datos.lat, datos.lon));
+  } else if (datos.tipo === "sincronizar") {
+    event.waitUntil(sincronizar().catch(() => {}));
+  }
+});
@@ -0,0 +1,130 @@
+# benchmarks/acciones.py
+"""
+Benchmark de la acción múltiple de /ciclos/accion (cerrar N ciclos abiertos).
+
+Compara el recorrido anterior (consulta, UPDATE, DELETE, INSERT y commit por
+placa) con procesar_accion_multiple en bloque, para 10, 100 y 1000 placas.
+Reporta tiempo, sentencias enviadas y commits.
+
+    python -m benchmarks.acciones --url postgresql://localhost/qrlogix_bench
+
+La base indicada debe estar vacía (o usar --recrear para borrarla).
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from benchmarks.comun import preparar_entorno, base_vacia, recrear_esquema, sembrar, compatibilidad_sqlite, guardar_json
+
+
+async def accion_multiple_anterior(db, placas, motivo, detalles, registrado_por):
+    """El recorrido por placa que usaba procesar_accion_multiple (solo 'cerrar')."""
+    from sqlalchemy import text
+
+    for placa in placas:
+        ciclo = (await db.execute(text("""
+            SELECT sesion_id, ciclo_id FROM ciclo_estado
+            WHERE placa = :placa ORDER BY ultimo_escaneo DESC LIMIT 1;
+        """), {"placa": placa})).fetchone()
+        if not ciclo:
+            continue
+        await db.execute(text("UPDATE ciclos SET completado = TRUE, fin = NOW() WHERE id = :cid"), {"cid": ciclo.ciclo_id})
+        await db.execute(text("DELETE FROM ciclo_estado WHERE ciclo_id = :cid"), {"cid": ciclo.ciclo_id})
+        await db.execute(text("""
+            INSERT INTO ciclo_manual
+            (placa, fecha_eliminacion, motivo, detalles, sesion_id, ciclo_id, registrado_por)
+            VALUES (:placa, NOW(), :motivo, :detalles, :sid, :cid, :registrado_por);
+        """), {
+            "placa": placa, "motivo": motivo, "detalles": detalles, "sid": ciclo.sesion_id,
+            "cid": ciclo.ciclo_id, "registrado_por": registrado_por,
+        })
+        await db.commit()
+
+
+def _contador(async_engine):
+    """Cuenta sentencias y commits del engine asíncrono."""
+    from sqlalchemy import event
+
+    cuenta = {"sentencias": 0, "commits": 0}
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def _sentencia(*args):
+        cuenta["sentencias"] += 1
+
+    @event.listens_for(async_engine.sync_engine, "commit")
+    def _commit(*args):
+        cuenta["commits"] += 1
+
+    return cuenta
+
+
+async def _medir(engine, AsyncSessionLocal, cuenta, placas_n, fn) -> dict:
+    from sqlalchemy import text
+
+    recrear_esquema(engine)
+    sembrar(engine, escaneos=max(20_000, placas_n * 15), camiones=placas_n, ciclos_abiertos=placas_n)
+    with engine.connect() as conn:
+        placas = [f[0] for f in conn.execute(text("SELECT placa FROM ciclo_estado ORDER BY placa"))]
+
+    cuenta.update(sentencias=0, commits=0)
+    async with AsyncSessionLocal() as db:
+        inicio = time.perf_counter()
+        await fn(db, placas)
+        segundos = time.perf_counter() - inicio
+
+    with engine.connect() as conn:
+        abiertos = conn.execute(text("SELECT COUNT(*) FROM ciclo_estado")).scalar()
+    return {
+        "placas": len(placas),
+        "ms": round(segundos * 1000, 1),
+        "sentencias": cuenta["sentencias"],
+        "commits": cuenta["commits"],
+        "abiertos_restantes": abiertos,
+    }
+
+
+async def _main(args):
+    from app.database import engine, async_engine, AsyncSessionLocal
+    from app.routes.ciclos_routes import procesar_accion_multiple
+
+    # SQLite no tiene NOW(); el recorrido anterior lo usa en SQL directo
+    compatibilidad_sqlite(engine, async_engine)
+
+    cuenta = _contador(async_engine)
+    resultados = []
+    for n in args.placas:
+        anterior = await _medir(engine, AsyncSessionLocal, cuenta, n, lambda db, placas: accion_multiple_anterior(
+            db, placas, "benchmark", "", "benchmark"))
+        bloque = await _medir(engine, AsyncSessionLocal, cuenta, n, lambda db, placas: procesar_accion_multiple(
+            db, placas, "benchmark", "", "benchmark", "cerrar"))
+        resultados.append({"placas": n, "anterior": anterior, "bloque": bloque})
+        print(
+            f"{n:>5} placas — anterior {anterior['ms']} ms / {anterior['sentencias']} sentencias, "
+            f"bloque {bloque['ms']} ms / {bloque['sentencias']} sentencias",
+            file=sys.stderr,
+        )
+
+    await async_engine.dispose()
+    guardar_json(args.salida, {"dialecto": engine.dialect.name, "resultados": resultados})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="URL de una base desechable")
+    parser.add_argument("--placas", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--recrear", action="store_true", help="Borrar las tablas existentes antes de sembrar")
+    parser.add_argument("--salida", help="Archivo JSON para guardar el resultado")
+    args = parser.parse_args(argv)
+
+    preparar_entorno(args.url)
+    from app.database import engine
+
+    if not base_vacia(engine) and not args.recrear:
+        sys.exit("La base tiene datos; use una base desechable o --recrear.")
+
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
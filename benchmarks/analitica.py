@@ -0,0 +1,118 @@
+# benchmarks/analitica.py
+"""
+Benchmark de app/logic/analitica.py contra un recorrido ingenuo por ciclo con el ORM.
+
+El recorrido ingenuo carga los ciclos del rango y, para cada uno, su sesión y
+sus escaneos (carga perezosa), y calcula en Python duración, saltos y
+permanencias. Ambos deben dar los mismos totales; se comparan los tiempos.
+
+    python -m benchmarks.analitica --url postgresql://localhost/qrlogix_bench \\
+        --tamanos 10000 100000 1000000
+
+La base indicada debe estar vacía (o usar --recrear para borrarla).
+"""
+import argparse
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from benchmarks.comun import preparar_entorno, base_vacia, recrear_esquema, sembrar, guardar_json
+
+
+def analitica_ingenua(SessionLocal, models, desde, hasta, puntos_omitidos, mascara_puntos, convertir_a_panama) -> dict:
+    """Misma analítica (lo esencial) recorriendo ciclo por ciclo."""
+    duraciones, tramos = [], defaultdict(list)
+    con_salto = escaneos_total = 0
+    db = SessionLocal()
+    try:
+        ciclos = db.query(models.Ciclo).filter(models.Ciclo.inicio >= desde, models.Ciclo.inicio < hasta).all()
+        placas = set()
+        for ciclo in ciclos:
+            placas.add(ciclo.sesion.placa)
+            escaneos = sorted(ciclo.escaneos, key=lambda e: convertir_a_panama(e.fecha_hora))
+            escaneos_total += len(escaneos)
+            if puntos_omitidos(mascara_puntos(e.punto for e in escaneos)):
+                con_salto += 1
+            for anterior, actual in zip(escaneos, escaneos[1:]):
+                minutos = (convertir_a_panama(actual.fecha_hora) - convertir_a_panama(anterior.fecha_hora)).total_seconds() / 60
+                tramos[(anterior.punto, actual.punto)].append(minutos)
+            if ciclo.completado and ciclo.fin is not None:
+                duraciones.append((convertir_a_panama(ciclo.fin) - convertir_a_panama(ciclo.inicio)).total_seconds() / 60)
+    finally:
+        db.close()
+    return {
+        "ciclos": len(ciclos),
+        "escaneos": escaneos_total,
+        "placas": len(placas),
+        "con_saltos": con_salto,
+        "duracion_p50": round(statistics.median(duraciones), 1) if duraciones else None,
+        "tramos": len(tramos),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="URL de una base desechable")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--recrear", action="store_true", help="Borrar las tablas existentes antes de sembrar")
+    parser.add_argument("--salida", help="Archivo JSON para guardar el resultado")
+    args = parser.parse_args(argv)
+
+    preparar_entorno(args.url)
+    from sqlalchemy import text
+    from app.database import engine, SessionLocal
+    from app import models
+    from app.logic import analitica
+    from app.logic.maquina_ciclo import puntos_omitidos, mascara_puntos
+    from app.utils.timezone import ahora_panama, convertir_a_panama
+
+    if not base_vacia(engine) and not args.recrear:
+        sys.exit("La base tiene datos; use una base desechable o --recrear.")
+
+    resultados = []
+    for tamano in args.tamanos:
+        recrear_esquema(engine)
+        semilla = sembrar(engine, escaneos=tamano)
+        semilla.pop("muestras")
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+
+        hasta = ahora_panama() + timedelta(days=1)
+        desde = hasta - timedelta(days=3650)
+
+        inicio = time.perf_counter()
+        vectorizada = analitica.analitica_rango(desde, hasta)
+        t_vectorizada = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        ingenua = analitica_ingenua(SessionLocal, models, desde, hasta, puntos_omitidos, mascara_puntos, convertir_a_panama)
+        t_ingenua = time.perf_counter() - inicio
+
+        coincide = (
+            vectorizada["resumen"]["ciclos"] == ingenua["ciclos"]
+            and vectorizada["resumen"]["escaneos"] == ingenua["escaneos"]
+            and vectorizada["resumen"]["con_saltos"] == ingenua["con_saltos"]
+            and vectorizada["duracion_ciclo_min"]["p50"] == ingenua["duracion_p50"]
+            and len(vectorizada["permanencia_min"]) == ingenua["tramos"]
+        )
+        fila = {
+            "datos": semilla,
+            "vectorizada_s": round(t_vectorizada, 2),
+            "ingenua_s": round(t_ingenua, 2),
+            "mejora": round(t_ingenua / max(t_vectorizada, 1e-6), 1),
+            "resultados_coinciden": coincide,
+        }
+        resultados.append(fila)
+        print(
+            f"{semilla['escaneos']:>10} escaneos — vectorizada {fila['vectorizada_s']} s, "
+            f"ingenua {fila['ingenua_s']} s, coinciden: {coincide}",
+            file=sys.stderr,
+        )
+
+    guardar_json(args.salida, {"dialecto": engine.dialect.name, "resultados": resultados})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+# benchmarks/carga.py
+"""
+Prueba de carga de /scan, /tablero, /api/ciclos y /ciclos/accion.
+
+Levanta la app de app.main en el mismo proceso (httpx + ASGI, con su lifespan)
+sobre una base desechable sembrada con historial realista, y simula camiones
+que recorren punto1 → punto5 en paralelo:
+
+  - registro de placa (POST /scan/punto1) y luego GET /scan/{punto};
+  - una fracción omite punto3 (el ciclo se elimina en punto5);
+  - una fracción cambia de teléfono a mitad del ciclo (traspaso de cookie:
+    POST con la misma placa desde un dispositivo nuevo).
+
+Mientras tanto, pantallas de tablero consultan /tablero y /api/ciclos y un
+supervisor cierra ciclos sembrados con /ciclos/accion. Reporta p50/p95/p99,
+rendimiento (req/s) y consultas SQL por request para cada endpoint.
+
+    python -m benchmarks.carga --url postgresql://localhost/qrlogix_bench \\
+        --camiones 200 --concurrencia 50 --salida carga.json
+
+Con --base-url se apunta a un servidor ya levantado (p. ej. uvicorn con varios
+workers); en ese modo no se cuentan consultas. La base indicada debe estar
+vacía (o usar --recrear para borrarla).
+"""
+import argparse
+import asyncio
+import contextvars
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+from benchmarks.comun import (
+    PUNTOS, preparar_entorno, base_vacia, recrear_esquema, sembrar, compatibilidad_sqlite,
+    percentiles, guardar_json,
+)
+
+# Contador de consultas del request en curso (lo incrementa el evento del engine)
+_consultas = contextvars.ContextVar("consultas", default=None)
+
+
+class Registro:
+    """Latencias, códigos de estado y consultas por endpoint."""
+
+    def __init__(self):
+        self.tiempos = defaultdict(list)
+        self.estados = defaultdict(lambda: defaultdict(int))
+        self.consultas = defaultdict(list)
+
+    def anotar(self, nombre, ms, estado, consultas):
+        self.tiempos[nombre].append(ms)
+        self.estados[nombre][estado] += 1
+        if consultas is not None:
+            self.consultas[nombre].append(consultas)
+
+    def resumen(self, segundos: float) -> dict:
+        resultado = {}
+        for nombre, tiempos in sorted(self.tiempos.items()):
+            consultas = self.consultas.get(nombre)
+            resultado[nombre] = {
+                **percentiles(tiempos),
+                "rps": round(len(tiempos) / segundos, 1),
+                "estados": dict(self.estados[nombre]),
+                "consultas_media": round(sum(consultas) / len(consultas), 2) if consultas else None,
+                "consultas_max": max(consultas) if consultas else None,
+            }
+        return resultado
+
+
+class Cliente:
+    """Un teléfono (o pantalla): su propio httpx.AsyncClient y sus cookies."""
+
+    def __init__(self, crear_cliente, limite: asyncio.Semaphore, registro: Registro, contar: bool):
+        self.http = crear_cliente()
+        self.limite = limite
+        self.registro = registro
+        self.contar = contar
+
+    async def pedir(self, nombre, metodo, url, **kwargs):
+        async with self.limite:
+            contador = [0] if self.contar else None
+            _consultas.set(contador)
+            inicio = time.perf_counter()
+            try:
+                respuesta = await self.http.request(metodo, url, **kwargs)
+                estado = respuesta.status_code
+            except Exception as e:
+                respuesta, estado = None, type(e).__name__
+            ms = (time.perf_counter() - inicio) * 1000
+        self.registro.anotar(nombre, ms, estado, contador[0] if contador else None)
+        return respuesta
+
+    async def cerrar(self):
+        await self.http.aclose()
+
+
+def formulario(placa: str) -> dict:
+    """Registro de placa con la ubicación del centro de la planta (el POST valida la geozona)."""
+    return {"plate": placa, "lat": os.environ["ZONA_LAT"], "lon": os.environ["ZONA_LON"]}
+
+
+async def camion(n, args, nuevo_cliente, rnd):
+    """Un camión: registra su placa y hace `args.ciclos` ciclos completos."""
+    placa = f"L{n:05d}"
+    telefono = nuevo_cliente()
+    try:
+        await telefono.pedir("POST /scan", "POST", "/scan/punto1", data=formulario(placa))
+        for _ in range(args.ciclos):
+            for punto in PUNTOS:
+                if punto == "punto3" and rnd.random() < args.saltos:
+                    continue
+                if punto != "punto1" and rnd.random() < args.traspasos:
+                    # Traspaso: el conductor sigue desde otro teléfono con la misma placa
+                    await telefono.cerrar()
+                    telefono = nuevo_cliente()
+                    await telefono.pedir("POST /scan", "POST", f"/scan/{punto}", data=formulario(placa))
+                    continue
+                await telefono.pedir("GET /scan", "GET", f"/scan/{punto}")
+                if args.pausa_ms:
+                    await asyncio.sleep(rnd.uniform(0, 2 * args.pausa_ms) / 1000)
+    finally:
+        await telefono.cerrar()
+
+
+async def pantalla(pantalla_cliente, fin: asyncio.Event, intervalo_s: float):
+    """Tablero abierto en una pantalla: consulta /tablero y /api/ciclos en bucle."""
+    try:
+        while not fin.is_set():
+            await pantalla_cliente.pedir("GET /tablero", "GET", "/tablero")
+            await pantalla_cliente.pedir("GET /api/ciclos", "GET", "/api/ciclos")
+            await asyncio.sleep(intervalo_s)
+    finally:
+        await pantalla_cliente.cerrar()
+
+
+async def supervisor(cliente, placas, fin: asyncio.Event, intervalo_s: float, rnd):
+    """Cierra manualmente ciclos sembrados, uno o varios a la vez."""
+    placas = list(placas)
+    rnd.shuffle(placas)
+    while placas and not fin.is_set():
+        lote = [placas.pop() for _ in range(min(len(placas), rnd.choice([1, 1, 1, 5])))]
+        await cliente.pedir("POST /ciclos/accion", "POST", "/ciclos/accion", json={
+            "placas": lote, "motivo": "carga", "detalles": "", "registrado_por": "benchmark", "accion": "cerrar",
+        })
+        await asyncio.sleep(intervalo_s)
+
+
+async def _correr(args, semilla: dict) -> dict:
+    import httpx
+
+    registro = Registro()
+    limite = asyncio.Semaphore(args.concurrencia)
+    rnd = random.Random(args.semilla)
+
+    if args.base_url:
+        def crear_cliente():
+            return httpx.AsyncClient(base_url=args.base_url, timeout=60)
+        contar = False
+        contexto = None
+    else:
+        from app.main import app
+        transporte = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+
+        def crear_cliente():
+            return httpx.AsyncClient(transport=transporte, base_url="http://carga", timeout=60)
+        contar = True
+        contexto = app.router.lifespan_context(app)
+        await contexto.__aenter__()
+
+    def nuevo_cliente():
+        return Cliente(crear_cliente, limite, registro, contar)
+
+    fin = asyncio.Event()
+    observadores = [
+        asyncio.create_task(pantalla(nuevo_cliente(), fin, args.intervalo_tablero_ms / 1000))
+        for _ in range(args.pantallas)
+    ]
+    operador = nuevo_cliente()
+    observadores.append(asyncio.create_task(supervisor(
+        operador, [m["placa"] for m in semilla["muestras"]], fin, args.intervalo_accion_ms / 1000, rnd,
+    )))
+
+    inicio = time.perf_counter()
+    try:
+        await asyncio.gather(*[
+            camion(n, args, nuevo_cliente, random.Random(args.semilla + n)) for n in range(args.camiones)
+        ])
+    finally:
+        segundos = time.perf_counter() - inicio
+        fin.set()
+        await asyncio.gather(*observadores)
+        await operador.cerrar()
+
+    if contexto is not None:
+        await contexto.__aexit__(None, None, None)
+        from app.database import cerrar_motores
+        await cerrar_motores()
+
+    total = sum(len(t) for t in registro.tiempos.values())
+    return {
+        "duracion_s": round(segundos, 2),
+        "requests": total,
+        "rps": round(total / segundos, 1),
+        "endpoints": registro.resumen(segundos),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="URL de una base desechable")
+    parser.add_argument("--base-url", help="Servidor ya levantado (si no, la app corre en este proceso)")
+    parser.add_argument("--camiones", type=int, default=100, help="Camiones simulados en paralelo")
+    parser.add_argument("--ciclos", type=int, default=2, help="Ciclos completos por camión")
+    parser.add_argument("--concurrencia", type=int, default=20, help="Requests simultáneos como máximo")
+    parser.add_argument("--saltos", type=float, default=0.1, help="Fracción de ciclos que omiten punto3")
+    parser.add_argument("--traspasos", type=float, default=0.03, help="Probabilidad de cambiar de teléfono por punto")
+    parser.add_argument("--pausa-ms", type=float, default=0, help="Pausa media entre puntos de un camión")
+    parser.add_argument("--pantallas", type=int, default=3, help="Pantallas de tablero consultando")
+    parser.add_argument("--intervalo-tablero-ms", type=float, default=500)
+    parser.add_argument("--intervalo-accion-ms", type=float, default=1000)
+    parser.add_argument("--historial", type=int, default=100_000, help="Escaneos sembrados como historial")
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--recrear", action="store_true", help="Borrar las tablas existentes antes de sembrar")
+    parser.add_argument("--salida", help="Archivo JSON para guardar el resultado")
+    args = parser.parse_args(argv)
+
+    preparar_entorno(args.url)
+    from sqlalchemy import event
+    from app.database import engine, async_engine
+
+    if not base_vacia(engine) and not args.recrear:
+        sys.exit("La base tiene datos; use una base desechable o --recrear.")
+
+    recrear_esquema(engine)
+    semilla = sembrar(engine, escaneos=args.historial, ciclos_abiertos=100)
+    compatibilidad_sqlite(engine, async_engine)
+
+    for e in (engine, async_engine.sync_engine):
+        @event.listens_for(e, "before_cursor_execute")
+        def _contar(*_):
+            contador = _consultas.get()
+            if contador is not None:
+                contador[0] += 1
+
+    resultado = asyncio.run(_correr(args, semilla))
+    print(f"{resultado['requests']} requests en {resultado['duracion_s']} s ({resultado['rps']} req/s)", file=sys.stderr)
+    for nombre, fila in resultado["endpoints"].items():
+        print(
+            f"{nombre:>20}: p50 {fila['p50_ms']} ms, p95 {fila['p95_ms']} ms, p99 {fila['p99_ms']} ms, "
+            f"{fila['rps']} req/s, consultas {fila['consultas_media']}, estados {fila['estados']}",
+            file=sys.stderr,
+        )
+
+    semilla.pop("muestras")
+    guardar_json(args.salida, {
+        "dialecto": engine.dialect.name,
+        "parametros": {k: v for k, v in vars(args).items() if k not in ("url", "salida")},
+        "datos": semilla,
+        **resultado,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# benchmarks/comun.py
+"""Utilidades compartidas por los benchmarks: entorno, siembra de datos y estadísticas."""
+import json
+import os
+import random
+import statistics
+import time
+from datetime import timedelta
+
+PUNTOS = ["punto1", "punto2", "punto3", "punto4", "punto5"]
+
+
+def preparar_entorno(url: str):
+    """Apunta la aplicación a la base del benchmark. Llamar antes de importar app.*"""
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("ZONA_LAT", "8.98")
+    os.environ.setdefault("ZONA_LON", "-79.52")
+    os.environ.setdefault("ZONA_METROS", "500")
+    os.environ.setdefault("LOG_NIVEL", "WARNING")  # sin un evento por request en la salida
+    os.environ.setdefault("REBOTE_ACTIVO", "false")  # los camiones simulados escanean sin pausa
+
+
+def base_vacia(engine) -> bool:
+    """True si la base no tiene camiones (evita sembrar sobre datos reales)."""
+    from sqlalchemy import inspect, text
+    if "camiones" not in inspect(engine).get_table_names():
+        return True
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*) FROM camiones")).scalar() == 0
+
+
+def recrear_esquema(engine):
+    """Borra y crea las tablas del ORM más ciclo_manual (usada con SQL directo)."""
+    from sqlalchemy import text
+    from app.database import Base
+    from app import models  # noqa: F401
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS ciclo_manual"))
+        conn.execute(text("""
+            CREATE TABLE ciclo_manual (
+                id INTEGER PRIMARY KEY, placa VARCHAR, fecha_eliminacion TIMESTAMP,
+                sesion_id INTEGER, ciclo_id INTEGER, motivo VARCHAR, detalles VARCHAR,
+                registrado_por VARCHAR
+            )
+        """))
+
+
+def compatibilidad_sqlite(*engines):
+    """Con SQLite registra NOW(), que el SQL directo de algunas rutas usa."""
+    import datetime
+    from sqlalchemy import event
+
+    for e in engines:
+        e = getattr(e, "sync_engine", e)
+        if e.dialect.name != "sqlite":
+            continue
+
+        @event.listens_for(e, "connect")
+        def _now(dbapi_conn, registro):
+            dbapi_conn.create_function("NOW", 0, lambda: datetime.datetime.utcnow().isoformat(" "))
+
+
+def _insertar(conn, tabla, filas, lote=10_000):
+    for i in range(0, len(filas), lote):
+        conn.execute(tabla.insert(), filas[i:i + lote])
+
+
+def sembrar(engine, escaneos: int = 100_000, camiones: int = 300, ciclos_abiertos: int = 40, semilla: int = 7) -> dict:
+    """
+    Siembra un historial realista: cada camión abre una sesión por día y hace
+    tres ciclos de cinco puntos (un 10 % omite punto3). Las sesiones del último
+    día siguen activas y sus ciclos más recientes quedan abiertos (con su fila
+    en ciclo_estado).
+
+    Devuelve las muestras de sesiones activas para las consultas del benchmark.
+    """
+    from app import models
+    from app.utils.timezone import ahora_panama
+
+    rnd = random.Random(semilla)
+    ahora = ahora_panama()
+    ciclos_por_sesion = 3
+    total_ciclos = max(1, escaneos // 5)
+    total_sesiones = max(camiones, total_ciclos // ciclos_por_sesion)
+    dias = max(1, total_sesiones // camiones)
+
+    filas_camiones = [{"id": c, "device_cookie": f"bench{c:06d}"} for c in range(1, camiones + 1)]
+    filas_sesiones, filas_ciclos, filas_escaneos, filas_estado = [], [], [], []
+    muestras = []
+    ciclo_id = escaneo_id = 0
+    primera_activa = total_sesiones - camiones
+
+    for s in range(total_sesiones):
+        sesion_id = s + 1
+        camion_id = s % camiones + 1
+        dia = min(s // camiones, dias - 1)
+        inicio = ahora - timedelta(days=dias - dia, hours=-rnd.uniform(0, 2))
+        activa = s >= primera_activa
+        if activa:
+            inicio = ahora - timedelta(hours=rnd.uniform(1, 6))
+        filas_sesiones.append({
+            "id": sesion_id, "camion_id": camion_id, "placa": f"P{camion_id:05d}",
+            "inicio": inicio, "fin": inicio + timedelta(hours=15), "cerrada": False,
+        })
+        for k in range(ciclos_por_sesion):
+            ciclo_id += 1
+            inicio_ciclo = inicio + timedelta(minutes=k * 90)
+            abierto = activa and k == ciclos_por_sesion - 1 and s - primera_activa < ciclos_abiertos
+            puntos = [p for p in PUNTOS if not (p == "punto3" and rnd.random() < 0.1)]
+            if abierto:
+                puntos = puntos[:rnd.randint(1, 3)]
+            minuto = 0
+            for p in puntos:
+                escaneo_id += 1
+                minuto += rnd.randint(3, 25)
+                filas_escaneos.append({
+                    "id": escaneo_id, "ciclo_id": ciclo_id, "punto": p,
+                    "fecha_hora": inicio_ciclo + timedelta(minutes=minuto),
+                })
+            filas_ciclos.append({
+                "id": ciclo_id, "sesion_id": sesion_id, "inicio": inicio_ciclo,
+                "fin": None if abierto else inicio_ciclo + timedelta(minutes=minuto),
+                "completado": not abierto,
+            })
+            if abierto:
+                filas_estado.append({
+                    "ciclo_id": ciclo_id, "sesion_id": sesion_id, "placa": f"P{camion_id:05d}",
+                    "puntos_mascara": sum(1 << PUNTOS.index(p) for p in puntos),
+                    "inicio": inicio_ciclo, "ultimo_escaneo": filas_escaneos[-1]["fecha_hora"],
+                    "ultimo_punto": puntos[-1],
+                })
+                muestras.append({
+                    "cookie": f"bench{camion_id:06d}", "camion_id": camion_id,
+                    "placa": f"P{camion_id:05d}", "sesion_id": sesion_id, "ciclo_id": ciclo_id,
+                })
+
+    with engine.begin() as conn:
+        _insertar(conn, models.Camion.__table__, filas_camiones)
+        _insertar(conn, models.Sesion.__table__, filas_sesiones)
+        _insertar(conn, models.Ciclo.__table__, filas_ciclos)
+        _insertar(conn, models.Escaneo.__table__, filas_escaneos)
+        _insertar(conn, models.CicloEstado.__table__, filas_estado)
+
+    return {
+        "camiones": camiones,
+        "sesiones": total_sesiones,
+        "ciclos": ciclo_id,
+        "escaneos": escaneo_id,
+        "muestras": muestras,
+    }
+
+
+def percentiles(tiempos_ms) -> dict:
+    ordenados = sorted(tiempos_ms)
+    if not ordenados:
+        return {"n": 0}
+
+    def p(q):
+        return round(ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))], 3)
+
+    return {
+        "n": len(ordenados),
+        "media_ms": round(statistics.fmean(ordenados), 3),
+        "p50_ms": p(0.50),
+        "p95_ms": p(0.95),
+        "p99_ms": p(0.99),
+        "max_ms": round(ordenados[-1], 3),
+    }
+
+
+def medir(fn, repeticiones: int) -> dict:
+    """Ejecuta fn(i) `repeticiones` veces y devuelve sus percentiles en ms."""
+    tiempos = []
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        fn(i)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return percentiles(tiempos)
+
+
+def guardar_json(ruta: str | None, datos: dict):
+    texto = json.dumps(datos, indent=2, ensure_ascii=False, default=str)
+    if ruta:
+        with open(ruta, "w", encoding="utf-8") as f:
+            f.write(texto)
+    print(texto)
@@ -0,0 +1,137 @@
+# benchmarks/geozona.py
+"""
+Micro-benchmark de la geocerca del servidor (app/logic/geozona.py).
+
+Compara, por escaneo, la validación anterior (haversine contra el centro de
+ZONA_LAT/ZONA_LON) con Geocerca.contiene (caja precalculada + distancia plana,
+haversine solo cerca del borde) y con Geocerca.contiene_lote (numpy, como la
+sincronización offline). También mide una geocerca de varios polígonos.
+
+Antes de medir verifica que el círculo dé exactamente el mismo resultado que
+haversine, incluidos puntos a ±1 m del borde, y que el modo lote coincida con
+el modo por punto. El objetivo es menos de 1 µs por escaneo.
+
+    python -m benchmarks.geozona --puntos 200000 --lote 200
+
+No usa base de datos.
+"""
+import argparse
+import math
+import random
+import sys
+import time
+
+from benchmarks.comun import preparar_entorno, guardar_json
+
+OBJETIVO_NS = 1000
+
+
+def puntos_de_prueba(rnd, lat0, lon0, radio_m, n):
+    """Mezcla de escaneos reales: la mayoría dentro, algunos lejos y algunos sobre el borde."""
+    puntos = []
+    for _ in range(n):
+        caso = rnd.random()
+        if caso < 0.7:
+            distancia = radio_m * math.sqrt(rnd.random())
+        elif caso < 0.85:
+            distancia = radio_m + rnd.uniform(-1, 1)
+        else:
+            distancia = rnd.uniform(radio_m, 50 * radio_m)
+        rumbo = rnd.uniform(0, 2 * math.pi)
+        dlat = distancia * math.cos(rumbo) / 111_195
+        dlon = distancia * math.sin(rumbo) / (111_195 * math.cos(math.radians(lat0)))
+        puntos.append((lat0 + dlat, lon0 + dlon))
+    return puntos
+
+
+def poligono_regular(lat0, lon0, radio_m, lados):
+    """Anillo (lat, lon) de un polígono regular alrededor de un centro."""
+    return [
+        (
+            lat0 + radio_m * math.cos(2 * math.pi * i / lados) / 111_195,
+            lon0 + radio_m * math.sin(2 * math.pi * i / lados) / (111_195 * math.cos(math.radians(lat0))),
+        )
+        for i in range(lados)
+    ]
+
+
+def _medir(nombre, fn, puntos) -> dict:
+    inicio = time.perf_counter()
+    for lat, lon in puntos:
+        fn(lat, lon)
+    segundos = time.perf_counter() - inicio
+    resultado = {"ns_por_escaneo": round(segundos / len(puntos) * 1e9, 1), "escaneos": len(puntos)}
+    print(f"{nombre:>34}: {resultado}", file=sys.stderr)
+    return resultado
+
+
+def _medir_lote(nombre, geocerca, puntos, tam_lote) -> dict:
+    import numpy as np
+    lotes = []
+    for i in range(0, len(puntos), tam_lote):
+        parte = puntos[i:i + tam_lote]
+        lotes.append((np.array([p[0] for p in parte]), np.array([p[1] for p in parte])))
+    inicio = time.perf_counter()
+    for lats, lons in lotes:
+        geocerca.contiene_lote(lats, lons)
+    segundos = time.perf_counter() - inicio
+    resultado = {"ns_por_escaneo": round(segundos / len(puntos) * 1e9, 1), "escaneos": len(puntos), "lote": tam_lote}
+    print(f"{nombre:>34}: {resultado}", file=sys.stderr)
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--puntos", type=int, default=200_000)
+    parser.add_argument("--lote", type=int, default=200, help="Escaneos por lote (MAX_ESCANEOS_SYNC)")
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--salida", help="Archivo JSON para guardar el resultado")
+    args = parser.parse_args(argv)
+
+    preparar_entorno("sqlite://")
+    from app import config
+    from app.logic.geozona import Circulo, Poligono, Geocerca, distancia_metros
+
+    lat0, lon0, radio = config.ZONA_LAT, config.ZONA_LON, config.ZONA_METROS
+    rnd = random.Random(args.semilla)
+    puntos = puntos_de_prueba(rnd, lat0, lon0, radio, args.puntos)
+
+    def anterior(lat, lon):
+        return distancia_metros(lat, lon, lat0, lon0) <= radio
+
+    circulo = Geocerca([Circulo("planta", lat0, lon0, radio)])
+    # Tres plantas: un polígono de 24 lados con un hueco, otro de 12 y un círculo
+    plantas = Geocerca([
+        Poligono("planta", [poligono_regular(lat0, lon0, radio, 24), poligono_regular(lat0, lon0, radio / 5, 8)]),
+        Poligono("patio", [poligono_regular(lat0 + 0.05, lon0, radio, 12)]),
+        Circulo("cantera", lat0, lon0 + 0.05, radio),
+    ])
+
+    # Equivalencia antes de medir
+    lats = [p[0] for p in puntos]
+    lons = [p[1] for p in puntos]
+    esperado = [anterior(lat, lon) for lat, lon in puntos]
+    if [circulo.contiene(lat, lon) for lat, lon in puntos] != esperado:
+        sys.exit("Geocerca.contiene no coincide con haversine")
+    if circulo.contiene_lote(lats, lons).tolist() != esperado:
+        sys.exit("Geocerca.contiene_lote no coincide con haversine")
+    if plantas.contiene_lote(lats, lons).tolist() != [plantas.contiene(lat, lon) for lat, lon in puntos]:
+        sys.exit("El modo lote de los polígonos no coincide con el modo por punto")
+    print(f"Equivalencia verificada en {len(puntos)} puntos ({sum(esperado)} dentro)", file=sys.stderr)
+
+    resultado = {
+        "puntos": len(puntos),
+        "objetivo_ns": OBJETIVO_NS,
+        "haversine_anterior": _medir("haversine (anterior)", anterior, puntos),
+        "circulo": _medir("Geocerca.contiene (círculo)", circulo.contiene, puntos),
+        "circulo_lote": _medir_lote("Geocerca.contiene_lote (círculo)", circulo, puntos, args.lote),
+        "plantas": _medir("Geocerca.contiene (3 plantas)", plantas.contiene, puntos),
+        "plantas_lote": _medir_lote("Geocerca.contiene_lote (3 plantas)", plantas, puntos, args.lote),
+    }
+    for nombre in ("circulo", "circulo_lote", "plantas", "plantas_lote"):
+        resultado[nombre]["cumple_objetivo"] = resultado[nombre]["ns_por_escaneo"] < OBJETIVO_NS
+    guardar_json(args.salida, resultado)
+
+
+if __name__ == "__main__":
+    main()
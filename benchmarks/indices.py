@@ -0,0 +1,150 @@
+# benchmarks/indices.py
+"""
+Benchmark de los índices de la migración 0002_indices_consultas.
+
+Siembra un historial realista, mide las consultas del camino de escaneo sin
+los índices y con ellos, y reporta latencias y planes de ejecución.
+
+    python -m benchmarks.indices --url postgresql://localhost/qrlogix_bench --escaneos 1000000
+
+La base indicada debe estar vacía (o usar --recrear para borrarla).
+"""
+import argparse
+import sys
+
+from benchmarks.comun import preparar_entorno, base_vacia, recrear_esquema, sembrar, medir, guardar_json
+
+INDICES_CONSULTA = [
+    "ix_camiones_device_cookie",
+    "ix_sesiones_camion_activas",
+    "ix_sesiones_placa_activas",
+    "ix_ciclos_sesion_abiertos",
+    "ix_escaneos_ciclo_punto_fecha",
+]
+
+
+def _indices(models):
+    tablas = [models.Camion.__table__, models.Sesion.__table__, models.Ciclo.__table__, models.Escaneo.__table__]
+    return [i for t in tablas for i in t.indexes if i.name in INDICES_CONSULTA]
+
+
+def _consultas(crud, models, resolver_contexto_escaneo):
+    def dedupe(db, m):
+        return (
+            db.query(models.Escaneo)
+            .filter(models.Escaneo.ciclo_id == m["ciclo_id"], models.Escaneo.punto == "punto1")
+            .order_by(models.Escaneo.fecha_hora.desc())
+            .first()
+        )
+
+    return {
+        "camion_por_cookie": lambda db, m: crud.get_camion_by_cookie(db, m["cookie"]),
+        "sesion_activa": lambda db, m: crud.get_sesion_activa(db, m["camion_id"]),
+        "sesion_activa_por_placa": lambda db, m: crud.get_sesion_activa_por_placa(db, m["placa"]),
+        "ciclo_activo": lambda db, m: crud.get_ciclo_activo(db, m["sesion_id"]),
+        "dedupe_escaneo": dedupe,
+        "contexto_escaneo": lambda db, m: resolver_contexto_escaneo(db, m["cookie"]),
+    }
+
+
+def _plan(engine, fn, db, muestra):
+    """Captura la sentencia que ejecuta fn y devuelve su plan de ejecución."""
+    from sqlalchemy import event
+
+    capturadas = []
+
+    def capturar(conn, cursor, statement, parameters, context, executemany):
+        capturadas.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capturar)
+    try:
+        fn(db, muestra)
+    finally:
+        event.remove(engine, "before_cursor_execute", capturar)
+
+    if not capturadas:
+        return []
+    statement, parameters = capturadas[-1]
+    prefijo = "EXPLAIN (ANALYZE, BUFFERS) " if engine.dialect.name == "postgresql" else "EXPLAIN QUERY PLAN "
+    with engine.connect() as conn:
+        filas = conn.exec_driver_sql(prefijo + statement, parameters).fetchall()
+    return [" | ".join(str(v) for v in fila) for fila in filas]
+
+
+def _medir_fase(engine, SessionLocal, consultas, muestras, repeticiones):
+    resultados = {}
+    db = SessionLocal()
+    try:
+        for nombre, fn in consultas.items():
+            fn(db, muestras[0])  # calentamiento
+            db.expunge_all()
+
+            def ejecutar(i, fn=fn):
+                fn(db, muestras[i % len(muestras)])
+                db.expunge_all()
+
+            resultados[nombre] = {
+                "latencia": medir(ejecutar, repeticiones),
+                "plan": _plan(engine, fn, db, muestras[0]),
+            }
+            db.expunge_all()
+    finally:
+        db.close()
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="URL de una base desechable")
+    parser.add_argument("--escaneos", type=int, default=200_000)
+    parser.add_argument("--camiones", type=int, default=300)
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--recrear", action="store_true", help="Borrar las tablas existentes antes de sembrar")
+    parser.add_argument("--salida", help="Archivo JSON para guardar el resultado")
+    args = parser.parse_args(argv)
+
+    preparar_entorno(args.url)
+    from sqlalchemy import text
+    from app.database import engine, SessionLocal
+    from app import crud, models
+    from app.logic.gestion_ciclos import resolver_contexto_escaneo
+
+    if not base_vacia(engine) and not args.recrear:
+        sys.exit("La base tiene datos; use una base desechable o --recrear.")
+
+    recrear_esquema(engine)
+    semilla = sembrar(engine, escaneos=args.escaneos, camiones=args.camiones)
+    muestras = semilla.pop("muestras")
+    consultas = _consultas(crud, models, resolver_contexto_escaneo)
+    indices = _indices(models)
+
+    for indice in indices:
+        indice.drop(engine, checkfirst=True)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    antes = _medir_fase(engine, SessionLocal, consultas, muestras, args.repeticiones)
+
+    for indice in indices:
+        indice.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    despues = _medir_fase(engine, SessionLocal, consultas, muestras, args.repeticiones)
+
+    guardar_json(args.salida, {
+        "dialecto": engine.dialect.name,
+        "datos": semilla,
+        "consultas": {
+            nombre: {
+                "sin_indices": antes[nombre],
+                "con_indices": despues[nombre],
+                "mejora_p50": round(
+                    antes[nombre]["latencia"]["p50_ms"] / max(despues[nombre]["latencia"]["p50_ms"], 1e-6), 1
+                ),
+            }
+            for nombre in consultas
+        },
+    })
+
+
+if __name__ == "__main__":
+    main()
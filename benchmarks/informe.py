@@ -0,0 +1,119 @@
+# benchmarks/informe.py
+"""
+Benchmark del informe de /descargar_informe sobre un mes de escaneos.
+
+Siembra N escaneos repartidos en --dias días, genera el informe completo en
+CSV y en XLSX (write_only) y reporta tiempo, tamaño y pico de memoria de
+Python (tracemalloc). Con --comparar también mide el Workbook en memoria que
+usaba la ruta antes, para ver la diferencia de memoria.
+
+    python -m benchmarks.informe --url postgresql://localhost/qrlogix_bench --escaneos 1000000
+
+La base indicada debe estar vacía (o usar --recrear para borrarla).
+"""
+import argparse
+import io
+import sys
+import time
+import tracemalloc
+from datetime import timedelta
+
+from benchmarks.comun import preparar_entorno, base_vacia, recrear_esquema, sembrar, guardar_json
+
+
+def _consumir(generador) -> int:
+    return sum(len(trozo) for trozo in generador)
+
+
+def _workbook_en_memoria(filas, columnas) -> int:
+    """Lo que hacía la ruta antes: Workbook normal, estilos en una segunda pasada, BytesIO."""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment, Border, Side
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append(columnas)
+    for fila in filas:
+        ws.append(fila)
+    thin = Side(border_style="thin", color="E0E0E0")
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    normal_font = Font(color="071D49", size=11, name="Arial")
+    center_align = Alignment(horizontal="center", vertical="center")
+    for row in ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=1, max_col=len(columnas)):
+        for cell in row:
+            cell.border = border
+            cell.font = normal_font
+            cell.alignment = center_align
+    stream = io.BytesIO()
+    wb.save(stream)
+    return stream.tell()
+
+
+def _medir(nombre, fn, unidad="bytes") -> dict:
+    """Tiempo en una pasada normal; pico de memoria en otra bajo tracemalloc (que la hace más lenta)."""
+    inicio = time.perf_counter()
+    cantidad = fn()
+    segundos = time.perf_counter() - inicio
+
+    tracemalloc.start()
+    fn()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    resultado = {"segundos": round(segundos, 2), unidad: cantidad, "pico_memoria_mb": round(pico / 2**20, 1)}
+    print(f"{nombre:>12}: {resultado}", file=sys.stderr)
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="URL de una base desechable")
+    parser.add_argument("--escaneos", type=int, default=1_000_000)
+    parser.add_argument("--dias", type=int, default=30)
+    parser.add_argument("--comparar", action="store_true", help="Medir también el Workbook en memoria")
+    parser.add_argument("--recrear", action="store_true", help="Borrar las tablas existentes antes de sembrar")
+    parser.add_argument("--salida", help="Archivo JSON para guardar el resultado")
+    args = parser.parse_args(argv)
+
+    preparar_entorno(args.url)
+    from sqlalchemy import text
+    from app.database import engine
+    from app.logic import informe
+    from app.utils.timezone import ahora_panama
+
+    if not base_vacia(engine) and not args.recrear:
+        sys.exit("La base tiene datos; use una base desechable o --recrear.")
+
+    # Tres ciclos de cinco puntos por camión y día → camiones para llenar el mes
+    camiones = max(1, args.escaneos // 15 // args.dias)
+    recrear_esquema(engine)
+    semilla = sembrar(engine, escaneos=args.escaneos, camiones=camiones)
+    semilla.pop("muestras")
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+    hoy = ahora_panama()
+    desde, hasta = informe.rango_fechas(
+        (hoy - timedelta(days=args.dias + 1)).strftime("%Y-%m-%d"), hoy.strftime("%Y-%m-%d")
+    )
+
+    resultados = {
+        "consulta": _medir("consulta", lambda: sum(1 for _ in informe.filas_informe(desde, hasta)), "filas"),
+        "csv": _medir("csv", lambda: _consumir(informe.generar_csv(informe.filas_informe(desde, hasta)))),
+        "xlsx": _medir("xlsx", lambda: _consumir(informe.generar_xlsx(informe.filas_informe(desde, hasta)))),
+    }
+    if args.comparar:
+        resultados["xlsx_en_memoria"] = _medir(
+            "en memoria", lambda: _workbook_en_memoria(informe.filas_informe(desde, hasta), informe.COLUMNAS)
+        )
+
+    guardar_json(args.salida, {
+        "dialecto": engine.dialect.name,
+        "datos": semilla,
+        "filas_informe": resultados["consulta"]["filas"],
+        "resultados": resultados,
+    })
+
+
+if __name__ == "__main__":
+    main()
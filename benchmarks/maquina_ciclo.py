@@ -0,0 +1,125 @@
+# benchmarks/maquina_ciclo.py
+"""
+Micro-benchmark de la lógica de avance del ciclo en cada escaneo.
+
+Compara la versión anterior (recorridos de la lista de escaneos: conjunto de
+puntos, any() para punto3, estados recorriendo PUNTOS) con la máquina de
+estados de app/logic/maquina_ciclo.py (máscara de bits y tablas precalculadas).
+Antes de medir verifica que ambas den los mismos estados, desenlace, números
+escaneados y omitidos para las 32 combinaciones de puntos y cada punto escaneado.
+
+    python -m benchmarks.maquina_ciclo --repeticiones 100000
+
+No usa base de datos.
+"""
+import argparse
+import itertools
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from benchmarks.comun import preparar_entorno, guardar_json
+
+PUNTOS_ANTERIOR = ["punto1", "punto2", "punto3", "punto4", "punto5"]
+
+
+# =============================================
+# 🔹 VERSIÓN ANTERIOR (recorridos de listas)
+# =============================================
+def estados_anterior(puntos_escaneados) -> dict:
+    estados = {}
+    siguiente_escaneado = False
+    for p in reversed(PUNTOS_ANTERIOR):
+        if p in puntos_escaneados:
+            estados[p] = "completed"
+        elif siguiente_escaneado:
+            estados[p] = "skipped"
+        else:
+            estados[p] = "pending"
+        siguiente_escaneado = p in puntos_escaneados
+    return {p: estados[p] for p in PUNTOS_ANTERIOR}
+
+
+def escaneo_anterior(escaneos, punto):
+    puntos_escaneados = {e.punto for e in escaneos} | {punto}
+    desenlace = "avanza"
+    if punto == "punto5":
+        desenlace = "cierra" if any(e.punto == "punto3" for e in escaneos) else "elimina"
+    return estados_anterior(puntos_escaneados), desenlace
+
+
+def numeros_anterior(escaneos):
+    mascara = 0
+    for e in escaneos:
+        mascara |= 1 << PUNTOS_ANTERIOR.index(e.punto)
+    numeros = [i + 1 for i in range(len(PUNTOS_ANTERIOR)) if mascara & (1 << i)]
+    omitidos = [i + 1 for i in range(mascara.bit_length()) if not mascara & (1 << i)]
+    return numeros, omitidos
+
+
+def _medir(nombre, fn, casos) -> dict:
+    inicio = time.perf_counter()
+    for caso in casos:
+        fn(*caso)
+    segundos = time.perf_counter() - inicio
+    resultado = {"us_por_escaneo": round(segundos / len(casos) * 1e6, 3), "escaneos": len(casos)}
+    print(f"{nombre:>30}: {resultado}", file=sys.stderr)
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=100_000)
+    parser.add_argument("--salida", help="Archivo JSON para guardar el resultado")
+    args = parser.parse_args(argv)
+
+    preparar_entorno("sqlite://")
+    from app.logic.maquina_ciclo import PUNTOS, ProgresoCiclo
+
+    def escaneo_nuevo(escaneos, punto):
+        progreso = ProgresoCiclo()
+        for e in escaneos:
+            progreso.agregar(e.punto)
+        desenlace = progreso.escanear(punto)
+        return progreso.estados, desenlace
+
+    def numeros_nuevo(escaneos):
+        progreso = ProgresoCiclo.desde_puntos(e.punto for e in escaneos)
+        return progreso.numeros, progreso.omitidos
+
+    # Verificación exhaustiva: cada subconjunto de puntos ya escaneados × cada punto
+    diferencias = []
+    for n in range(len(PUNTOS) + 1):
+        for previos in itertools.combinations(PUNTOS, n):
+            escaneos = [SimpleNamespace(punto=p) for p in previos]
+            if numeros_anterior(escaneos) != numeros_nuevo(escaneos):
+                diferencias.append({"previos": previos, "calculo": "numeros"})
+            for punto in PUNTOS:
+                if escaneo_anterior(escaneos, punto) != escaneo_nuevo(escaneos, punto):
+                    diferencias.append({"previos": previos, "punto": punto, "calculo": "escaneo"})
+    print(f"Comportamiento idéntico: {not diferencias} ({32 * len(PUNTOS)} transiciones)", file=sys.stderr)
+
+    # Ciclos realistas: escaneos en orden, a veces repetidos u omitidos
+    azar = random.Random(7)
+    casos = []
+    for _ in range(args.repeticiones):
+        previos = [p for p in PUNTOS[:azar.randrange(len(PUNTOS))] if azar.random() < 0.9]
+        previos += [azar.choice(previos)] if previos and azar.random() < 0.2 else []
+        casos.append(([SimpleNamespace(punto=p) for p in previos], azar.choice(PUNTOS)))
+
+    resultados = {
+        "escaneo_anterior": _medir("escaneo (listas)", escaneo_anterior, casos),
+        "escaneo_maquina": _medir("escaneo (máquina de estados)", escaneo_nuevo, casos),
+        "numeros_anterior": _medir("números/omitidos (listas)", lambda e, _: numeros_anterior(e), casos),
+        "numeros_maquina": _medir("números/omitidos (tablas)", lambda e, _: numeros_nuevo(e), casos),
+    }
+    guardar_json(args.salida, {
+        "comportamiento_identico": not diferencias,
+        "diferencias": diferencias,
+        "resultados": resultados,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# benchmarks/plantillas.py
+"""
+Micro-benchmark del render de las páginas del escaneo.
+
+Compara, por escaneo, el render que hacía scan.py con Jinja2Templates
+(plantilla completa en cada request) con app/logic/plantillas.py (esqueleto
+en caché, solo se sustituyen placa y hora). Verifica además que ambos
+producen exactamente el mismo HTML.
+
+    python -m benchmarks.plantillas --repeticiones 20000
+
+No usa base de datos.
+"""
+import argparse
+import random
+import sys
+import time
+
+from benchmarks.comun import preparar_entorno, guardar_json
+
+
+def _medir(nombre, fn, casos) -> dict:
+    inicio = time.perf_counter()
+    for caso in casos:
+        fn(*caso)
+    segundos = time.perf_counter() - inicio
+    resultado = {"us_por_escaneo": round(segundos / len(casos) * 1e6, 1), "escaneos": len(casos)}
+    print(f"{nombre:>28}: {resultado}", file=sys.stderr)
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=20_000)
+    parser.add_argument("--salida", help="Archivo JSON para guardar el resultado")
+    args = parser.parse_args(argv)
+
+    preparar_entorno("sqlite://")
+    from fastapi.templating import Jinja2Templates
+    from app.logic import plantillas
+    from app.logic.maquina_ciclo import PUNTOS, NOMBRES_PUNTOS, calcular_estados
+    from app.logic.mensajes import obtener_mensaje
+
+    templates = Jinja2Templates(directory=plantillas.DIRECTORIO)
+    plantillas.precompilar()
+
+    azar = random.Random(7)
+    casos = []
+    for _ in range(args.repeticiones):
+        escaneados = {p for p in PUNTOS if azar.random() < 0.6}
+        casos.append((
+            f"P{azar.randrange(100000):05d}",
+            f"{azar.randrange(1, 13)}:{azar.randrange(60):02d} pm",
+            calcular_estados(escaneados),
+            obtener_mensaje("recordatorio"),
+        ))
+
+    def anterior_confirmacion(placa, hora, estados, mensaje):
+        return templates.get_template("confirmacion.html").render({
+            "placa": placa, "hora": hora, "puntos": PUNTOS, "estados": estados,
+            "nombres": NOMBRES_PUNTOS, "modo": "recordatorio",
+            "mensaje_titulo": mensaje["titulo"], "mensaje_texto": mensaje["texto"],
+            "ilustracion": mensaje["imagen"],
+        })
+
+    def nueva_confirmacion(placa, hora, estados, mensaje):
+        return plantillas.pagina_confirmacion(placa, hora, estados, mensaje)
+
+    def anterior_salida(placa, hora, *_):
+        return templates.get_template("confirmacion_salida.html").render({"placa": placa, "hora": hora})
+
+    def nueva_salida(placa, hora, *_):
+        return plantillas.pagina_salida(placa, hora)
+
+    coinciden = all(
+        anterior_confirmacion(*c) == nueva_confirmacion(*c) and anterior_salida(*c) == nueva_salida(*c)
+        for c in casos[:500] + [("<b>&'\"", "1:00 am", casos[0][2], casos[0][3])]
+    )
+    print(f"HTML idéntico: {coinciden}", file=sys.stderr)
+
+    resultados = {
+        "confirmacion_anterior": _medir("confirmación (Jinja2Templates)", anterior_confirmacion, casos),
+        "confirmacion_esqueleto": _medir("confirmación (esqueleto)", nueva_confirmacion, casos),
+        "salida_anterior": _medir("salida (Jinja2Templates)", anterior_salida, casos),
+        "salida_esqueleto": _medir("salida (esqueleto)", nueva_salida, casos),
+    }
+    guardar_json(args.salida, {
+        "html_identico": coinciden,
+        "esqueletos_confirmacion": plantillas._esqueleto_confirmacion.cache_info().currsize,
+        "resultados": resultados,
+    })
+
+
+if __name__ == "__main__":
+    main()
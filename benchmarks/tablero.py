@@ -0,0 +1,103 @@
+# benchmarks/tablero.py
+"""
+Benchmark de la consulta de /tablero a medida que crece el historial.
+
+Compara la consulta anterior (max(fecha_hora) agrupado sobre todo escaneos)
+con consulta_tablero(), que solo lee ciclo_estado. El número de ciclos
+abiertos se mantiene fijo; solo crece el historial de escaneos.
+
+    python -m benchmarks.tablero --url postgresql://localhost/qrlogix_bench \\
+        --tamanos 10000 100000 1000000 10000000
+
+La base indicada debe estar vacía (o usar --recrear para borrarla).
+"""
+import argparse
+import sys
+
+from benchmarks.comun import preparar_entorno, base_vacia, recrear_esquema, sembrar, medir, guardar_json
+
+
+def consulta_anterior(models):
+    """La consulta de mostrar_tablero antes de ciclo_estado (triple subconsulta)."""
+    from sqlalchemy import func, and_, select
+
+    ultimos_por_ciclo = (
+        select(
+            models.Escaneo.ciclo_id.label("ciclo_id"),
+            func.max(models.Escaneo.fecha_hora).label("ultima_fecha")
+        )
+        .group_by(models.Escaneo.ciclo_id)
+        .subquery()
+    )
+    ultimo_escaneo = (
+        select(
+            models.Escaneo.ciclo_id.label("ciclo_id"),
+            models.Escaneo.punto.label("punto"),
+            models.Escaneo.fecha_hora.label("fecha_hora")
+        )
+        .join(
+            ultimos_por_ciclo,
+            and_(
+                models.Escaneo.ciclo_id == ultimos_por_ciclo.c.ciclo_id,
+                models.Escaneo.fecha_hora == ultimos_por_ciclo.c.ultima_fecha
+            )
+        )
+        .subquery()
+    )
+    return (
+        select(models.Sesion.placa, ultimo_escaneo.c.punto, ultimo_escaneo.c.fecha_hora)
+        .join(models.Ciclo, models.Ciclo.sesion_id == models.Sesion.id)
+        .join(ultimo_escaneo, ultimo_escaneo.c.ciclo_id == models.Ciclo.id)
+        .filter(models.Ciclo.completado == False, models.Sesion.cerrada == False)
+        .order_by(ultimo_escaneo.c.fecha_hora.desc())
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="URL de una base desechable")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--ciclos-abiertos", type=int, default=40)
+    parser.add_argument("--repeticiones", type=int, default=30)
+    parser.add_argument("--recrear", action="store_true", help="Borrar las tablas existentes antes de sembrar")
+    parser.add_argument("--salida", help="Archivo JSON para guardar el resultado")
+    args = parser.parse_args(argv)
+
+    preparar_entorno(args.url)
+    from sqlalchemy import text
+    from app.database import engine
+    from app import models
+    from app.logic.tablero_vivo import consulta_tablero
+
+    if not base_vacia(engine) and not args.recrear:
+        sys.exit("La base tiene datos; use una base desechable o --recrear.")
+
+    consultas = {"anterior": consulta_anterior(models), "ciclo_estado": consulta_tablero()}
+    resultados = []
+    for tamano in args.tamanos:
+        recrear_esquema(engine)
+        semilla = sembrar(engine, escaneos=tamano, ciclos_abiertos=args.ciclos_abiertos)
+        semilla.pop("muestras")
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+
+        fila = {"datos": semilla}
+        with engine.connect() as conn:
+            for nombre, consulta in consultas.items():
+                filas = len(conn.execute(consulta).all())
+                fila[nombre] = {
+                    "filas": filas,
+                    "latencia": medir(lambda i, c=consulta: conn.execute(c).all(), args.repeticiones),
+                }
+        resultados.append(fila)
+        print(
+            f"{semilla['escaneos']:>10} escaneos — anterior p50 {fila['anterior']['latencia']['p50_ms']} ms, "
+            f"ciclo_estado p50 {fila['ciclo_estado']['latencia']['p50_ms']} ms",
+            file=sys.stderr,
+        )
+
+    guardar_json(args.salida, {"dialecto": engine.dialect.name, "resultados": resultados})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# migrations/env.py
+# Alembic usa la misma URL y los mismos modelos que la aplicación
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import create_engine
+from app.config import DATABASE_URL
+from app.database import Base, connect_args_sync
+from app import models  # noqa: F401  (registra las tablas en Base.metadata)
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def incluir_objeto(objeto, nombre, tipo, reflejado, comparar_con):
+    """Ignora en autogenerate las tablas/vistas que viven fuera del ORM (ciclo_manual, ciclos_abiertos)."""
+    if tipo == "table" and reflejado and comparar_con is None:
+        return False
+    return True
+
+
+def run_migrations_offline():
+    """Genera el SQL sin conectarse (alembic upgrade head --sql)."""
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        include_object=incluir_objeto,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    engine = create_engine(DATABASE_URL, connect_args=connect_args_sync())
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=incluir_objeto,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+    engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
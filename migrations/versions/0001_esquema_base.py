@@ -0,0 +1,73 @@
+"""Esquema base de QRLogix
+
+Las tablas ya existen en la base de Render (se crearon antes de tener
+migraciones); aquí solo se crean si faltan, para poder levantar una base
+vacía con `alembic upgrade head`.
+
+Revision ID: 0001_esquema_base
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001_esquema_base"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existentes = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "camiones" not in existentes:
+        op.create_table(
+            "camiones",
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("device_cookie", sa.String, nullable=True),
+        )
+    if "sesiones" not in existentes:
+        op.create_table(
+            "sesiones",
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("camion_id", sa.Integer, sa.ForeignKey("camiones.id", ondelete="CASCADE")),
+            sa.Column("placa", sa.String(6), nullable=False),
+            sa.Column("inicio", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("fin", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("cerrada", sa.Boolean, default=False),
+        )
+    if "ciclos" not in existentes:
+        op.create_table(
+            "ciclos",
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("sesion_id", sa.Integer, sa.ForeignKey("sesiones.id", ondelete="CASCADE")),
+            sa.Column("inicio", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("fin", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("completado", sa.Boolean, default=False),
+        )
+    if "escaneos" not in existentes:
+        op.create_table(
+            "escaneos",
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("ciclo_id", sa.Integer, sa.ForeignKey("ciclos.id", ondelete="CASCADE")),
+            sa.Column("punto", sa.String, nullable=False),
+            sa.Column("fecha_hora", sa.DateTime(timezone=True), nullable=False),
+        )
+    if "ciclo_manual" not in existentes:
+        # Registro de cierres/eliminaciones manuales (se escribe con SQL directo)
+        op.create_table(
+            "ciclo_manual",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("placa", sa.String),
+            sa.Column("fecha_eliminacion", sa.DateTime(timezone=True)),
+            sa.Column("sesion_id", sa.Integer),
+            sa.Column("ciclo_id", sa.Integer),
+            sa.Column("motivo", sa.String),
+            sa.Column("detalles", sa.String),
+            sa.Column("registrado_por", sa.String),
+        )
+
+
+def downgrade():
+    # El esquema base no se elimina desde migraciones
+    pass
@@ -0,0 +1,49 @@
+"""Índices compuestos y parciales para las consultas del escaneo
+
+Cada índice corresponde a un filtro de app/crud.py o del motor de escaneo
+(app/logic/gestion_ciclos.py). En PostgreSQL se crean con CONCURRENTLY para
+no bloquear los escaneos mientras se construyen.
+
+Revision ID: 0002_indices_consultas
+Revises: 0001_esquema_base
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_indices_consultas"
+down_revision = "0001_esquema_base"
+branch_labels = None
+depends_on = None
+
+# nombre → (tabla, columnas, condición parcial o None)
+INDICES = {
+    "ix_camiones_device_cookie": ("camiones", ["device_cookie"], None),
+    "ix_sesiones_camion_activas": ("sesiones", ["camion_id", "fin"], "cerrada"),
+    "ix_sesiones_placa_activas": ("sesiones", ["placa", "fin"], "cerrada"),
+    "ix_ciclos_sesion_abiertos": ("ciclos", ["sesion_id", "id"], "completado"),
+    "ix_escaneos_ciclo_punto_fecha": ("escaneos", ["ciclo_id", "punto", "fecha_hora"], None),
+}
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for nombre, (tabla, columnas, booleano) in INDICES.items():
+            parcial = {}
+            if booleano:
+                parcial = {
+                    "postgresql_where": sa.text(f"{booleano} = false"),
+                    "sqlite_where": sa.text(f"{booleano} = 0"),
+                }
+            op.create_index(
+                nombre, tabla, columnas,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+                **parcial,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for nombre, (tabla, _, _) in INDICES.items():
+            op.drop_index(nombre, table_name=tabla, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,56 @@
+"""Tabla ciclo_estado: estado vivo de los ciclos abiertos
+
+Reemplaza las agregaciones de la vista ciclos_abiertos en /api/ciclos y en
+/ciclos/accion. La aplicación la mantiene en cada escaneo y cierre; aquí se
+crea y se rellena con los ciclos abiertos existentes.
+
+Revision ID: 0003_ciclo_estado
+Revises: 0002_indices_consultas
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_ciclo_estado"
+down_revision = "0002_indices_consultas"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "ciclo_estado",
+        sa.Column("ciclo_id", sa.Integer, sa.ForeignKey("ciclos.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("sesion_id", sa.Integer, sa.ForeignKey("sesiones.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("placa", sa.String(6), nullable=False),
+        sa.Column("puntos_mascara", sa.Integer, nullable=False),
+        sa.Column("inicio", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("ultimo_escaneo", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("ultimo_punto", sa.String, nullable=False),
+    )
+    op.create_index("ix_ciclo_estado_placa", "ciclo_estado", ["placa", "ultimo_escaneo"])
+
+    op.execute("""
+        INSERT INTO ciclo_estado
+            (ciclo_id, sesion_id, placa, puntos_mascara, inicio, ultimo_escaneo, ultimo_punto)
+        SELECT
+            c.id, c.sesion_id, s.placa,
+            SUM(DISTINCT CASE e.punto
+                WHEN 'punto1' THEN 1 WHEN 'punto2' THEN 2 WHEN 'punto3' THEN 4
+                WHEN 'punto4' THEN 8 WHEN 'punto5' THEN 16 ELSE 0 END),
+            c.inicio,
+            MAX(e.fecha_hora),
+            (SELECT e2.punto FROM escaneos e2
+             WHERE e2.ciclo_id = c.id
+             ORDER BY e2.fecha_hora DESC, e2.id DESC LIMIT 1)
+        FROM ciclos c
+        JOIN sesiones s ON s.id = c.sesion_id
+        JOIN escaneos e ON e.ciclo_id = c.id
+        WHERE c.completado = false
+        GROUP BY c.id, c.sesion_id, s.placa, c.inicio
+    """)
+
+
+def downgrade():
+    op.drop_index("ix_ciclo_estado_placa", table_name="ciclo_estado")
+    op.drop_table("ciclo_estado")
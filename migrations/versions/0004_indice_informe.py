@@ -0,0 +1,29 @@
+"""Índice por fecha de inicio de ciclo para el informe
+
+/descargar_informe filtra los ciclos por rango de inicio; sin índice cada
+informe recorre toda la tabla ciclos.
+
+Revision ID: 0004_indice_informe
+Revises: 0003_ciclo_estado
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0004_indice_informe"
+down_revision = "0003_ciclo_estado"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_ciclos_inicio", "ciclos", ["inicio"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_ciclos_inicio", table_name="ciclos", postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,33 @@
+"""Índice parcial de sesiones abiertas por fin para el barrido
+
+El barrido periódico (app/logic/barrido.py) busca las sesiones con
+cerrada = false y fin < ahora; los índices parciales existentes empiezan por
+camion_id o placa y no sirven para ese filtro.
+
+Revision ID: 0005_indice_barrido
+Revises: 0004_indice_informe
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_indice_barrido"
+down_revision = "0004_indice_informe"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_sesiones_fin_abiertas", "sesiones", ["fin"],
+            postgresql_where=sa.text("cerrada = false"),
+            sqlite_where=sa.text("cerrada = 0"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_sesiones_fin_abiertas", table_name="sesiones", postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,31 @@
+"""Tabla ingesta_aplicada: claves de los escaneos de la cola ya aplicados
+
+La ingesta diferida (app/logic/cola_escaneos.py) guarda la clave de cada
+escaneo de la cola en la misma transacción que lo aplica; si el proceso cae
+antes de borrarlo del archivo de la cola, al reprocesar el lote se salta.
+
+Revision ID: 0006_ingesta_aplicada
+Revises: 0005_indice_barrido
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006_ingesta_aplicada"
+down_revision = "0005_indice_barrido"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "ingesta_aplicada",
+        sa.Column("clave", sa.String(32), primary_key=True),
+        sa.Column("aplicado", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_ingesta_aplicada_aplicado", "ingesta_aplicada", ["aplicado"])
+
+
+def downgrade():
+    op.drop_index("ix_ingesta_aplicada_aplicado", table_name="ingesta_aplicada")
+    op.drop_table("ingesta_aplicada")
@@ -0,0 +1,92 @@
+# tests/conftest.py
+# Entorno de pruebas: SQLite desechable y configuración fija, antes de importar app.*
+# (app/config.py lee las variables al importarse).
+import os
+import tempfile
+from contextlib import contextmanager
+
+_DIRECTORIO = tempfile.mkdtemp(prefix="qrlogix_pruebas_")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_DIRECTORIO}/qr.db",
+    "TIMEZONE": "UTC",  # SQLite guarda las fechas sin zona: se leen como UTC
+    "ZONA_LAT": "8.98",
+    "ZONA_LON": "-79.52",
+    "ZONA_METROS": "500",
+    "VALIDAR_GEOZONA": "false",
+    "INGESTA_DIFERIDA": "false",
+    "BARRIDO_ACTIVO": "false",
+    "REBOTE_ACTIVO": "false",
+    "INSTRUMENTACION": "true",
+    "ORM_CARGA_ESTRICTA": "1",  # toda la suite: una carga perezosa no prevista falla
+    "DB_CONSULTA_LENTA_MS": "0",
+    "CACHE_IDENTIDAD_BACKEND": "memoria",
+    "ARCHIVO_DIR": os.path.join(_DIRECTORIO, "archivo"),
+    "LOG_NIVEL": "WARNING",
+})
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from app.database import Base, engine, SessionLocal, medicion_actual, MedicionRequest
+from app import models  # noqa: F401
+from app.logic.cache_identidad import cache_identidad
+
+
+@pytest.fixture
+def base():
+    """Esquema vacío (más ciclo_manual, que se usa con SQL directo) y caché de identidad limpia."""
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS ciclo_manual"))
+        conn.execute(text("""
+            CREATE TABLE ciclo_manual (
+                id INTEGER PRIMARY KEY, placa VARCHAR, fecha_eliminacion TIMESTAMP,
+                sesion_id INTEGER, ciclo_id INTEGER, motivo VARCHAR, detalles VARCHAR,
+                registrado_por VARCHAR
+            )
+        """))
+    cache_identidad.limpiar()
+    yield engine
+    cache_identidad.limpiar()
+
+
+@pytest.fixture
+def db(base):
+    """Sesión síncrona configurada como AsyncSessionLocal (las rutas usan esa vía run_sync)."""
+    sesion = SessionLocal(expire_on_commit=False)
+    try:
+        yield sesion
+    finally:
+        sesion.close()
+
+
+@pytest.fixture
+def cliente(base):
+    from app.main import app
+    with TestClient(app, base_url="http://prueba") as c:
+        yield c
+
+
+@contextmanager
+def contar_consultas():
+    """Cuenta las consultas SQL del bloque con el mismo contador de la instrumentación."""
+    medicion = MedicionRequest()
+    token = medicion_actual.set(medicion)
+    try:
+        yield medicion
+    finally:
+        medicion_actual.reset(token)
+
+
+def registrar_placa(cliente, placa="AB123", punto="punto1"):
+    """Formulario de placa desde un QR: abre sesión y ciclo para la cookie del cliente."""
+    respuesta = cliente.post(f"/scan/{punto}", data={"plate": placa}, follow_redirects=False)
+    assert respuesta.status_code == 303
+    return respuesta
+
+
+def consultas_de(respuesta) -> int:
+    """Consultas SQL del request, según la cabecera Server-Timing de la instrumentación."""
+    valor = respuesta.headers["server-timing"]
+    return int(valor.split('desc="', 1)[1].split(" ", 1)[0])
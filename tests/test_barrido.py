@@ -0,0 +1,78 @@
+# tests/test_barrido.py
+# Barrido de ciclos abandonados (app/logic/barrido.py).
+import asyncio
+import os
+import subprocess
+import sys
+from datetime import timedelta
+import pytest
+from sqlalchemy import text
+from app import models
+from app.database import async_engine
+from app.logic import barrido
+from app.utils.timezone import ahora_panama
+
+
+def _ciclo(db, placa, minutos_sin_escanear, ahora):
+    camion = models.Camion(device_cookie=f"tel-{placa}")
+    db.add(camion)
+    db.flush()
+    sesion = models.Sesion(camion_id=camion.id, placa=placa, inicio=ahora - timedelta(hours=12), fin=ahora + timedelta(hours=2))
+    db.add(sesion)
+    db.flush()
+    ciclo = models.Ciclo(sesion_id=sesion.id, inicio=ahora - timedelta(hours=11))
+    db.add(ciclo)
+    db.flush()
+    ultimo = ahora - timedelta(minutes=minutos_sin_escanear)
+    db.add(models.Escaneo(ciclo_id=ciclo.id, punto="punto1", fecha_hora=ultimo))
+    db.add(models.CicloEstado(
+        ciclo_id=ciclo.id, sesion_id=sesion.id, placa=placa, puntos_mascara=1,
+        inicio=ciclo.inicio, ultimo_escaneo=ultimo, ultimo_punto="punto1",
+    ))
+    db.commit()
+    return ciclo.id
+
+
+def _pasada(accion):
+    async def correr():
+        try:
+            return await barrido.BarridoVencidos(abandono_min=480, lote=10, accion=accion).ejecutar()
+        finally:
+            await async_engine.dispose()
+    return asyncio.run(correr())
+
+
+def test_el_barrido_viene_apagado_y_se_enciende_con_1():
+    def activo(**entorno):
+        env = {k: v for k, v in os.environ.items() if k != "BARRIDO_ACTIVO"}
+        salida = subprocess.run(
+            [sys.executable, "-c", "from app import config; print(config.BARRIDO_ACTIVO)"],
+            env={**env, **entorno}, capture_output=True, text=True, check=True,
+        )
+        return salida.stdout.strip()
+
+    assert activo() == "False"
+    assert activo(BARRIDO_ACTIVO="1") == "True"
+
+
+@pytest.mark.parametrize("accion", ["cerrar", "eliminar"])
+def test_no_toca_ciclos_escaneados_despues_de_elegir_candidatos(db, monkeypatch, accion):
+    ahora = ahora_panama()
+    viejo = _ciclo(db, "AAA111", 9 * 60, ahora)
+    reciente = _ciclo(db, "BBB222", 5, ahora)
+
+    # Simula la carrera: la consulta de candidatos trae también el ciclo que
+    # recibió un escaneo entre la lectura y la escritura.
+    consulta = barrido._consulta_abandonados
+    monkeypatch.setattr(
+        barrido, "_consulta_abandonados",
+        lambda ahora, limite, lote: consulta(ahora, ahora + timedelta(days=1), lote),
+    )
+    assert _pasada(accion)["ciclos"] == 1
+
+    abiertos = db.execute(text("SELECT id FROM ciclos WHERE completado = 0")).scalars().all()
+    assert abiertos == [reciente]
+    assert db.execute(text("SELECT ciclo_id FROM ciclo_estado")).scalars().all() == [reciente]
+    assert db.execute(text("SELECT ciclo_id FROM ciclo_manual")).scalars().all() == [viejo]
+    quedan = db.execute(text("SELECT COUNT(*) FROM ciclos WHERE id = :id"), {"id": viejo}).scalar()
+    assert quedan == (0 if accion == "eliminar" else 1)
@@ -0,0 +1,46 @@
+# tests/test_carga_estricta.py
+# Modo estricto del ORM (ORM_CARGA_ESTRICTA=1, activo en toda la suite desde
+# conftest.py): las relaciones no cubiertas por un perfil de perfiles_carga
+# lanzan error, y cada ruta del escaneo hace un número fijo de consultas.
+import pytest
+from sqlalchemy import inspect
+from app import config, models
+from conftest import consultas_de
+
+
+def formulario(cliente, punto, placa):
+    respuesta = cliente.post(f"/scan/{punto}", data={"plate": placa}, follow_redirects=False)
+    assert respuesta.status_code == 303
+    return respuesta
+
+
+def test_las_relaciones_no_cargan_a_escondidas():
+    assert config.ORM_CARGA_ESTRICTA
+    for modelo in (models.Camion, models.Sesion, models.Ciclo, models.Escaneo):
+        for relacion in inspect(modelo).relationships:
+            assert relacion.lazy == "raise_on_sql", f"{modelo.__name__}.{relacion.key}"
+
+
+@pytest.mark.parametrize("pasos, esperado", [
+    # Teléfono y placa nuevos: camión, sesión, ciclo, escaneo y ciclo_estado
+    ([("post", "punto1", "AB123")], 13),
+    ([("post", "punto1", "AB123"), ("get", "punto2", None)], 3),
+    # punto5 sin punto3 desde el formulario: elimina el ciclo y lo deja en ciclo_manual
+    ([("post", "punto1", "AB123"), ("get", "punto2", None), ("post", "punto5", "AB123")], 9),
+    # punto5 sin punto3 por GET: elimina el ciclo
+    ([("post", "punto1", "AB123"), ("get", "punto5", None)], 7),
+])
+def test_cuentas_por_ruta_en_modo_estricto(cliente, pasos, esperado):
+    for metodo, punto, placa in pasos:
+        respuesta = formulario(cliente, punto, placa) if metodo == "post" else cliente.get(f"/scan/{punto}")
+    assert consultas_de(respuesta) == esperado
+
+
+def test_traspaso_de_telefono_en_modo_estricto(cliente, db):
+    formulario(cliente, "punto1", "EF789")
+    cliente.get("/scan/punto2")
+    cliente.cookies.clear()  # otro teléfono, misma placa: reutiliza sesión y ciclo (perfil sesion_con_camion)
+    assert consultas_de(formulario(cliente, "punto3", "EF789")) == 9
+    assert consultas_de(cliente.get("/scan/punto4")) == 3
+    assert db.query(models.Ciclo).count() == 1
+    assert db.query(models.Escaneo).count() == 4
@@ -0,0 +1,45 @@
+# tests/test_ciclos_vivo.py
+# Acciones sobre ciclos por /ws/ciclos y POST /ciclos/accion (misma política de origen).
+from sqlalchemy import text
+
+ACCION = {"placa": "AB123", "motivo": "Prueba", "registrado_por": "Tablero", "accion": "cerrar"}
+
+
+def abrir_ciclo(cliente):
+    assert cliente.post("/scan/punto1", data={"plate": "AB123"}, follow_redirects=False).status_code == 303
+
+
+def completados(db):
+    return db.execute(text("SELECT completado FROM ciclos")).scalars().all()
+
+
+def test_accion_por_el_socket_responde_y_se_transmite(cliente, db):
+    abrir_ciclo(cliente)
+    with cliente.websocket_connect("/ws/ciclos") as socket:
+        inicial = socket.receive_json()
+        assert [c["placa"] for c in inicial["ciclos"]] == ["AB123"]
+
+        socket.send_json({"tipo": "accion", "id": 7, **ACCION})
+        mensajes = {m["tipo"]: m for m in (socket.receive_json(), socket.receive_json())}
+
+    assert (mensajes["resultado"]["id"], mensajes["resultado"]["status"]) == (7, 200)
+    assert (mensajes["ciclo"]["evento"], mensajes["ciclo"]["placa"]) == ("cerrado", "AB123")
+    assert completados(db) == [1]
+
+
+def test_socket_de_otro_origen_no_ejecuta_acciones(cliente, db):
+    abrir_ciclo(cliente)
+    with cliente.websocket_connect("/ws/ciclos", headers={"origin": "https://otro.example"}) as socket:
+        socket.receive_json()
+        socket.send_json({"tipo": "accion", "id": 1, **ACCION})
+        resultado = socket.receive_json()
+    assert (resultado["tipo"], resultado["status"]) == ("resultado", 403)
+    assert completados(db) == [0]
+
+
+def test_http_usa_la_misma_politica_de_origen(cliente, db):
+    abrir_ciclo(cliente)
+    assert cliente.post("/ciclos/accion", json=ACCION, headers={"origin": "https://otro.example"}).status_code == 403
+    assert completados(db) == [0]
+    assert cliente.post("/ciclos/accion", json=ACCION, headers={"origin": "http://prueba"}).status_code == 200
+    assert completados(db) == [1]
@@ -0,0 +1,78 @@
+# tests/test_cola_escaneos.py
+# Cola de ingesta diferida (app/logic/cola_escaneos.py): reclamo por worker y reaplicación idempotente.
+from datetime import timedelta
+import pytest
+from sqlalchemy import text
+from app import crud
+from app.logic.cola_escaneos import ColaEscaneos, _aplicar_lote
+from app.logic.gestion_ciclos import registrar_escaneo
+from app.utils.timezone import ahora_panama
+
+
+@pytest.fixture
+def colas(tmp_path):
+    """Dos workers sobre el mismo archivo de cola."""
+    ruta = str(tmp_path / "cola.db")
+    a, b = ColaEscaneos(ruta), ColaEscaneos(ruta)
+    a.abrir()
+    b.abrir()
+    yield a, b
+    a.cerrar()
+    b.cerrar()
+
+
+def test_dos_workers_no_toman_las_mismas_filas(colas):
+    a, b = colas
+    ahora = ahora_panama()
+    for i in range(6):
+        a.encolar(f"telefono{i}", "punto1", ahora)
+
+    tomadas_a = a.tomar(3)
+    tomadas_b = b.tomar(10)
+    assert [f[0] for f in tomadas_a] == [1, 2, 3]
+    assert [f[0] for f in tomadas_b] == [4, 5, 6]
+    assert b.tomar(10) == tomadas_b  # vuelve a dar solo lo suyo
+    assert a.estado()["tomados"] == 6
+
+
+def test_no_reclama_escaneos_de_un_telefono_en_manos_de_otro_worker(colas):
+    a, b = colas
+    ahora = ahora_panama()
+    a.encolar("telefono1", "punto1", ahora)
+    a.encolar("telefono2", "punto1", ahora)
+    assert [f[1] for f in a.tomar(1)] == ["telefono1"]
+    a.encolar("telefono1", "punto2", ahora)
+
+    # El punto2 de telefono1 espera a que a termine con su punto1
+    assert [f[1] for f in b.tomar(10)] == ["telefono2"]
+    a.confirmar([1])
+    assert [(f[1], f[2]) for f in b.tomar(10)] == [("telefono2", "punto1"), ("telefono1", "punto2")]
+
+
+def test_reclama_lo_de_un_worker_caido(colas):
+    a, b = colas
+    a.encolar("telefono1", "punto1", ahora_panama())
+    assert a.tomar(10)
+    assert b.tomar(10) == []
+    b.reclamo_s = 0
+    assert [f[0] for f in b.tomar(10)] == [1]
+
+
+def test_reaplicar_un_lote_no_duplica_el_cierre(db, colas):
+    a, _ = colas
+    registrar_escaneo(db, "telefono1", "CD456", "punto1", crud_module=crud)
+    ahora = ahora_panama()
+    for i, punto in enumerate(("punto2", "punto3", "punto4", "punto5"), start=1):
+        a.encolar("telefono1", punto, ahora + timedelta(minutes=i))
+    filas = a.tomar(10)
+
+    _aplicar_lote(db, filas)
+    db.commit()
+    # El proceso cae antes de a.confirmar(): el lote se vuelve a aplicar
+    assert _aplicar_lote(db, filas) == []
+    db.commit()
+
+    ciclos = db.execute(text("SELECT completado FROM ciclos")).scalars().all()
+    assert ciclos == [1]
+    assert db.execute(text("SELECT COUNT(*) FROM escaneos")).scalar() == 5
+    assert db.execute(text("SELECT COUNT(*) FROM ciclo_manual")).scalar() == 0
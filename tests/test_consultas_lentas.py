@@ -0,0 +1,35 @@
+# tests/test_consultas_lentas.py
+# Registro de consultas lentas con su plan (DB_CONSULTA_LENTA_MS).
+import pytest
+from sqlalchemy import text
+from app import config
+from app.database import CONSULTAS_LENTAS, _sin_literales
+
+
+@pytest.fixture
+def todas_lentas(monkeypatch):
+    monkeypatch.setattr(config, "DB_CONSULTA_LENTA_MS", 1e-9)
+    CONSULTAS_LENTAS.clear()
+    yield CONSULTAS_LENTAS
+    CONSULTAS_LENTAS.clear()
+
+
+def test_explica_consultas_con_cte(db, todas_lentas):
+    db.execute(text("WITH t AS (SELECT id FROM camiones) SELECT COUNT(*) FROM t")).scalar()
+    lenta = todas_lentas[-1]
+    assert lenta["sentencia"].startswith("WITH")
+    assert lenta["plan"] and not lenta["plan"][0].startswith("(sin plan")
+
+
+def test_el_explain_no_rompe_la_transaccion_del_request(db, todas_lentas):
+    db.execute(text("INSERT INTO camiones (device_cookie) VALUES ('telefono1')"))
+    db.execute(text("SELECT device_cookie FROM camiones WHERE device_cookie = :c"), {"c": "telefono1"})
+    db.execute(text("INSERT INTO camiones (device_cookie) VALUES ('telefono2')"))
+    db.commit()
+    assert db.execute(text("SELECT COUNT(*) FROM camiones")).scalar() == 2
+    assert todas_lentas
+
+
+def test_el_plan_no_guarda_valores_de_parametros():
+    linea = "Filter: ((device_cookie)::text = 'abc123'::text) AND (placa = 'O''NEIL'::text)"
+    assert _sin_literales(linea) == "Filter: ((device_cookie)::text = '?'::text) AND (placa = '?'::text)"
@@ -0,0 +1,52 @@
+# tests/test_escaneo_consultas.py
+# Número fijo de consultas SQL del escaneo (GET /scan/{punto}): una regresión
+# que vuelva a cargar relaciones perezosas o a consultar por punto sube la cuenta.
+from app import crud
+from app.logic.cache_identidad import cache_identidad
+from app.logic.gestion_ciclos import procesar_escaneo_qr, registrar_escaneo
+from conftest import contar_consultas, consultas_de, registrar_placa
+
+
+def test_escaneo_que_avanza_hace_tres_consultas(cliente):
+    registrar_placa(cliente)
+    # contexto (1 SELECT) + INSERT del escaneo + UPDATE de ciclo_estado
+    respuesta = cliente.get("/scan/punto2")
+    assert respuesta.status_code == 200
+    assert consultas_de(respuesta) == 3
+
+    # Sin la identidad en caché la cuenta es la misma: el SELECT resuelve todo
+    cache_identidad.limpiar()
+    assert consultas_de(cliente.get("/scan/punto3")) == 3
+
+
+def test_escaneo_repetido_hace_una_consulta(cliente):
+    registrar_placa(cliente)
+    cliente.get("/scan/punto2")
+    assert consultas_de(cliente.get("/scan/punto2")) == 1
+
+
+def test_cierre_en_punto5_hace_cuatro_consultas(cliente):
+    registrar_placa(cliente)
+    for punto in ("punto2", "punto3", "punto4"):
+        cliente.get(f"/scan/{punto}")
+    # contexto + INSERT del escaneo + UPDATE del ciclo + DELETE de ciclo_estado
+    respuesta = cliente.get("/scan/punto5")
+    assert "placa" in respuesta.text.lower()
+    assert consultas_de(respuesta) == 4
+
+
+def test_cookie_sin_sesion_hace_una_consulta(cliente):
+    cliente.cookies.set("device_cookie", "desconocida")
+    respuesta = cliente.get("/scan/punto1")
+    assert 'name="plate"' in respuesta.text
+    assert consultas_de(respuesta) == 1
+
+
+def test_procesar_escaneo_qr_cuenta_fija(db):
+    registrar_escaneo(db, "telefono1", "CD456", "punto1", crud_module=crud)
+    db.expunge_all()  # como un request nuevo: nada cargado en la sesión
+    cache_identidad.limpiar()
+    with contar_consultas() as medicion:
+        registro = procesar_escaneo_qr(db, "telefono1", "punto2")
+    assert registro["evento"] == "cambiado"
+    assert medicion.consultas == 3
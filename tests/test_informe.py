@@ -0,0 +1,35 @@
+# tests/test_informe.py
+# Descarga del informe (/descargar_informe): la hoja Resumen es opcional.
+import io
+from datetime import timedelta
+from openpyxl import load_workbook
+from app.routes import tablero
+from app.utils.timezone import ahora_panama
+
+
+def descargar(cliente, **parametros):
+    hoy = ahora_panama().date()
+    respuesta = cliente.get("/descargar_informe", params={
+        "fechaInicio": str(hoy - timedelta(days=1)), "fechaFin": str(hoy + timedelta(days=1)), **parametros,
+    })
+    assert respuesta.status_code == 200
+    return load_workbook(io.BytesIO(respuesta.content), read_only=True)
+
+
+def test_xlsx_sin_resumen_no_calcula_la_analitica(cliente, monkeypatch):
+    def analitica_rango(desde, hasta):
+        raise AssertionError("la analítica carga el rango completo en memoria")
+
+    monkeypatch.setattr(tablero, "analitica_rango", analitica_rango)
+    cliente.post("/scan/punto1", data={"plate": "AB123"}, follow_redirects=False)
+    libro = descargar(cliente)
+    assert libro.sheetnames == ["Informe QRLogix"]
+    filas = list(libro["Informe QRLogix"].values)
+    assert [f[0] for f in filas] == ["Placa", "AB123"]
+
+
+def test_xlsx_con_resumen(cliente):
+    cliente.post("/scan/punto1", data={"plate": "AB123"}, follow_redirects=False)
+    libro = descargar(cliente, resumen="true")
+    assert libro.sheetnames == ["Resumen", "Informe QRLogix"]
+    assert next(libro["Resumen"].values)[:2] == ("Resumen", "Valor")
@@ -0,0 +1,21 @@
+# tests/test_interno.py
+# Los endpoints internos (/interno/..., /metrics) exigen METRICAS_TOKEN.
+import pytest
+from app import config
+
+RUTAS = ["/interno/pool", "/interno/cache", "/interno/consultas-lentas", "/metrics"]
+
+
+@pytest.mark.parametrize("ruta", RUTAS)
+def test_sin_token_configurado_no_existen(cliente, monkeypatch, ruta):
+    monkeypatch.setattr(config, "METRICAS_TOKEN", None)
+    assert cliente.get(ruta).status_code == 404
+    assert cliente.get(ruta, headers={"X-Metricas-Token": ""}).status_code == 404
+
+
+@pytest.mark.parametrize("ruta", RUTAS)
+def test_con_token_configurado(cliente, monkeypatch, ruta):
+    monkeypatch.setattr(config, "METRICAS_TOKEN", "secreto")
+    assert cliente.get(ruta).status_code == 403
+    assert cliente.get(ruta, headers={"X-Metricas-Token": "otro"}).status_code == 403
+    assert cliente.get(ruta, headers={"X-Metricas-Token": "secreto"}).status_code == 200
@@ -0,0 +1,88 @@
+# tests/test_maquina_ciclo.py
+# Reglas del ciclo (app/logic/maquina_ciclo.py) y su efecto en GET/POST /scan/{punto}.
+import pytest
+from sqlalchemy import text
+from app.logic.maquina_ciclo import (
+    AVANZA, CIERRA, ELIMINA, BIT, PUNTOS, REGLAS, ProgresoCiclo, mascara_puntos, transicion,
+)
+from conftest import registrar_placa
+
+
+def progreso(*puntos):
+    return ProgresoCiclo.desde_puntos(puntos)
+
+
+# =============================================
+# 🔹 TRANSICIONES
+# =============================================
+@pytest.mark.parametrize("punto", ["punto1", "punto2", "punto3", "punto4"])
+def test_los_puntos_no_terminales_avanzan(punto):
+    assert transicion(0, punto) == (BIT[punto], AVANZA)
+
+
+@pytest.mark.parametrize("mascara", range(1 << len(PUNTOS)))
+def test_el_punto_terminal_cierra_solo_con_los_requeridos(mascara):
+    _, desenlace = transicion(mascara, "punto5")
+    assert desenlace == (CIERRA if mascara & BIT["punto3"] else ELIMINA)
+
+
+def test_punto3_es_el_unico_requerido_y_punto5_el_unico_terminal():
+    assert [p for p, r in REGLAS.items() if r.requerido] == ["punto3"]
+    assert [p for p, r in REGLAS.items() if r.terminal] == ["punto5"]
+
+
+def test_detecta_puntos_omitidos():
+    p = progreso("punto1", "punto3")
+    assert p.omitidos == [2]
+    assert p.numeros == [1, 3]
+    assert p.estados == {
+        "punto1": "completed", "punto2": "skipped", "punto3": "completed",
+        "punto4": "pending", "punto5": "pending",
+    }
+    assert p.escanear("punto5") == CIERRA
+    assert p.omitidos == [2, 4]
+
+
+def test_tolera_puntos_desconocidos_del_historial():
+    p = progreso("punto1", "punto9")
+    assert p.mascara == mascara_puntos(["punto1"]) == BIT["punto1"]
+
+
+# =============================================
+# 🔹 ESCANEO (GET /scan/{punto})
+# =============================================
+def ciclos(db):
+    return db.execute(text("SELECT completado FROM ciclos")).scalars().all()
+
+
+def test_punto5_con_punto3_cierra_el_ciclo(cliente, db):
+    registrar_placa(cliente)
+    for punto in ("punto3", "punto5"):
+        assert cliente.get(f"/scan/{punto}").status_code == 200
+    assert ciclos(db) == [1]
+    assert db.execute(text("SELECT COUNT(*) FROM ciclo_estado")).scalar() == 0
+
+
+def test_punto5_sin_punto3_elimina_el_ciclo_incompleto(cliente, db):
+    registrar_placa(cliente)
+    cliente.get("/scan/punto2")
+    assert cliente.get("/scan/punto5").status_code == 200
+    assert ciclos(db) == []
+    assert db.execute(text("SELECT COUNT(*) FROM escaneos")).scalar() == 0
+    assert db.execute(text("SELECT placa FROM ciclo_manual")).scalars().all() == ["AB123"]
+
+
+def test_formulario_en_punto5_sin_punto3_elimina_el_ciclo(cliente, db):
+    registrar_placa(cliente)
+    assert cliente.post("/scan/punto5", data={"plate": "AB123"}, follow_redirects=False).status_code == 303
+    assert ciclos(db) == []
+
+
+@pytest.mark.parametrize("metodo", ["get", "post"])
+def test_punto_desconocido_responde_404(cliente, db, metodo):
+    if metodo == "get":
+        respuesta = cliente.get("/scan/punto6")
+    else:
+        respuesta = cliente.post("/scan/punto6", data={"plate": "AB123"}, follow_redirects=False)
+    assert respuesta.status_code == 404
+    assert db.execute(text("SELECT COUNT(*) FROM camiones")).scalar() == 0
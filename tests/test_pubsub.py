@@ -0,0 +1,91 @@
+# tests/test_pubsub.py
+# Envío de PubSubPostgres con una conexión falsa (sin PostgreSQL): publicar()
+# no espera al pg_notify y una sola tarea envía lo acumulado en lotes.
+import asyncio
+import json
+from app.logic.pubsub import PubSubPostgres, RESINCRONIZAR
+
+
+class ConexionFalsa:
+    def __init__(self, fallar=False):
+        self.lotes = []
+        self.fallar = fallar
+        self.liberar = asyncio.Event()
+        self.liberar.set()
+
+    async def add_listener(self, canal, funcion):
+        pass
+
+    def add_termination_listener(self, funcion):
+        pass
+
+    def is_closed(self):
+        return False
+
+    def terminate(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def executemany(self, sql, argumentos):
+        await self.liberar.wait()
+        if self.fallar:
+            self.fallar = False
+            raise ConnectionError("conexión caída")
+        self.lotes.append([json.loads(carga) for _, carga in argumentos])
+
+
+class PubSubFalso(PubSubPostgres):
+    def __init__(self, conexion, **kwargs):
+        super().__init__("postgresql://falso", **kwargs)
+        self.conexion = conexion
+
+    async def _conectar(self):
+        return self.conexion
+
+
+async def _esperar(condicion):
+    for _ in range(200):
+        if condicion():
+            return
+        await asyncio.sleep(0.005)
+    raise AssertionError("no se cumplió a tiempo")
+
+
+def test_publicar_no_espera_el_envio_y_junta_lo_acumulado():
+    async def probar():
+        conexion = ConexionFalsa()
+        pubsub = PubSubFalso(conexion)
+        await pubsub.iniciar()
+        conexion.liberar.clear()  # pg_notify lento
+        await pubsub.publicar("ciclos", {"n": 1})
+        await asyncio.sleep(0.01)  # el primero ya está en vuelo
+        for n in (2, 3, 4):
+            await asyncio.wait_for(pubsub.publicar("ciclos", {"n": n}), timeout=0.1)
+        conexion.liberar.set()
+        await _esperar(lambda: sum(len(l) for l in conexion.lotes) == 4)
+        await pubsub.detener()
+        return conexion.lotes
+
+    lotes = asyncio.run(probar())
+    assert [[m["mensaje"]["n"] for m in lote] for lote in lotes] == [[1], [2, 3, 4]]
+
+
+def test_lo_descartado_se_compensa_con_resincronizar():
+    async def probar():
+        conexion = ConexionFalsa(fallar=True)
+        pubsub = PubSubFalso(conexion, max_pendientes=2)
+        await pubsub.iniciar()
+        await pubsub.publicar("ciclos", {"n": 1})  # falla el envío
+        await _esperar(lambda: pubsub._perdidos)
+        for n in (2, 3, 4):  # el tercero no cabe en la cola
+            await pubsub.publicar("tablero", {"n": n})
+        await _esperar(lambda: conexion.lotes)
+        await pubsub.detener()
+        return conexion.lotes
+
+    lote, = asyncio.run(probar())
+    assert [m["mensaje"].get("n") for m in lote if m["canal"] == "tablero"][:2] == [2, 3]
+    resincronizados = {m["canal"] for m in lote if m["mensaje"] == RESINCRONIZAR}
+    assert resincronizados == {"ciclos", "tablero"}
@@ -0,0 +1,70 @@
+# tests/test_rebote.py
+# Antirrebote y límite de escaneos por teléfono (app/logic/rebote.py). La suite
+# arranca con REBOTE_ACTIVO=false, así que aquí se envuelve la app a mano.
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from app.logic.rebote import MiddlewareRebote, Rebote, rebote
+
+
+@pytest.fixture
+def cliente_rebote(base, monkeypatch):
+    from app.main import app
+    rebote.limpiar()
+    monkeypatch.setattr(rebote, "ventana_s", 60)
+    monkeypatch.setattr(rebote, "rafaga", 3)
+    monkeypatch.setattr(rebote, "fichas_s", 0.001)  # el balde no se repone durante la prueba
+    with TestClient(MiddlewareRebote(app), base_url="http://prueba") as c:
+        assert c.post("/scan/punto1", data={"plate": "AB123"}, follow_redirects=False).status_code == 303
+        yield c
+    rebote.limpiar()
+
+
+def escaneos(db):
+    return db.execute(text("SELECT COUNT(*) FROM escaneos")).scalar()
+
+
+def test_duplicado_se_responde_desde_memoria(cliente_rebote, db):
+    primera = cliente_rebote.get("/scan/punto2")
+    assert "x-rebote" not in primera.headers
+    antes = escaneos(db)
+
+    repetida = cliente_rebote.get("/scan/punto2")
+    assert repetida.headers["x-rebote"] == "duplicado"
+    assert repetida.content == primera.content
+    assert "server-timing" not in repetida.headers  # no pasó por la app ni por la base
+    assert escaneos(db) == antes
+
+
+def test_sin_fichas_responde_429(cliente_rebote):
+    for punto in ("punto2", "punto3", "punto4"):
+        assert cliente_rebote.get(f"/scan/{punto}").status_code == 200
+    limitado = cliente_rebote.get("/scan/punto5")
+    assert limitado.status_code == 429
+    assert int(limitado.headers["retry-after"]) >= 1
+    # El duplicado no gasta fichas: sigue respondiendo
+    assert cliente_rebote.get("/scan/punto4").headers["x-rebote"] == "duplicado"
+
+
+@pytest.mark.parametrize("ruta, datos", [
+    ("/scan/punto1", {"data": {"plate": "AB123"}, "follow_redirects": False}),
+    ("/api/scans/sync", {"json": {"escaneos": []}}),
+])
+def test_formulario_y_sincronizacion_invalidan_la_pagina_guardada(cliente_rebote, ruta, datos):
+    cliente_rebote.get("/scan/punto2")
+    assert cliente_rebote.get("/scan/punto2").headers.get("x-rebote") == "duplicado"
+    assert cliente_rebote.post(ruta, **datos).status_code in (200, 303)
+    assert "x-rebote" not in cliente_rebote.get("/scan/punto2").headers
+
+
+def test_lru_desaloja_el_telefono_menos_reciente():
+    lru = Rebote(ventana_s=60, max_dispositivos=2)
+    lru.guardar("a", "punto1", b"A", b"text/html", 0)
+    lru.guardar("b", "punto1", b"B", b"text/html", 0)
+    assert lru.duplicado("a", "punto1", 1) == (b"A", b"text/html")  # "a" pasa a ser el más reciente
+    lru.guardar("c", "punto1", b"C", b"text/html", 1)
+
+    assert lru.duplicado("b", "punto1", 2) is None
+    assert lru.duplicado("a", "punto1", 2) is not None
+    assert lru.estadisticas()["dispositivos"] == 2
+    assert lru.estadisticas()["desalojos"] == 1
@@ -0,0 +1,31 @@
+# tests/test_registro_escaneo.py
+# Registro de escaneos con crud (formulario de placa y escaneo directo).
+from sqlalchemy import text
+from app import crud
+from app.logic.gestion_ciclos import registrar_escaneo, registrar_escaneo_formulario
+
+
+def _cuenta(db, tabla):
+    return db.execute(text(f"SELECT COUNT(*) FROM {tabla}")).scalar()
+
+
+def test_create_escaneo_no_duplica_un_punto_leido_de_la_base(db):
+    registro = registrar_escaneo(db, "telefono1", "CD456", "punto1", crud_module=crud)
+    db.expunge_all()  # la fecha vuelve de la base (en SQLite, sin zona horaria)
+    repetido = crud.create_escaneo(db, registro["ciclo"].id, "punto1")
+    assert repetido.id == registro["escaneo"].id
+    assert _cuenta(db, "escaneos") == 1
+
+
+def test_formulario_sin_confirmar_queda_en_la_transaccion_del_llamador(db):
+    registro = registrar_escaneo_formulario(db, "telefono1", "CD456", "punto1", crud_module=crud, confirmar=False)
+    assert registro["escaneo"].id is not None
+    db.rollback()
+    for tabla in ("camiones", "sesiones", "ciclos", "escaneos", "ciclo_estado"):
+        assert _cuenta(db, tabla) == 0, tabla
+
+
+def test_registrar_escaneo_sin_confirmar_no_hace_commit(db):
+    registrar_escaneo(db, "telefono1", "CD456", "punto1", crud_module=crud, confirmar=False)
+    db.rollback()
+    assert _cuenta(db, "escaneos") == 0